@@ -0,0 +1,35 @@
+"""create documents table
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-11-26 10:00:00
+
+Baseline schema as created by ``Base.metadata.create_all``.  Databases
+created before migrations were introduced can be brought under Alembic
+with ``alembic -c alembic/alembic.ini stamp 0001``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "documents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_documents_id", "documents", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_documents_id", table_name="documents")
+    op.drop_table("documents")
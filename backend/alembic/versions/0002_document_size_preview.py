@@ -0,0 +1,38 @@
+"""persist document size and preview
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-12-02 09:00:00
+
+Adds the ``size`` and ``preview`` columns so listing pages no longer
+need to load and encode ``content`` for every row.  Existing rows are
+backfilled in SQL: ``length()`` of a BLOB cast is the UTF-8 byte length.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+PREVIEW_LENGTH = 200
+
+
+def upgrade():
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.add_column(sa.Column("size", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("preview", sa.String(length=PREVIEW_LENGTH), nullable=True))
+
+    op.execute(
+        "UPDATE documents SET "
+        "size = length(CAST(content AS BLOB)), "
+        f"preview = substr(content, 1, {PREVIEW_LENGTH})"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("preview")
+        batch_op.drop_column("size")
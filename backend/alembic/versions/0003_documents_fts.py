@@ -0,0 +1,63 @@
+"""full-text search index over document name and content
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-12-09 09:00:00
+
+Creates the FTS5 external-content index and its sync triggers, then
+rebuilds it from the existing rows.
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE documents_fts USING fts5(
+            name, content,
+            content='documents', content_rowid='id',
+            tokenize='unicode61', prefix='2 3'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_fts_ai AFTER INSERT ON documents BEGIN
+            INSERT INTO documents_fts(rowid, name, content)
+            VALUES (new.id, new.name, new.content);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_fts_ad AFTER DELETE ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content)
+            VALUES ('delete', old.id, old.name, old.content);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_fts_au AFTER UPDATE OF name, content ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content)
+            VALUES ('delete', old.id, old.name, old.content);
+            INSERT INTO documents_fts(rowid, name, content)
+            VALUES (new.id, new.name, new.content);
+        END
+        """
+    )
+    # Backfill the index from the rows already in documents
+    op.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS documents_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS documents_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS documents_fts_ai")
+    op.execute("DROP TABLE IF EXISTS documents_fts")
@@ -0,0 +1,23 @@
+"""composite indexes for keyset pagination
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-12-16 09:00:00
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_documents_name_id", "documents", ["name", "id"])
+    op.create_index("ix_documents_created_at_id", "documents", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_documents_created_at_id", table_name="documents")
+    op.drop_index("ix_documents_name_id", table_name="documents")
@@ -0,0 +1,56 @@
+"""maintained document count and collection version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-12-23 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "counters",
+        sa.Column("name", sa.String(length=64), primary_key=True),
+        sa.Column("value", sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO counters (name, value) "
+        "SELECT 'documents', count(*) FROM documents "
+        "UNION ALL SELECT 'documents_version', 0"
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_counters_ai AFTER INSERT ON documents BEGIN
+            UPDATE counters SET value = value + 1 WHERE name IN ('documents', 'documents_version');
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_counters_ad AFTER DELETE ON documents BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'documents';
+            UPDATE counters SET value = value + 1 WHERE name = 'documents_version';
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_counters_au AFTER UPDATE ON documents BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'documents_version';
+        END
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS documents_counters_au")
+    op.execute("DROP TRIGGER IF EXISTS documents_counters_ad")
+    op.execute("DROP TRIGGER IF EXISTS documents_counters_ai")
+    op.drop_table("counters")
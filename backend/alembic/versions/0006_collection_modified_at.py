@@ -0,0 +1,66 @@
+"""track when the document collection last changed
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-01-06 09:00:00
+
+Adds the documents_modified_at counter (Unix time) used for Last-Modified
+on list responses and recreates the counter triggers to maintain it.
+"""
+from alembic import op
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+NOW = "CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER)"
+
+
+def _create_triggers(touch):
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_counters_ai AFTER INSERT ON documents BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'documents';{touch}
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_counters_ad AFTER DELETE ON documents BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'documents';{touch}
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_counters_au AFTER UPDATE ON documents BEGIN{touch}
+        END
+        """
+    )
+
+
+def _drop_triggers():
+    op.execute("DROP TRIGGER IF EXISTS documents_counters_au")
+    op.execute("DROP TRIGGER IF EXISTS documents_counters_ad")
+    op.execute("DROP TRIGGER IF EXISTS documents_counters_ai")
+
+
+def upgrade():
+    op.execute(f"INSERT INTO counters (name, value) VALUES ('documents_modified_at', {NOW})")
+    _drop_triggers()
+    _create_triggers(
+        f"""
+            UPDATE counters SET value = value + 1 WHERE name = 'documents_version';
+            UPDATE counters SET value = {NOW} WHERE name = 'documents_modified_at';"""
+    )
+
+
+def downgrade():
+    _drop_triggers()
+    _create_triggers(
+        """
+            UPDATE counters SET value = value + 1 WHERE name = 'documents_version';"""
+    )
+    op.execute("DELETE FROM counters WHERE name = 'documents_modified_at'")
@@ -0,0 +1,244 @@
+"""content-addressed, compressed document content
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-01-13 09:00:00
+
+Moves ``documents.content`` into ``content_blobs``, one row per distinct
+body keyed by its SHA-256. Documents keep the hash and the
+uncompressed/stored sizes.
+Bodies of 1 KiB or more are stored zlib-compressed when that is smaller.
+``documents`` is rebuilt (batch mode) to make content_hash a NOT NULL
+foreign key, so its counter triggers are recreated afterwards. The FTS
+index is re-pointed at the ``documents_content`` view and the triggers
+now also maintain blob reference counts. Requires the content_text()
+function the app registers on every connection.
+"""
+import hashlib
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 500
+# Frozen copy of the app's content encoding at this revision
+COMPRESSION_MIN_BYTES = 1024
+ZLIB_LEVEL = 6
+
+NOW = "CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER)"
+
+FTS_TABLE = """
+    CREATE VIRTUAL TABLE documents_fts USING fts5(
+        name, content,
+        content='{content}', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+"""
+
+
+def _drop_fts(triggers):
+    for trigger in triggers:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS documents_fts")
+
+
+def _blob(content):
+    raw = content.encode("utf-8")
+    data, compression = raw, "none"
+    if len(raw) >= COMPRESSION_MIN_BYTES:
+        compressed = zlib.compress(raw, ZLIB_LEVEL)
+        if len(compressed) < len(raw):
+            data, compression = compressed, "zlib"
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "data": data,
+        "compression": compression,
+        "size": len(raw),
+        "stored_size": len(data),
+    }
+
+
+def _create_counter_triggers():
+    # Dropped with the old table when batch mode rebuilds documents; as of 0006
+    touch = f"""
+            UPDATE counters SET value = value + 1 WHERE name = 'documents_version';
+            UPDATE counters SET value = {NOW} WHERE name = 'documents_modified_at';"""
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_counters_ai AFTER INSERT ON documents BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'documents';{touch}
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_counters_ad AFTER DELETE ON documents BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'documents';{touch}
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_counters_au AFTER UPDATE ON documents BEGIN{touch}
+        END
+        """
+    )
+
+
+def _backfill_blobs():
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.text("SELECT id, content FROM documents WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        blobs = {}
+        updates = []
+        for document_id, content in rows:
+            blob = _blob(content or "")
+            blobs[blob["hash"]] = blob
+            updates.append({"id": document_id, "hash": blob["hash"], "stored_size": blob["stored_size"]})
+        connection.execute(
+            sa.text(
+                "INSERT OR IGNORE INTO content_blobs (hash, data, compression, size, stored_size, refcount) "
+                "VALUES (:hash, :data, :compression, :size, :stored_size, 0)"
+            ),
+            list(blobs.values()),
+        )
+        connection.execute(
+            sa.text("UPDATE documents SET content_hash = :hash, stored_size = :stored_size WHERE id = :id"),
+            updates,
+        )
+        last_id = rows[-1][0]
+    op.execute(
+        "UPDATE content_blobs SET refcount = "
+        "(SELECT COUNT(*) FROM documents WHERE documents.content_hash = content_blobs.hash)"
+    )
+
+
+def upgrade():
+    op.create_table(
+        "content_blobs",
+        sa.Column("hash", sa.String(length=64), primary_key=True),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("compression", sa.String(length=8), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("stored_size", sa.Integer(), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("documents", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.add_column("documents", sa.Column("stored_size", sa.Integer(), nullable=False, server_default="0"))
+
+    _drop_fts(("documents_fts_au", "documents_fts_ad", "documents_fts_ai"))
+    _backfill_blobs()
+    # Before the documents_content view exists: the table copy would break it
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("content")
+        batch_op.alter_column("content_hash", existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_foreign_key("fk_documents_content_hash", "content_blobs", ["content_hash"], ["hash"])
+        batch_op.create_index("ix_documents_content_hash", ["content_hash"])
+    _create_counter_triggers()
+
+    op.execute(
+        """
+        CREATE VIEW documents_content AS
+        SELECT documents.id AS id, documents.name AS name,
+               content_text(content_blobs.data, content_blobs.compression) AS content
+        FROM documents JOIN content_blobs ON content_blobs.hash = documents.content_hash
+        """
+    )
+    op.execute(FTS_TABLE.format(content="documents_content"))
+    op.execute(
+        """
+        CREATE TRIGGER documents_content_ai AFTER INSERT ON documents BEGIN
+            UPDATE content_blobs SET refcount = refcount + 1 WHERE hash = new.content_hash;
+            INSERT INTO documents_fts(rowid, name, content)
+            SELECT new.id, new.name, content_text(data, compression)
+            FROM content_blobs WHERE hash = new.content_hash;
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_content_ad AFTER DELETE ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content)
+            SELECT 'delete', old.id, old.name, content_text(data, compression)
+            FROM content_blobs WHERE hash = old.content_hash;
+            UPDATE content_blobs SET refcount = refcount - 1 WHERE hash = old.content_hash;
+            DELETE FROM content_blobs WHERE hash = old.content_hash AND refcount <= 0;
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_content_au AFTER UPDATE OF name, content_hash ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content)
+            SELECT 'delete', old.id, old.name, content_text(data, compression)
+            FROM content_blobs WHERE hash = old.content_hash;
+            UPDATE content_blobs SET refcount = refcount + 1 WHERE hash = new.content_hash;
+            UPDATE content_blobs SET refcount = refcount - 1 WHERE hash = old.content_hash;
+            DELETE FROM content_blobs WHERE hash = old.content_hash AND refcount <= 0;
+            INSERT INTO documents_fts(rowid, name, content)
+            SELECT new.id, new.name, content_text(data, compression)
+            FROM content_blobs WHERE hash = new.content_hash;
+        END
+        """
+    )
+    op.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    _drop_fts(("documents_content_au", "documents_content_ad", "documents_content_ai"))
+    op.execute("DROP VIEW IF EXISTS documents_content")
+
+    op.add_column("documents", sa.Column("content", sa.Text(), nullable=True))
+    op.execute(
+        "UPDATE documents SET content = ("
+        "SELECT content_text(data, compression) FROM content_blobs "
+        "WHERE content_blobs.hash = documents.content_hash)"
+    )
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_index("ix_documents_content_hash")
+        batch_op.drop_constraint("fk_documents_content_hash", type_="foreignkey")
+        batch_op.drop_column("stored_size")
+        batch_op.drop_column("content_hash")
+    _create_counter_triggers()
+    op.drop_table("content_blobs")
+
+    op.execute(FTS_TABLE.format(content="documents"))
+    op.execute(
+        """
+        CREATE TRIGGER documents_fts_ai AFTER INSERT ON documents BEGIN
+            INSERT INTO documents_fts(rowid, name, content)
+            VALUES (new.id, new.name, new.content);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_fts_ad AFTER DELETE ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content)
+            VALUES ('delete', old.id, old.name, old.content);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER documents_fts_au AFTER UPDATE OF name, content ON documents BEGIN
+            INSERT INTO documents_fts(documents_fts, rowid, name, content)
+            VALUES ('delete', old.id, old.name, old.content);
+            INSERT INTO documents_fts(rowid, name, content)
+            VALUES (new.id, new.name, new.content);
+        END
+        """
+    )
+    op.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
@@ -0,0 +1,29 @@
+"""indexes for the size and case-insensitive name sorts
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-01-20 09:00:00
+
+``documents.size`` is already persisted and kept current on write (0002,
+0007); this adds the (size, id) and (lower(name), id) indexes so
+sort_by=size and sort_by=name_ci are served in index order like the
+other sorts.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_documents_size_id", "documents", ["size", "id"])
+    op.create_index("ix_documents_lower_name_id", "documents", [sa.text("lower(name)"), "id"])
+
+
+def downgrade():
+    op.drop_index("ix_documents_lower_name_id", table_name="documents")
+    op.drop_index("ix_documents_size_id", table_name="documents")
@@ -0,0 +1,72 @@
+"""document change log for the change feed
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-01-27 09:00:00
+
+Adds ``document_changes``, an append-only log written by triggers on
+documents in the same transaction as each insert, delete and name or
+content update. Its seq is the resume point of the change feed; entries
+beyond the newest 10,000 are pruned on insert. The log starts empty.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+RETENTION = 10_000
+
+LOG_CHANGE = """
+        INSERT INTO document_changes (op, document_id, name, size, created_at, updated_at)
+        VALUES ('{op}', {row}.id, {row}.name, {row}.size, {row}.created_at, {row}.updated_at);"""
+
+
+def upgrade():
+    op.create_table(
+        "document_changes",
+        sa.Column("seq", sa.Integer(), primary_key=True),
+        sa.Column("op", sa.String(length=8), nullable=False),
+        sa.Column("document_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=255), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sqlite_autoincrement=True,
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER document_changes_prune AFTER INSERT ON document_changes BEGIN
+            DELETE FROM document_changes WHERE seq <= new.seq - {RETENTION};
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_changes_ai AFTER INSERT ON documents BEGIN{LOG_CHANGE.format(op="create", row="new")}
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_changes_ad AFTER DELETE ON documents BEGIN{LOG_CHANGE.format(op="delete", row="old")}
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER documents_changes_au AFTER UPDATE OF name, content_hash ON documents BEGIN{LOG_CHANGE.format(op="update", row="new")}
+        END
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS documents_changes_au")
+    op.execute("DROP TRIGGER IF EXISTS documents_changes_ad")
+    op.execute("DROP TRIGGER IF EXISTS documents_changes_ai")
+    op.drop_table("document_changes")
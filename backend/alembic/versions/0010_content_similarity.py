@@ -0,0 +1,73 @@
+"""MinHash signatures and LSH buckets for near-duplicate detection
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-02-03 09:00:00
+
+Adds ``content_blobs.signature`` (a MinHash signature of the content,
+computed on write) and ``content_lsh``, its locality-sensitive hash
+buckets, maintained by triggers on content_blobs. Content stored before
+this revision has no signature: run ``python -m app.cli similarity-rebuild``
+to compute them in parallel. The triggers need the lsh_bucket() function
+the app registers on every connection.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+BANDS = 16
+
+
+def _buckets(row):
+    return ", ".join(f"lsh_bucket({row}.signature, {band})" for band in range(BANDS))
+
+
+def upgrade():
+    op.add_column("content_blobs", sa.Column("signature", sa.LargeBinary(), nullable=True))
+    op.create_table(
+        "content_lsh",
+        sa.Column("bucket", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("hash", sa.String(length=64), sa.ForeignKey("content_blobs.hash"), primary_key=True),
+        sqlite_with_rowid=False,
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER content_blobs_lsh_ai AFTER INSERT ON content_blobs
+        WHEN new.signature IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO content_lsh (bucket, hash)
+            SELECT value, new.hash FROM json_each(json_array({_buckets("new")}));
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER content_blobs_lsh_ad AFTER DELETE ON content_blobs
+        WHEN old.signature IS NOT NULL BEGIN
+            DELETE FROM content_lsh WHERE hash = old.hash AND bucket IN ({_buckets("old")});
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER content_blobs_lsh_au AFTER UPDATE OF signature ON content_blobs BEGIN
+            DELETE FROM content_lsh WHERE hash = old.hash AND bucket IN ({_buckets("old")});
+            INSERT OR IGNORE INTO content_lsh (bucket, hash)
+            SELECT value, new.hash FROM json_each(json_array({_buckets("new")}))
+            WHERE new.signature IS NOT NULL;
+        END
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS content_blobs_lsh_au")
+    op.execute("DROP TRIGGER IF EXISTS content_blobs_lsh_ad")
+    op.execute("DROP TRIGGER IF EXISTS content_blobs_lsh_ai")
+    op.drop_table("content_lsh")
+    # In place: a batch table copy would break the documents_content view
+    op.execute("ALTER TABLE content_blobs DROP COLUMN signature")
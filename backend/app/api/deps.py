@@ -1,12 +1,2 @@
 # app/api/deps.py
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..database import SessionLocal
-
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+from ..database import get_db, get_read_db, get_read_sessionmaker, get_write_sessionmaker  # noqa: F401  (single definitions so overrides apply everywhere)
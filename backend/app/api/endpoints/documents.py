@@ -1,134 +1,932 @@
 # app/api/endpoints/documents.py
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, asc
-from ...core.logging import setup_logging
+import json
+import logging
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from python_multipart import MultipartParser
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import parse_options_header
+from sqlalchemy import insert, select
+from sqlalchemy.orm import undefer
+from ...core.config import settings
+from ...core.metrics import timed
+from ...core.responses import ORJSONResponse, dumps
+from ...models.blob import ContentBlob
 from ...models.document import Document
-from ...schemas.document import DocumentCreate, Document as DocumentSchema, DocumentResponse
-from ..deps import get_db
+from ...services import batch
+from ...services.autocomplete import autocomplete
+from ...services import blobs
+from ...services import changes
+from ...services import conditional
+from ...services import counts
+from ...services import export
+from ...services import fieldsets
+from ...services import ingest
+from ...services import pagination
+from ...services.cache import document_cache, document_invalidations, document_key, invalidate_document
+from ...services import search as fts
+from ...services import similarity
+from ...services import writes
+from ...schemas.document import (
+    AutocompleteResponse,
+    BatchDeleteRequest,
+    BatchDeleteResponse,
+    BatchDocumentsResponse,
+    BatchFetchRequest,
+    BulkCreateResponse,
+    BulkItemResult,
+    DocumentChange as DocumentChangeSchema,
+    DocumentChangesResponse,
+    DocumentCreate,
+    DocumentCreated,
+    Document as DocumentSchema,
+    DocumentResponse,
+    DocumentSummary,
+    SimilarDocument as SimilarDocumentSchema,
+    SimilarDocumentsResponse,
+)
+from ..deps import get_db, get_read_db, get_read_sessionmaker, get_write_sessionmaker
 from datetime import datetime, timezone
 
 router = APIRouter()
-logger = setup_logging()
+logger = logging.getLogger(__name__)
+
+# Columns loaded by listings that exclude content
+SUMMARY_COLUMNS = (
+    Document.id,
+    Document.name,
+    Document.created_at,
+    Document.updated_at,
+    Document.size,
+)
+DOCUMENT_COLUMNS = SUMMARY_COLUMNS + (Document.content,)
+
+def _serialize_document(row, include_content: bool = True):
+    """
+    Build the response schema straight from a Document or a result row.
+
+    Rows may carry a snippet column; attributes a row does not have (e.g.
+    preview when it was not selected) take the schema default.
+    """
+    schema = DocumentSchema if include_content else DocumentSummary
+    return schema.model_validate(row)
+
+def _apply_search(query, search: Optional[str], is_sqlite: bool):
+    """
+    Apply the search filter: full-text match on name and content when the
+    FTS index is available, substring match on name otherwise.
+
+    Returns the filtered query and the FTS match expression, if one is used.
+    """
+    match_query = None
+    if search:
+        if settings.FULL_TEXT_SEARCH and is_sqlite:
+            match_query = fts.build_match_query(search)
+        if match_query:
+            query = query.join(fts.documents_fts, fts.documents_fts.c.rowid == Document.id)
+            query = query.where(fts.match_clause(match_query))
+        else:
+            query = query.where(Document.name.like(f"%{search}%"))
+    return query, match_query
 
 @router.get("", response_model=DocumentResponse)
 async def list_documents(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
     search: Optional[str] = None,
-    sort_by: Optional[str] = Query(None, regex="^(name|created_at)$"),
+    sort_by: Optional[str] = Query(None, regex=pagination.SORT_BY_PATTERN),
     sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
     page: int = Query(1, ge=1),
-    per_page: int = Query(10, ge=1, le=100)
+    per_page: int = Query(10, ge=1, le=100),
+    include_content: bool = Query(True, description="Return full content; false returns metadata only"),
+    include_preview: bool = Query(False, description="Add a short content preview to metadata-only results"),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page; replaces page"),
+    include_total: bool = Query(True, description="Skip counting entirely when false"),
+    total_mode: str = Query(
+        "exact",
+        alias="total",
+        regex="^(exact|estimate)$",
+        description="estimate accepts a recently cached total for filtered lists"
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return (e.g. id,name,size,created_at); only their columns are read. "
+                    "Replaces include_content and include_preview"
+    )
 ):
     try:
-        query = db.query(Document)
+        fields = fieldsets.parse_fields(fields)
+        is_sqlite = db.get_bind().dialect.name == "sqlite"
+        
+        # Validators come from the maintained collection counters, so a
+        # revalidation is answered before the listing query or count runs
+        stats = await counts.collection_stats(db) if is_sqlite else None
+        headers = None
+        if stats is not None:
+            last_modified = (
+                datetime.fromtimestamp(stats.modified_at, timezone.utc) if stats.modified_at else None
+            )
+            headers = conditional.validator_headers(
+                conditional.collection_etag(stats.version, request), last_modified
+            )
+            if conditional.is_not_modified(request, headers["ETag"], last_modified):
+                return conditional.not_modified_response(headers)
+        
+        if fields is not None:
+            columns = fieldsets.columns(fields)
+        elif include_content:
+            columns = DOCUMENT_COLUMNS
+        else:
+            columns = SUMMARY_COLUMNS + ((Document.preview,) if include_preview else ())
+        query = select(*columns)
+        
+        query, match_query = _apply_search(query, search, is_sqlite)
         
-        # Apply search filter
-        if search:
-            query = query.filter(Document.name.like(f"%{search}%"))
+        # Get total count: the unfiltered total is a maintained counter,
+        # filtered totals are cached per filter and collection version
+        total = None
+        total_is_estimate = False
+        with timed("count"):
+            if include_total and not is_sqlite:
+                total = await counts.count_rows(db, query)
+            elif include_total:
+                if not search:
+                    total = stats.count
+                else:
+                    count_key = ("search", match_query or search)
+                    allow_stale = total_mode == "estimate"
+                    total = counts.cached_count(count_key, stats.version, allow_stale=allow_stale)
+                    total_is_estimate = total is not None and allow_stale
+                    if total is None:
+                        total = await counts.count_rows(db, query)
+                        counts.store_count(count_key, stats.version, total)
         
-        # Get total count
-        total = query.count()
+        if match_query and (fields is None or fieldsets.SNIPPET in fields):
+            query = query.add_columns(fts.snippet_column().label("snippet"))
         
-        # Apply sorting
-        if sort_by:
-            order_column = getattr(Document, sort_by)
-            if sort_order == "desc":
-                order_column = desc(order_column)
+        # Apply sorting. Relevance order is used for searches without an
+        # explicit sort; every other order ends in id so it can be resumed
+        # from a cursor.
+        descending = sort_order == "desc"
+        keyset = bool(sort_by or cursor or not match_query)
+        if keyset:
+            query = query.add_columns(pagination.sort_key_column(sort_by).label("sort_key"))
+            query = query.order_by(*pagination.order_by(sort_by, descending))
+        else:
+            query = query.order_by(fts.rank_column())
+        
+        # Apply pagination: seek past the cursor position, or skip to the page
+        if cursor:
+            key, last_id = pagination.decode_cursor(cursor, sort_by, sort_order)
+            query = query.where(pagination.after_cursor(sort_by, descending, key, last_id))
+        else:
+            query = query.offset((page - 1) * per_page)
+        # One extra row tells whether there is a next page
+        with timed("query"):
+            rows = (await db.execute(query.limit(per_page + 1))).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        
+        next_cursor = None
+        if keyset and has_more:
+            next_cursor = pagination.encode_cursor(sort_by, sort_order, rows[-1].sort_key, rows[-1].id)
+        
+        with timed("serialize"):
+            if fields is not None:
+                # Plain dicts of the requested fields; validation would add the rest back
+                response = DocumentResponse.model_construct(
+                    documents=[fieldsets.serialize(row, fields) for row in rows],
+                    total=total,
+                    total_is_estimate=total_is_estimate,
+                    next_cursor=next_cursor
+                )
             else:
-                order_column = asc(order_column)
-            query = query.order_by(order_column)
-        
-        # Apply pagination
-        query = query.offset((page - 1) * per_page).limit(per_page)
-        
-        # Execute query
-        documents = query.all()
-        
-        # Calculate size for each document
-        result_documents = []
-        for doc in documents:
-            doc_dict = {
-                "id": doc.id,
-                "name": doc.name,
-                "content": doc.content,
-                "created_at": doc.created_at.replace(tzinfo=timezone.utc),
-                "updated_at": doc.updated_at.replace(tzinfo=timezone.utc),
-                "size": len(doc.content.encode('utf-8'))
-            }
-            result_documents.append(DocumentSchema(**doc_dict))
-        
-        return DocumentResponse(documents=result_documents, total=total)
+                response = DocumentResponse(
+                    documents=[_serialize_document(row, include_content) for row in rows],
+                    total=total,
+                    total_is_estimate=total_is_estimate,
+                    next_cursor=next_cursor
+                )
+            return ORJSONResponse(response, headers=headers)
         
+    except (pagination.InvalidCursor, fieldsets.InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing documents: {str(e)}")
         raise HTTPException(status_code=500, detail="Error retrieving documents")
 
+def _parse_ids(values: list[str]) -> list[int]:
+    try:
+        ids = [int(part) for value in values for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be integers")
+    if not ids:
+        raise HTTPException(status_code=400, detail="At least one id is required")
+    return ids
+
+async def _fetch_batch(db: AsyncSession, ids: list[int], include_content: bool):
+    ids = batch.unique_ids(ids)
+    if len(ids) > settings.BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_IDS} ids per request")
+    try:
+        rows = await batch.fetch_rows(db, ids, DOCUMENT_COLUMNS if include_content else SUMMARY_COLUMNS + (Document.preview,))
+    except Exception as e:
+        logger.error(f"Error retrieving batch of {len(ids)} documents: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving documents")
+    return ORJSONResponse(BatchDocumentsResponse(
+        documents=[_serialize_document(rows[document_id], include_content) for document_id in ids if document_id in rows],
+        missing=[document_id for document_id in ids if document_id not in rows]
+    ))
+
+@router.get("/batch", response_model=BatchDocumentsResponse)
+async def get_documents_batch(
+    db: AsyncSession = Depends(get_read_db),
+    ids: list[str] = Query(..., description="Document ids, repeated or comma-separated"),
+    include_content: bool = Query(True, description="Return full content; false returns metadata and preview")
+):
+    """Fetch many documents with one IN query per BATCH_CHUNK_SIZE ids"""
+    return await _fetch_batch(db, _parse_ids(ids), include_content)
+
+@router.post("/batch", response_model=BatchDocumentsResponse)
+async def post_documents_batch(request: BatchFetchRequest, db: AsyncSession = Depends(get_read_db)):
+    """Same as GET /batch, for id lists too long for a URL"""
+    return await _fetch_batch(db, request.ids, request.include_content)
+
+@router.post("/batch/delete", response_model=BatchDeleteResponse)
+async def delete_documents_batch(request: BatchDeleteRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Delete many documents, by id or every match of a search, in a single
+    transaction of chunked DELETE ... WHERE id IN statements. Reports the
+    deleted ids and the requested ids that did not exist.
+    """
+    try:
+        if request.ids is not None:
+            ids = batch.unique_ids(request.ids)
+            if len(ids) > settings.BATCH_MAX_IDS:
+                raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_IDS} ids per request")
+        else:
+            query, _ = _apply_search(
+                select(Document.id), request.search, db.get_bind().dialect.name == "sqlite"
+            )
+            ids = list((await db.execute(query)).scalars())
+        deleted_ids = await batch.delete_ids(db, ids)
+        await db.commit()
+        changes.hub.notify()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting batch of documents: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Error deleting documents")
+
+    for document_id in deleted_ids:
+        autocomplete.remove(document_id)
+        await invalidate_document(document_id)
+    deleted = set(deleted_ids)
+    return ORJSONResponse(BatchDeleteResponse(
+        deleted=len(deleted_ids),
+        deleted_ids=deleted_ids,
+        missing=[document_id for document_id in ids if document_id not in deleted]
+    ))
+
+# How long browsers wait before reconnecting a dropped change feed
+CHANGE_FEED_RETRY_MS = 3000
+
+async def _change_events(session_factory: async_sessionmaker, since: Optional[int]) -> AsyncIterator[bytes]:
+    yield f"retry: {CHANGE_FEED_RETRY_MS}\n\n".encode()
+    async for change in changes.stream_changes(session_factory, since):
+        if change is None:
+            yield b": keep-alive\n\n"
+        elif isinstance(change, changes.Reset):
+            # The id makes a reconnecting EventSource resume from here
+            yield f"id: {change.seq}\nevent: reset\ndata: {{}}\n\n".encode()
+            return
+        else:
+            data = dumps(DocumentChangeSchema.model_validate(change))
+            yield f"id: {change.seq}\nevent: {change.op}\ndata: ".encode() + data + b"\n\n"
+
+@router.get("/changes", response_model=DocumentChangesResponse)
+async def document_changes(
+    request: Request,
+    session_factory: async_sessionmaker = Depends(get_read_sessionmaker),
+    since: Optional[int] = Query(None, ge=0, description="Return changes after this seq; omit to start from now"),
+    limit: int = Query(100, ge=1, le=1000, description="Most changes per JSON response")
+):
+    """
+    Feed of document creates, updates and deletes with their metadata, so
+    clients can patch lists in place instead of refetching them.
+
+    With Accept: text/event-stream this is a Server-Sent Events stream:
+    one event per change (event name = op, id = seq), resumed after
+    Last-Event-ID or since on reconnect. Otherwise it returns one JSON
+    page of changes after since, for polling. A reset (event, or
+    reset=true) means the resume point is gone: reload, then continue.
+    """
+    if "text/event-stream" in request.headers.get("accept", ""):
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id:
+            if not last_event_id.isdigit():
+                raise HTTPException(status_code=400, detail="Last-Event-ID must be a change seq")
+            since = int(last_event_id)
+        return StreamingResponse(
+            _change_events(session_factory, since),
+            media_type="text/event-stream",
+            # No caching, and no buffering by reverse proxies
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    try:
+        async with session_factory() as db:
+            head = await changes.head_seq(db)
+            if since is None:
+                return ORJSONResponse(DocumentChangesResponse(changes=[], last_seq=head))
+            if not await changes.can_resume(db, since):
+                return ORJSONResponse(DocumentChangesResponse(changes=[], last_seq=head, reset=True))
+            rows = await changes.fetch_changes(db, since, limit)
+    except Exception as e:
+        logger.error(f"Error reading document changes: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error reading document changes")
+    return ORJSONResponse(DocumentChangesResponse(
+        changes=[DocumentChangeSchema.model_validate(row) for row in rows],
+        last_seq=rows[-1].seq if rows else since
+    ))
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete_names(
+    session_factory: async_sessionmaker = Depends(get_read_sessionmaker),
+    q: str = Query(..., min_length=1, max_length=200, description="What has been typed so far"),
+    limit: int = Query(10, ge=1, le=50, description="Most suggestions to return")
+):
+    """
+    Ranked document name suggestions for a partial, possibly misspelled
+    query, from an in-memory trigram and prefix index. Names starting
+    with the query rank first; "Projcet Pln" still finds "Project Plan".
+    """
+    try:
+        index = await autocomplete.ensure_ready(session_factory)
+    except Exception as e:
+        logger.error(f"Error building autocomplete index: {str(e)}")
+        raise HTTPException(status_code=503, detail="Autocomplete index unavailable")
+    suggestions = index.search(q, limit)
+    return ORJSONResponse(AutocompleteResponse(suggestions=[suggestion._asdict() for suggestion in suggestions]))
+
+@router.get("/export")
+async def export_documents(
+    session_factory: async_sessionmaker = Depends(get_read_sessionmaker),
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    search: Optional[str] = None,
+    sort_by: Optional[str] = Query(None, regex=pagination.SORT_BY_PATTERN),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
+    include_content: bool = Query(True, description="Include full content in every record"),
+    gzip: bool = Query(False, description="Compress the export on the fly")
+):
+    """
+    Stream every document, or the filtered and sorted subset, as NDJSON or CSV.
+
+    Rows are read through a server-side cursor in EXPORT_BATCH_SIZE chunks
+    and written out as they arrive, so memory use does not grow with the
+    size of the collection.
+    """
+    fields = export.EXPORT_FIELDS_WITH_CONTENT if include_content else export.EXPORT_FIELDS
+    encode = export.ENCODERS[format]
+
+    async def stream_rows():
+        # The request's dependencies are closed before the body is sent, so
+        # the stream owns its session
+        async with session_factory() as db:
+            try:
+                query = select(*(getattr(Document, field) for field in fields))
+                query, _ = _apply_search(query, search, db.get_bind().dialect.name == "sqlite")
+                query = query.order_by(*pagination.order_by(sort_by, sort_order == "desc"))
+                query = query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+                result = await db.stream(query)
+                header = True
+                async for rows in result.partitions():
+                    yield encode(rows, fields, header=header)
+                    header = False
+                if header and format == "csv":
+                    yield encode((), fields, header=True)
+            except Exception as e:
+                logger.error(f"Error exporting documents: {str(e)}")
+                raise
+
+    filename = f"documents.{format}"
+    body = stream_rows()
+    media_type = export.MEDIA_TYPES[format]
+    if gzip:
+        body = export.gzip_stream(body, settings.EXPORT_GZIP_LEVEL)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _document_validators(
+    document_id: int,
+    updated_at: datetime,
+    fields: Optional[tuple[str, ...]] = None
+) -> dict[str, str]:
+    return conditional.validator_headers(conditional.document_etag(document_id, updated_at, fields), updated_at)
+
 @router.get("/{document_id}", response_model=DocumentSchema)
-async def get_document(document_id: int, db: Session = Depends(get_db)):
+async def get_document(
+    document_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return (e.g. id,name,size); only their columns are read"
+    )
+):
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
+        fields = fieldsets.parse_fields(fields)
+        # Serve hot documents from the read-through cache of serialized
+        # responses. Entries are "<updated_at in microseconds>\n<body>" so
+        # the validators come with the body. Sparse responses bypass it.
+        cache_key = document_key(document_id)
+        # Taken before the first read: a delete committed after it stops the fill below
+        fill_token = document_invalidations.token()
+        cached = await document_cache.get(cache_key) if fields is None else None
+        if cached is not None:
+            updated_us, _, body = cached.partition(b"\n")
+            updated_at = conditional.from_timestamp_us(int(updated_us))
+            headers = _document_validators(document_id, updated_at)
+            if conditional.is_not_modified(request, headers["ETag"], updated_at):
+                return conditional.not_modified_response(headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+        
+        # A revalidation only needs updated_at, not the content
+        if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+            updated_at = await db.scalar(select(Document.updated_at).where(Document.id == document_id))
+            if updated_at is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            headers = _document_validators(document_id, updated_at, fields)
+            if conditional.is_not_modified(request, headers["ETag"], updated_at):
+                return conditional.not_modified_response(headers)
+        
+        if fields is not None:
+            row = (await db.execute(
+                select(*fieldsets.columns(fields, "updated_at")).where(Document.id == document_id)
+            )).first()
+            if row is None:
+                raise HTTPException(status_code=404, detail="Document not found")
+            return ORJSONResponse(
+                fieldsets.serialize(row, fields), headers=_document_validators(document_id, row.updated_at, fields)
+            )
+        
+        document = await db.get(Document, document_id, options=[undefer(Document.content)])
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
             
-        # Prepare document with UTC timezone
-        document_dict = {
-            "id": document.id,
-            "name": document.name,
-            "content": document.content,
-            "created_at": document.created_at.replace(tzinfo=timezone.utc),
-            "updated_at": document.updated_at.replace(tzinfo=timezone.utc),
-            "size": len(document.content.encode('utf-8'))
-        }
-        
-        return DocumentSchema(**document_dict)
+        body = dumps(_serialize_document(document))
+        if (
+            len(body) <= settings.DOCUMENT_CACHE_MAX_ITEM_BYTES
+            and document_invalidations.is_current(cache_key, fill_token)
+        ):
+            updated_us = conditional.timestamp_us(document.updated_at)
+            await document_cache.set(cache_key, f"{updated_us}\n".encode("ascii") + body)
+        headers = _document_validators(document_id, document.updated_at)
+        return Response(content=body, media_type="application/json", headers=headers)
         
+    except fieldsets.InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error retrieving document {document_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error retrieving document")
 
-@router.post("", response_model=DocumentSchema, status_code=201)
-async def create_document(document: DocumentCreate, db: Session = Depends(get_db)):
+@router.get("/{document_id}/content")
+async def get_document_content(
+    document_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    session_factory: async_sessionmaker = Depends(get_read_sessionmaker)
+):
+    """
+    Stream a document's content as text/plain in CONTENT_CHUNK_BYTES
+    chunks. A single "bytes=" Range is answered with 206 Partial Content;
+    If-Range, If-None-Match and If-Modified-Since are honoured.
+    """
     try:
-        now = datetime.now(timezone.utc)
-        db_document = Document(
-            name=document.name,
-            content=document.content,
-            created_at=now,
-            updated_at=now
+        row = (await db.execute(
+            select(Document.size, Document.updated_at, Document.content_hash, ContentBlob.compression)
+            .join(ContentBlob, ContentBlob.hash == Document.content_hash)
+            .where(Document.id == document_id)
+        )).first()
+    except Exception as e:
+        logger.error(f"Error retrieving content of document {document_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error retrieving document content")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    headers = {**_document_validators(document_id, row.updated_at), "Accept-Ranges": "bytes"}
+    if conditional.is_not_modified(request, headers["ETag"], row.updated_at):
+        return conditional.not_modified_response(headers)
+
+    start, end, status_code = 0, row.size, 200
+    if conditional.if_range_matches(request, headers["ETag"], row.updated_at):
+        try:
+            byte_range = conditional.parse_range(request.headers.get("range"), row.size)
+        except conditional.RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{row.size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{row.size}"
+    headers["Content-Length"] = str(end - start)
+
+    async def stream_content():
+        # The stream outlives the request's session, so it owns one
+        async with session_factory() as stream_db:
+            try:
+                async for chunk in blobs.stream_blob(stream_db, row.content_hash, row.compression, start, end):
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Error streaming content of document {document_id}: {str(e)}")
+                raise
+
+    return StreamingResponse(
+        stream_content(),
+        status_code=status_code,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
+
+@router.get("/{document_id}/similar", response_model=SimilarDocumentsResponse)
+async def similar_documents(
+    document_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    threshold: Optional[float] = Query(
+        None, ge=0, le=1, description="Lowest estimated similarity; SIMILARITY_THRESHOLD by default"
+    ),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Near-duplicates of a document: others whose content is estimated to
+    share at least threshold of its 5-byte shingles (Jaccard similarity),
+    found through MinHash signatures and LSH buckets rather than pairwise
+    comparison. Identical content has similarity 1.0.
+    """
+    try:
+        content_hash = await db.scalar(select(Document.content_hash).where(Document.id == document_id))
+        if content_hash is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        matches = await similarity.similar_documents(
+            db,
+            content_hash,
+            settings.SIMILARITY_THRESHOLD if threshold is None else threshold,
+            limit,
+            exclude_id=document_id
         )
-        db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
-        
-        document_dict = {
-            "id": db_document.id,
-            "name": db_document.name,
-            "content": db_document.content,
-            "created_at": db_document.created_at.replace(tzinfo=timezone.utc),
-            "updated_at": db_document.updated_at.replace(tzinfo=timezone.utc),
-            "size": len(db_document.content.encode('utf-8'))
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding documents similar to {document_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error finding similar documents")
+    return ORJSONResponse(SimilarDocumentsResponse(
+        document_id=document_id,
+        similar=[SimilarDocumentSchema(**match._asdict()) for match in matches]
+    ))
+
+# Near-duplicates reported by a create with ?similar=
+SIMILAR_ON_CREATE_LIMIT = 10
+
+async def _insert_document(document: DocumentCreate, db: AsyncSession) -> Document:
+    """Add a document and flush it (assigning its id); the caller commits"""
+    now = datetime.now(timezone.utc)
+    db_document = Document(
+        name=document.name,
+        content=document.content,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(db_document)
+    await db.flush()
+    return db_document
+
+@router.post("", response_model=DocumentCreated, status_code=201)
+async def create_document(
+    document: DocumentCreate,
+    db: AsyncSession = Depends(get_db),
+    write_sessionmaker: async_sessionmaker = Depends(get_write_sessionmaker),
+    read_sessionmaker: async_sessionmaker = Depends(get_read_sessionmaker),
+    similar: Optional[float] = Query(
+        None, ge=0, le=1, description="Also return existing documents at least this similar (near-duplicates)"
+    )
+):
+    try:
+        if settings.WRITE_GROUP_COMMIT:
+            db_document = await writes.coordinator.submit(
+                write_sessionmaker, lambda group_db: _insert_document(document, group_db)
+            )
+        else:
+            db_document = await _insert_document(document, db)
+            await db.commit()
+            changes.hub.notify()
+        autocomplete.add(db_document.id, db_document.name)
         
-        return DocumentSchema(**document_dict)
+        # Nothing is generated server-side beyond the id, which the flush
+        # set; a refresh would only reload the content from storage
+        if similar is None:
+            return ORJSONResponse(_serialize_document(db_document), status_code=201)
         
     except Exception as e:
         logger.error(f"Error creating document: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Error creating document")
 
+    created = DocumentCreated.model_validate(db_document)
+    try:
+        # On the read pool, as GET /{id}/similar: the writer's connection is free for the next write
+        async with read_sessionmaker() as read_db:
+            matches = await similarity.similar_documents(
+                read_db, db_document.content_hash, similar, SIMILAR_ON_CREATE_LIMIT, exclude_id=db_document.id
+            )
+        created.similar = [SimilarDocumentSchema(**match._asdict()) for match in matches]
+    except Exception as e:
+        # The document is stored; only the warning is lost
+        logger.error(f"Error finding documents similar to {db_document.id}: {str(e)}")
+    return ORJSONResponse(created, status_code=201)
+
+# Text fields of a multipart upload are small; anything larger is rejected
+MULTIPART_FIELD_MAX_BYTES = 4096
+
+async def _read_multipart_upload(request: Request, upload: blobs.BlobUpload) -> dict[str, str]:
+    """
+    Parse a multipart/form-data body as it streams in, feeding the "file"
+    part to the upload chunk by chunk. Returns the text fields, plus the
+    file part's filename under "filename".
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Multipart body has no boundary")
+
+    fields: dict[str, str] = {}
+    part = {"headers": {}, "field": b"", "value": b"", "name": None, "data": bytearray()}
+    found_file = False
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", name=None, data=bytearray())
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal found_file
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["name"] = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if part["name"] == "file":
+            found_file = True
+            fields["filename"] = disposition.get(b"filename", b"").decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if part["name"] == "file":
+            upload.write(data[start:end])
+        else:
+            part["data"] += data[start:end]
+            if len(part["data"]) > MULTIPART_FIELD_MAX_BYTES:
+                raise HTTPException(status_code=400, detail=f"Form field {part['name']!r} is too large")
+
+    def on_part_end():
+        if part["name"] and part["name"] != "file":
+            fields[part["name"]] = part["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except FormParserError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {str(e)}")
+    if not found_file:
+        raise HTTPException(status_code=400, detail='Multipart upload needs a "file" part')
+    return fields
+
+@router.post("/upload", response_model=DocumentSummary, status_code=201)
+async def upload_document(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    name: Optional[str] = Query(None, description="Document name; defaults to the uploaded file name")
+):
+    """
+    Create a document from a large body without buffering it: either
+    multipart/form-data with a "file" part (and optionally a "name" field),
+    or the raw request body with ?name=.
+
+    The body is streamed to storage in chunks while its SHA-256, size and
+    preview are computed, so memory use is bounded by the chunk size.
+    Content identical to an existing document is not stored again.
+    """
+    upload = blobs.BlobUpload()
+    try:
+        media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if media_type == "multipart/form-data":
+            fields = await _read_multipart_upload(request, upload)
+            name = name or fields.get("name") or fields.get("filename")
+        else:
+            async for chunk in request.stream():
+                upload.write(chunk)
+        if not name or len(name) > 255:
+            raise HTTPException(status_code=400, detail="A document name of 1 to 255 characters is required")
+
+        blob = upload.finish()
+        await blobs.store_upload(db, upload, blob)
+        now = datetime.now(timezone.utc)
+        document_id = await db.scalar(
+            insert(Document).values(
+                name=name,
+                content_hash=blob["hash"],
+                size=blob["size"],
+                stored_size=blob["stored_size"],
+                preview=upload.preview,
+                created_at=now,
+                updated_at=now
+            ).returning(Document.id)
+        )
+        await db.commit()
+        changes.hub.notify()
+        autocomplete.add(document_id, name)
+    except blobs.ContentTooLarge as e:
+        await db.rollback()
+        raise HTTPException(status_code=413, detail=str(e))
+    except blobs.InvalidContent as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading document: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Error creating document")
+    finally:
+        upload.close()
+
+    return ORJSONResponse(
+        DocumentSummary(
+            id=document_id,
+            name=name,
+            created_at=now,
+            updated_at=now,
+            size=blob["size"],
+            preview=upload.preview
+        ),
+        status_code=201
+    )
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def _iter_bulk_items(request: Request) -> AsyncIterator[tuple[int, object]]:
+    """
+    Yield (index, parsed item) from a JSON array or an NDJSON body.
+
+    NDJSON is parsed line by line as the body streams in, so the whole
+    upload never has to be held in memory. Lines that are not valid JSON
+    are yielded as the exception so they can be reported per item.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in NDJSON_MEDIA_TYPES:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        for index, item in enumerate(items):
+            yield index, item
+        return
+
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_ndjson_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_ndjson_line(buffer)
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'item'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+async def _insert_bulk_batch(
+    db: AsyncSession,
+    batch: list[tuple[int, DocumentCreate]],
+    results: list[BulkItemResult]
+):
+    """Insert one batch in its own transaction; a failure is reported on each of its items"""
+    try:
+        ids = await ingest.insert_documents(db, [document for _, document in batch])
+        await db.commit()
+        changes.hub.notify()
+    except Exception as e:
+        logger.error(f"Error inserting bulk batch of {len(batch)} documents: {str(e)}")
+        await db.rollback()
+        results.extend(BulkItemResult(index=index, error="Error creating document") for index, _ in batch)
+        return
+    for (index, document), new_id in zip(batch, ids):
+        autocomplete.add(new_id, document.name)
+        results.append(BulkItemResult(index=index, id=new_id))
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+async def bulk_create_documents(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    batch_size: int = Query(
+        settings.BULK_INSERT_BATCH_SIZE,
+        ge=1,
+        le=settings.BULK_INSERT_MAX_BATCH_SIZE,
+        description="Documents inserted per statement and transaction"
+    )
+):
+    """
+    Create many documents from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson) of {"name", "content"} objects.
+
+    Items are validated individually; valid ones are inserted in batches,
+    each batch in a single transaction. The response reports the new id or
+    the error for every item by its position in the input.
+    """
+    results: list[BulkItemResult] = []
+    batch: list[tuple[int, DocumentCreate]] = []
+
+    async for index, item in _iter_bulk_items(request):
+        if isinstance(item, ValueError):
+            results.append(BulkItemResult(index=index, error=f"Invalid JSON: {item}"))
+            continue
+        try:
+            batch.append((index, DocumentCreate.model_validate(item)))
+        except ValidationError as e:
+            results.append(BulkItemResult(index=index, error=_validation_message(e)))
+            continue
+        if len(batch) >= batch_size:
+            await _insert_bulk_batch(db, batch, results)
+            batch = []
+
+    if batch:
+        await _insert_bulk_batch(db, batch, results)
+
+    results.sort(key=lambda result: result.index)
+    created = sum(1 for result in results if result.id is not None)
+    return ORJSONResponse(BulkCreateResponse(created=created, failed=len(results) - created, results=results))
+
+async def _delete_document(document_id: int, db: AsyncSession) -> None:
+    """Delete a document and flush; the caller commits. 404 when it does not exist"""
+    document = await db.get(Document, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    await db.delete(document)
+    await db.flush()
+
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
+async def delete_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+    write_sessionmaker: async_sessionmaker = Depends(get_write_sessionmaker)
+):
     try:
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
-            raise HTTPException(status_code=404, detail="Document not found")
-            
-        db.delete(document)
-        db.commit()
+        if settings.WRITE_GROUP_COMMIT:
+            await writes.coordinator.submit(
+                write_sessionmaker, lambda group_db: _delete_document(document_id, group_db)
+            )
+        else:
+            await _delete_document(document_id, db)
+            await db.commit()
+            changes.hub.notify()
+        autocomplete.remove(document_id)
+        await invalidate_document(document_id)
         
         return {"message": "Document deleted successfully"}
         
@@ -136,5 +934,5 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
         raise
     except Exception as e:
         logger.error(f"Error deleting document {document_id}: {str(e)}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Error deleting document")
@@ -0,0 +1,57 @@
+"""
+Operational commands, run outside the web server.
+
+    python -m app.cli seed                   insert the sample documents into an empty database
+    python -m app.cli similarity-rebuild     compute missing MinHash signatures and LSH buckets
+
+Apply migrations first: alembic -c alembic/alembic.ini upgrade head
+"""
+import argparse
+import asyncio
+from .core.config import settings
+from .core.logging import setup_logging, shutdown_logging
+from .database import AsyncSessionLocal, dispose_engines, ensure_database_directory
+from .services import seed, similarity
+
+async def seed_command(args) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            inserted = await seed.seed_sample_data(db)
+    finally:
+        await dispose_engines()
+    print(f"Inserted {inserted} sample documents" if inserted else "Database is not empty; nothing inserted")
+
+async def similarity_rebuild_command(args) -> None:
+    try:
+        signed = await similarity.rebuild_signatures(
+            AsyncSessionLocal, everything=args.all, batch_size=args.batch_size, workers=args.workers
+        )
+    finally:
+        await dispose_engines()
+    print(f"Signed {signed} content blobs")
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("seed", help="Insert the sample documents if the database is empty").set_defaults(
+        handler=seed_command
+    )
+    rebuild = commands.add_parser(
+        "similarity-rebuild", help="Compute MinHash signatures and LSH buckets for stored content"
+    )
+    rebuild.add_argument("--all", action="store_true", help="Recompute every signature, not only missing ones")
+    rebuild.add_argument("--batch-size", type=int, help="Blobs per batch (SIMILARITY_REBUILD_BATCH_SIZE)")
+    rebuild.add_argument("--workers", type=int, help="Worker processes (SIMILARITY_REBUILD_WORKERS, else CPU count)")
+    rebuild.set_defaults(handler=similarity_rebuild_command)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    ensure_database_directory(settings.DATABASE_URL)
+    try:
+        asyncio.run(args.handler(args))
+    finally:
+        shutdown_logging()
+
+if __name__ == "__main__":
+    main()
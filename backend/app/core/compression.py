@@ -0,0 +1,189 @@
+# app/core/compression.py
+import asyncio
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from .config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: br is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is not offered without it
+    zstandard = None
+
+# Media types worth compressing besides text/* (event streams are left
+# alone: buffering in a compressor would delay events)
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+})
+# Statuses whose responses have no body to compress, and partial content,
+# whose byte range refers to the uncompressed representation
+UNCOMPRESSED_STATUSES = frozenset({204, 206, 304})
+# Larger pieces of a body are compressed off the event loop
+THREAD_MIN_BYTES = 256 * 1024
+
+def available_encodings() -> list[str]:
+    """RESPONSE_COMPRESSION_ENCODINGS in preference order, without those whose package is missing"""
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [encoding for encoding in settings.RESPONSE_COMPRESSION_ENCODINGS if installed.get(encoding)]
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    The available encoding an Accept-Encoding header rates highest; ties
+    go to the server's preference order. None when the client accepts none.
+    """
+    ratings = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            ratings[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = ratings.get(encoding, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def is_compressible(status: int, headers: Headers) -> bool:
+    if status < 200 or status in UNCOMPRESSED_STATUSES or "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    # Byte-range resources (content downloads) stay identity-encoded, so
+    # the sizes and offsets they advertise hold for every response
+    if headers.get("accept-ranges", "none") != "none":
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type.startswith("text/"):
+        return media_type != "text/event-stream"
+    return media_type in COMPRESSIBLE_TYPES or media_type.endswith(("+json", "+xml"))
+
+class Encoder:
+    """Compresses one response body, in one piece or as a stream of chunks"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(
+                level=settings.RESPONSE_COMPRESSION_ZSTD_LEVEL
+            ).compressobj()
+        else:
+            # wbits 31: a gzip header and trailer rather than zlib's
+            self._compressor = zlib.compressobj(settings.RESPONSE_COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        """
+        Compressed bytes for the next piece of the body. Pieces before the
+        last are flushed, so a streamed body reaches the client as it is
+        produced rather than when the compressor's buffer fills.
+        """
+        compressor = self._compressor
+        if not data and not final:
+            return b""
+        if self.encoding == "br":
+            return compressor.process(data) + (compressor.finish() if final else compressor.flush())
+        if final:
+            return compressor.compress(data) + compressor.flush()
+        mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK if self.encoding == "zstd" else zlib.Z_SYNC_FLUSH
+        return compressor.compress(data) + compressor.flush(mode)
+
+    async def encode_async(self, data: bytes, final: bool) -> bytes:
+        if len(data) >= THREAD_MIN_BYTES:
+            return await asyncio.to_thread(self.encode, data, final)
+        return self.encode(data, final)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the best encoding the
+    client accepts (br or zstd when their packages are installed, gzip
+    otherwise). Bodies sent in one piece are compressed only from
+    RESPONSE_COMPRESSION_MIN_BYTES; streamed bodies always are. Responses
+    that are already encoded, not text-like, or byte-range capable, and
+    requests with a Range header, are passed through.
+
+    Compressed responses lose Content-Length when streamed, get
+    Vary: Accept-Encoding, and have strong ETags made weak: the compressed
+    bytes differ from those the validator describes, while If-None-Match
+    compares weakly and still matches.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RESPONSE_COMPRESSION:
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get("accept-encoding", ""))
+        if encoding is None or "range" in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder: Optional[Encoder] = None
+
+        async def send_first_body(response_start, message):
+            nonlocal encoder
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=list(response_start.get("headers", [])))
+            if not is_compressible(response_start["status"], headers):
+                await send(response_start)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+                await send({**response_start, "headers": headers.raw})
+                await send(message)
+                return
+            encoder = Encoder(encoding)
+            compressed = await encoder.encode_async(body, final=not more_body)
+            headers["Content-Encoding"] = encoding
+            del headers["Content-Length"]
+            if not more_body:
+                headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            await send({**response_start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held until the first body message shows how large the body is
+                start = message
+            elif message["type"] == "http.response.body" and start is not None:
+                response_start, start = start, None
+                await send_first_body(response_start, message)
+            elif message["type"] == "http.response.body" and encoder is not None:
+                more_body = message.get("more_body", False)
+                await send({
+                    "type": "http.response.body",
+                    "body": await encoder.encode_async(message.get("body", b""), final=not more_body),
+                    "more_body": more_body,
+                })
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,12 +1,13 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal, Optional
 import os
 from pathlib import Path
 
-# Create data directory if it doesn't exist
+# Default database location; the directory is created on startup and by
+# migrations, not at import
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
 
 class Settings(BaseSettings):
     DATABASE_URL: str = f"sqlite:///{DATA_DIR}/documents.db"
@@ -14,6 +15,132 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Document Manager"
     BACKEND_CORS_ORIGINS: list[str] = ["http://localhost:5173", "http://localhost:3000"]
 
+    # SQLite connection tuning, applied to every new connection. WAL lets
+    # readers run during a write; NORMAL is durable across application
+    # crashes in WAL mode and only risks the last commits on power loss.
+    SQLITE_JOURNAL_MODE: Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_TEMP_STORE: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+    # Query-only connections serving reads; writes share a single connection
+    DB_READ_POOL_SIZE: int = 8
+    # How long a request waits for a free connection before failing
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+
+    # Group commit: single creates and deletes are queued for one writer
+    # task that applies up to WRITE_GROUP_MAX_OPS of them in a shared
+    # transaction (one fsync). Writes arriving during a commit form the
+    # next group; a window above 0 also waits that long for more.
+    WRITE_GROUP_COMMIT: bool = False
+    WRITE_GROUP_MAX_OPS: int = 64
+    WRITE_GROUP_WINDOW_MS: float = 0.0
+
+    # Open every pooled connection at startup so the first requests do not
+    # pay for connecting; /health/ready fails after this long
+    DB_WARM_UP: bool = True
+    READINESS_TIMEOUT_SECONDS: float = 2.0
+    # Insert the sample documents on startup when the database is empty.
+    # Off by default; `python -m app.cli seed` does the same on demand.
+    SEED_SAMPLE_DATA: bool = False
+
+    # Bulk ingestion: documents per INSERT statement and transaction
+    BULK_INSERT_BATCH_SIZE: int = 500
+    BULK_INSERT_MAX_BATCH_SIZE: int = 5000
+
+    # Batch fetch and delete: most ids per request, and ids per IN (...)
+    # statement, kept well under SQLite's bound-parameter limit
+    BATCH_MAX_IDS: int = 10_000
+    BATCH_CHUNK_SIZE: int = 500
+
+    # Streaming export: rows fetched per round trip from the server-side cursor
+    EXPORT_BATCH_SIZE: int = 500
+    EXPORT_GZIP_LEVEL: int = 6
+
+    # Content is stored once per distinct body (by SHA-256) and compressed
+    # when at least this large and the result is smaller. "auto" uses zstd
+    # when the zstandard package is installed and zlib otherwise.
+    CONTENT_COMPRESSION: Literal["auto", "zstd", "zlib", "none"] = "auto"
+    CONTENT_COMPRESSION_MIN_BYTES: int = 1024
+    CONTENT_COMPRESSION_LEVEL: Optional[int] = None
+    # Streaming upload and download: bytes per chunk, upload bytes kept in
+    # memory before spilling to a temporary file, and the largest upload
+    CONTENT_CHUNK_BYTES: int = 64 * 1024
+    UPLOAD_SPOOL_MAX_BYTES: int = 1024 * 1024
+    UPLOAD_MAX_BYTES: int = 1_000_000_000
+
+    # Logging goes through a queue to a background thread that writes the
+    # console and a file rotated at midnight. Repeated warnings and errors
+    # from one call site are limited to LOG_RATE_LIMIT_BURST per window.
+    LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    LOG_TO_FILE: bool = True
+    LOG_DIR: Optional[str] = None
+    LOG_BACKUP_COUNT: int = 14
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_RATE_LIMIT_BURST: int = 20
+    LOG_RATE_LIMIT_WINDOW_SECONDS: float = 60.0
+
+    # Change feed (GET /api/documents/changes): how often other workers'
+    # writes are picked up, keep-alive interval, changes buffered per
+    # subscriber before it is told to resync, and rows read per query
+    CHANGE_FEED_POLL_SECONDS: float = 1.0
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = 15.0
+    CHANGE_FEED_QUEUE_SIZE: int = 1000
+    CHANGE_FEED_BATCH_SIZE: int = 500
+
+    # Name autocomplete (GET /api/documents/autocomplete): build the
+    # in-memory index at startup rather than on first use, word posting
+    # entries read per query when intersecting, and the lowest score returned
+    AUTOCOMPLETE_BUILD_ON_STARTUP: bool = True
+    AUTOCOMPLETE_CANDIDATE_BUDGET: int = 1000
+    AUTOCOMPLETE_MIN_SIMILARITY: float = 0.3
+
+    # Near-duplicate detection (GET /api/documents/{id}/similar): default
+    # estimated Jaccard similarity of content shingles, blobs read per LSH
+    # bucket per lookup, and the signature rebuild's batch size and worker
+    # processes (CPU count when unset)
+    SIMILARITY_THRESHOLD: float = 0.5
+    SIMILARITY_CANDIDATES_PER_BUCKET: int = 100
+    SIMILARITY_REBUILD_BATCH_SIZE: int = 500
+    SIMILARITY_REBUILD_WORKERS: Optional[int] = None
+
+    # Response compression: encodings offered in preference order (br and
+    # zstd only when the brotli and zstandard packages are installed), the
+    # smallest body worth compressing, and per-encoding levels trading CPU
+    # for bandwidth
+    RESPONSE_COMPRESSION: bool = True
+    RESPONSE_COMPRESSION_ENCODINGS: list[str] = ["br", "zstd", "gzip"]
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_COMPRESSION_GZIP_LEVEL: int = 6
+    RESPONSE_COMPRESSION_BROTLI_QUALITY: int = 4
+    RESPONSE_COMPRESSION_ZSTD_LEVEL: int = 3
+
+    # Statements slower than this are logged and counted in /metrics
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    # Add a Server-Timing header with the database and phase breakdown
+    SERVER_TIMING: bool = True
+
+    # Search name and content through the SQLite FTS5 index instead of LIKE
+    FULL_TEXT_SEARCH: bool = True
+    # Filtered list totals: exact counts are reused for this long while the
+    # collection is unchanged; total=estimate accepts counts up to the
+    # estimate TTL old even after writes
+    COUNT_CACHE_TTL_SECONDS: float = 10.0
+    COUNT_ESTIMATE_TTL_SECONDS: float = 300.0
+    COUNT_CACHE_MAX_ENTRIES: int = 1024
+
+    # Read-through cache of serialized single-document responses.
+    # "memory" (per process), "none", or "package.module:ClassName" for a
+    # custom app.services.cache.CacheBackend shared between workers
+    DOCUMENT_CACHE_BACKEND: str = "memory"
+    DOCUMENT_CACHE_MAX_ENTRIES: int = 1024
+    DOCUMENT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Larger documents are served without being cached
+    DOCUMENT_CACHE_MAX_ITEM_BYTES: int = 1024 * 1024
+    DOCUMENT_CACHE_TTL_SECONDS: float = 300.0
+
     class Config:
         case_sensitive = True
 
@@ -1,14 +1,150 @@
 # app/core/logging.py
+import atexit
+import json
 import logging
-from datetime import datetime
-
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(f"logs/app_{datetime.now().strftime('%Y%m%d')}.log")
-        ]
-    )
-    return logging.getLogger(__name__)
\ No newline at end of file
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from .config import BASE_DIR, settings
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+_setup_lock = threading.Lock()
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        return json.dumps(entry, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` records per call site and level in each
+    `window` seconds. Records below `min_level` are never limited. The
+    first record after a window with drops carries the number dropped.
+    """
+
+    def __init__(self, burst: int, window: float, min_level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.min_level = min_level
+        self._lock = threading.Lock()
+        # call site -> (window start, records let through, records dropped)
+        self._windows: dict[tuple, tuple[float, int, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno < self.min_level:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            started, passed, dropped = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                if dropped:
+                    record.suppressed = dropped
+                    record.msg = f"{record.getMessage()} ({dropped} similar messages suppressed)"
+                    record.args = None
+                started, passed, dropped = now, 0, 0
+            if passed < self.burst:
+                self._windows[key] = (started, passed + 1, dropped)
+                return True
+            self._windows[key] = (started, passed, dropped + 1)
+            return False
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback in the caller, so the record is
+        # picklable and no longer refers to request state, but leave the
+        # layout to the formatters on the listener side
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Dropping a record is better than blocking the event loop
+            pass
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JSONFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+def _handlers() -> list[logging.Handler]:
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if settings.LOG_TO_FILE:
+        log_dir = Path(settings.LOG_DIR) if settings.LOG_DIR else BASE_DIR / "logs"
+        log_dir.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.handlers.TimedRotatingFileHandler(
+            log_dir / "app.log",
+            when="midnight",
+            backupCount=settings.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+            delay=True,
+        ))
+    formatter = _formatter()
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def setup_logging() -> logging.Logger:
+    """
+    Route the root logger through a queue drained by a background thread
+    that owns the console and file handlers, so logging calls never do I/O
+    on the caller's thread. Safe to call more than once; only the first
+    call configures anything.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+            _queue_handler = _QueueHandler(log_queue)
+            _queue_handler.addFilter(RateLimitFilter(
+                settings.LOG_RATE_LIMIT_BURST, settings.LOG_RATE_LIMIT_WINDOW_SECONDS
+            ))
+            root = logging.getLogger()
+            root.addHandler(_queue_handler)
+            root.setLevel(settings.LOG_LEVEL)
+            _listener = logging.handlers.QueueListener(log_queue, *_handlers(), respect_handler_level=True)
+            _listener.start()
+            atexit.register(shutdown_logging)
+    return logging.getLogger(__name__)
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
@@ -0,0 +1,25 @@
+# app/core/loops.py
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+class LoopBound(ABC):
+    """
+    Base for process-wide services holding tasks, locks or queues, which
+    belong to the event loop that created them. Tests and scripts run
+    several loops in one process, so each use calls _bind_loop(): on the
+    first use from a new loop, _reset_loop_state() drops what the previous
+    loop created.
+    """
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._reset_loop_state()
+        return loop
+
+    @abstractmethod
+    def _reset_loop_state(self) -> None: ...
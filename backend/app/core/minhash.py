@@ -0,0 +1,132 @@
+# app/core/minhash.py
+"""
+MinHash signatures of document content, for near-duplicate detection.
+
+Content is normalized (case-folded, whitespace collapsed) and cut into
+overlapping SHINGLE_BYTES-byte shingles. Signatures use one-permutation
+hashing: each shingle is hashed once with CRC-32, the top bits pick one
+of NUM_BINS bins and the rest is the value whose minimum the bin keeps;
+empty bins borrow from the next non-empty one (rotation densification).
+The fraction of equal bins of two signatures estimates the Jaccard
+similarity of their shingle sets.
+
+The per-shingle work happens in C (set construction, map(crc32), sort);
+Python only touches the NUM_BINS bin boundaries, found by bisection.
+
+Signatures are stored as NUM_BINS little-endian uint32s (256 bytes). For
+locality-sensitive hashing they are cut into NUM_BANDS bands of
+ROWS_PER_BAND bins, each hashed with its band number to a 64-bit bucket:
+content sharing any bucket is a candidate, so pairs with similarity s are
+found with probability 1 - (1 - s^ROWS_PER_BAND)^NUM_BANDS (0.64 for
+s = 0.5, 0.89 for s = 0.6, 0.99 for s = 0.7). These constants are baked
+into stored signatures and buckets; changing them requires
+`python -m app.cli similarity-rebuild --all`.
+"""
+import hashlib
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import repeat
+from typing import Optional
+
+SHINGLE_BYTES = 5
+NUM_BINS = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_BINS // NUM_BANDS
+
+_BIN_BITS = 6
+_VALUE_BITS = 32 - _BIN_BITS
+_EMPTY = 0xFFFFFFFF
+_SEED = 0x9E3779B9
+
+assert 1 << _BIN_BITS == NUM_BINS and NUM_BANDS * ROWS_PER_BAND == NUM_BINS
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+class MinHasher:
+    """
+    Incremental signature of text received in pieces, like hashlib's
+    update()/digest(). Whitespace runs and shingles spanning pieces are
+    handled, so the result equals signature() of the whole text.
+    """
+
+    def __init__(self):
+        self._mins = [_EMPTY] * NUM_BINS
+        # The last SHINGLE_BYTES - 1 bytes, starting the next piece's first shingles
+        self._tail = b""
+        self._space = False
+        self.empty = True
+
+    def update(self, text: str) -> None:
+        words = text.casefold().split()
+        if not words:
+            self._space = self._space or bool(text)
+            return
+        lead = " " if (self._space or text[0].isspace()) and not self.empty else ""
+        self._space = text[-1].isspace()
+        data = self._tail + (lead + " ".join(words)).encode("utf-8")
+        self._tail = data[-(SHINGLE_BYTES - 1):]
+        self.empty = False
+        if len(data) < SHINGLE_BYTES:
+            return
+        shingles = {data[i:i + SHINGLE_BYTES] for i in range(len(data) - SHINGLE_BYTES + 1)}
+        hashes = sorted(set(map(zlib.crc32, shingles, repeat(_SEED))))
+        mins = self._mins
+        for index in range(NUM_BINS):
+            start = index << _VALUE_BITS
+            position = bisect_left(hashes, start)
+            if position < len(hashes) and hashes[position] < start + (1 << _VALUE_BITS):
+                value = hashes[position] - start
+                if value < mins[index]:
+                    mins[index] = value
+
+    def digest(self) -> Optional[bytes]:
+        """The signature, or None when the text has fewer than SHINGLE_BYTES bytes"""
+        mins = self._mins
+        filled = [index for index, value in enumerate(mins) if value != _EMPTY]
+        if not filled:
+            return None
+        signature = array("I", mins)
+        if len(filled) < NUM_BINS:
+            # An empty bin takes the next filled bin's value, offset by the
+            # distance so it only matches bins borrowed the same way
+            for index in range(NUM_BINS):
+                if mins[index] == _EMPTY:
+                    position = bisect_left(filled, index)
+                    source = filled[position % len(filled)]
+                    distance = (source - index) % NUM_BINS
+                    signature[index] = mins[source] + (distance << _VALUE_BITS)
+        if sys.byteorder != "little":
+            signature.byteswap()
+        return signature.tobytes()
+
+def signature(text: str) -> Optional[bytes]:
+    hasher = MinHasher()
+    hasher.update(text)
+    return hasher.digest()
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    if first == second:
+        return 1.0
+    a, b = array("I", first), array("I", second)
+    return sum(map(int.__eq__, a, b)) / NUM_BINS
+
+def lsh_bucket(signature: Optional[bytes], band: int) -> Optional[int]:
+    """
+    64-bit bucket of one band of a signature, as a signed integer for
+    SQLite; registered as a SQL function of the same name. The band is
+    part of the hash, so buckets of different bands never collide.
+    """
+    if signature is None:
+        return None
+    width = ROWS_PER_BAND * 4
+    digest = hashlib.blake2b(
+        signature[band * width:(band + 1) * width], digest_size=8, person=band.to_bytes(2, "little")
+    ).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+def lsh_buckets(signature: bytes) -> list[int]:
+    return [lsh_bucket(signature, band) for band in range(NUM_BANDS)]
@@ -0,0 +1,29 @@
+# app/core/responses.py
+from typing import Any
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from pydantic import BaseModel
+
+# Timestamps are stored as naive UTC and rendered with a "Z" suffix
+OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """Encode plain data or pydantic models to JSON bytes"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+class ORJSONResponse(_ORJSONResponse):
+    """
+    JSON response rendered with orjson.
+
+    Accepts pydantic models directly. Endpoints that return one of these
+    skip FastAPI's response_model re-validation, so a schema built from
+    ORM rows is validated exactly once.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
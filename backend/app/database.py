@@ -1,20 +1,169 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .core.config import settings
-import os
 
-# Create SQLite engine with foreign key support
+def async_database_url(url: str) -> str:
+    """Swap a sync SQLite URL onto the aiosqlite driver; other URLs are used as given"""
+    parsed = make_url(url)
+    if parsed.drivername in ("sqlite", "sqlite+pysqlite"):
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+def is_sqlite_file(url: str) -> bool:
+    """True for SQLite databases stored in a file (not in memory)"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return False
+    database = parsed.database or ""
+    return database not in ("", ":memory:") and parsed.query.get("mode") != "memory"
+
+def ensure_database_directory(url: str) -> None:
+    """Create the directory holding a file-backed SQLite database"""
+    if is_sqlite_file(url):
+        Path(make_url(url).database).parent.mkdir(parents=True, exist_ok=True)
+
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    """Per-connection PRAGMAs from settings; read-only connections refuse writes"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size = -{int(settings.SQLITE_CACHE_SIZE_KIB)}",
+        f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}",
+        f"PRAGMA temp_store = {settings.SQLITE_TEMP_STORE}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # The journal mode is persistent in the file; the writer sets it
+        pragmas.insert(0, f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    return pragmas
+
+def configure_sqlite(engine, read_only: bool = False) -> None:
+    """Apply the SQLite PRAGMAs to every new connection of an engine"""
+    sync_engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    statements = sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+def _async_engine_options(pool_size: int) -> dict:
+    if not is_sqlite_file(settings.DATABASE_URL):
+        return {}
+    return {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": 0,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+# Synchronous engine, used by migrations, scripts and tests
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args={"check_same_thread": False}  # Needed for SQLite
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engines used by the request handlers so queries never block the
+# event loop. SQLite allows a single writer at a time, so writes go through
+# one pooled connection and queue for it in the pool instead of failing with
+# "database is locked"; reads use a pool of query-only connections, each on
+# its own aiosqlite thread, which WAL lets run alongside the writer.
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **_async_engine_options(pool_size=1)
+)
+if is_sqlite_file(settings.DATABASE_URL):
+    async_read_engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL),
+        **_async_engine_options(pool_size=settings.DB_READ_POOL_SIZE)
+    )
+else:
+    async_read_engine = async_engine
+
+if make_url(settings.DATABASE_URL).get_backend_name() == "sqlite":
+    configure_sqlite(engine)
+    configure_sqlite(async_engine)
+    if async_read_engine is not async_engine:
+        configure_sqlite(async_read_engine, read_only=True)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """Session on the writer connection, for endpoints that modify data"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """Session on the read-only pool, for endpoints that only query"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+async def dispose_engines() -> None:
+    """Close pooled connections; aiosqlite keeps a thread per open connection"""
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+async def warm_up_engines() -> None:
+    """
+    Open every pooled connection and run a trivial query on each, so
+    connection setup (PRAGMAs, SQL functions, aiosqlite threads) happens
+    before the first request rather than during it
+    """
+    async def warm(engine: AsyncEngine, connections: int) -> None:
+        # Held open together so the pool creates distinct connections
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                connection = await stack.enter_async_context(engine.connect())
+                await connection.execute(text("SELECT 1"))
+
+    await warm(async_engine, 1)
+    if async_read_engine is not async_engine:
+        await warm(async_read_engine, settings.DB_READ_POOL_SIZE)
+
+def get_read_sessionmaker() -> async_sessionmaker:
+    """
+    Read session factory for endpoints that open their own sessions, such
+    as streaming responses that outlive the request's dependencies
+    """
+    return AsyncReadSessionLocal
+
+def get_write_sessionmaker() -> async_sessionmaker:
+    """Writer session factory, for work done outside the request's session (group commit)"""
+    return AsyncSessionLocal
+
+async def run_on_driver_connection(db: AsyncSession, fn: Callable[[Any], Any]) -> Any:
+    """
+    Call fn with the session's underlying sqlite3 connection, on the
+    aiosqlite thread that owns it, for driver APIs SQLAlchemy does not
+    expose (incremental blob I/O). Runs inside the session's transaction.
+    """
+    connection = await (await db.connection()).get_raw_connection()
+    driver_connection = connection.driver_connection
+    return await driver_connection._execute(fn, driver_connection._conn)
@@ -1,24 +1,78 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from .core.config import settings
 from .api.endpoints.documents import router
-from .database import Base, engine, SessionLocal
-from .core.logging import setup_logging
+from .database import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    dispose_engines,
+    ensure_database_directory,
+    get_read_sessionmaker,
+    warm_up_engines,
+)
+from .core.logging import setup_logging, shutdown_logging
+from .core.compression import CompressionMiddleware
+from .core.metrics import MetricsMiddleware, registry
+from .core.responses import ORJSONResponse
 from .models.document import Document
+from .services import counts, seed, writes
+from .services.autocomplete import autocomplete
+from .services.cache import document_cache
 
-logger = setup_logging()
+logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup does no schema work (that is Alembic's job) and no full-table
+    queries: it configures logging, opens the connection pools and primes
+    the collection counters, and seeds sample data only when asked to.
+    """
+    setup_logging()
+    ensure_database_directory(settings.DATABASE_URL)
+    app.state.ready = False
+    try:
+        if settings.DB_WARM_UP:
+            await warm_up_engines()
+            async with AsyncReadSessionLocal() as db:
+                await counts.collection_stats(db)
+        if settings.SEED_SAMPLE_DATA:
+            async with AsyncSessionLocal() as db:
+                await seed.seed_sample_data(db)
+    except Exception as e:
+        # Keep serving; /health/ready reports whether the database is usable
+        logger.error(f"Startup warm-up failed: {str(e)}")
+    if settings.AUTOCOMPLETE_BUILD_ON_STARTUP:
+        # In the background: requests arriving first wait for the same build
+        autocomplete.start(AsyncReadSessionLocal)
+    app.state.ready = True
+    yield
+    # Fail readiness first so load balancers stop routing here
+    app.state.ready = False
+    await autocomplete.reset()
+    # Commit writes still queued for a group
+    await writes.coordinator.stop()
+    # Release pooled database connections, then flush queued log records
+    await dispose_engines()
+    shutdown_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
-    redoc_url=f"{settings.API_V1_STR}/redoc"
+    redoc_url=f"{settings.API_V1_STR}/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# Innermost, so response size metrics count the bytes actually sent
+app.add_middleware(CompressionMiddleware)
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,7 +80,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Outermost, so latency covers the whole stack
+app.add_middleware(MetricsMiddleware)
 
 # Root route
 @app.get("/")
@@ -36,88 +93,53 @@ async def root():
     """
     return RedirectResponse(url=f"{settings.API_V1_STR}/docs")
 
-# Health check endpoint
+# Health check endpoints
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
     """
-    Health check endpoint
+    Liveness: the process is up and serving. Touches nothing else, so it
+    stays fast while the database is busy.
     """
     return {"status": "healthy", "api_version": "1.0.0"}
 
-# Include routers
-app.include_router(router, prefix=f"{settings.API_V1_STR}/documents", tags=["documents"])
-
-# Create sample data if needed
-@app.on_event("startup")
-async def create_sample_data():
-    db = SessionLocal()
+@app.get("/health/ready")
+async def readiness_check(sessionmaker: async_sessionmaker = Depends(get_read_sessionmaker)):
+    """
+    Readiness: startup has finished and the documents table answers a
+    one-row query within READINESS_TIMEOUT_SECONDS. 503 otherwise.
+    """
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse({"status": "unavailable", "reason": "starting"}, status_code=503)
     try:
-        # Check if we already have data
-        if db.query(Document).count() == 0:
-            logger.info("Creating sample documents...")
-            sample_documents = [
-                {
-                    "name": "Meeting Notes.txt",
-                    "content": "Discussion points from team meeting:\n- Project timeline review\n- Resource allocation\n- Next steps"
-                },
-                {
-                    "name": "Project Plan.txt",
-                    "content": "Q4 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
-                },
-                {
-                    "name": "API Documentation.txt",
-                    "content": "REST API Endpoints:\n- GET /api/v1/users\n- POST /api/v1/users\n- PUT /api/v1/users/{id}\n- DELETE /api/v1/users/{id}"
-                },
-                {
-                    "name": "Project Plan2.txt",
-                    "content": "Q2 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
-                },
-                {
-                    "name": "Project Plan3.txt",
-                    "content": "Q1 Project Timeline:\n1. Requirements gathering\n2. Analysis phase\n3. Design phase\n4. Implementation\n5. Testing\n6. Deployment"
-                },
-                {
-                    "name": "Project Plan4.txt",
-                    "content": "Q1 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
-                },
-                {
-                    "name": "Project Plan5.txt",
-                    "content": "2025 Q1 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
-                },
-                {
-                    "name": "Meeting Notes2.txt",
-                    "content": "Discussion points from team meeting:\nFinding remedial remedial measures for the issues:\n- Project timeline review\n- Resource allocation\n- Next steps"
-                },
-                {
-                    "name": "Meeting Notes3.txt",
-                    "content": "Discussion points from team meeting:\n- Project timeline review\n- Resource allocation\n- Next steps"
-                },
-                {
-                    "name": "Calculate Market return.txt",
-                    "content": "Calculate the expected return\n Assume that the following assets are correctly priced according  to securrity market line (CAPM)"
-                },
-                {
-                    "name": "Calculate Market risk.txt",
-                    "content": "Calculate the expected market risk\n Assume that the following assets are correctly priced according  to securrity market line (CAPM)"
-                }
-                
-            ]
-            
-            for doc in sample_documents:
-                db_doc = Document(**doc)
-                db.add(db_doc)
-            
-            db.commit()
-            logger.info("Sample documents created successfully")
-            
+        async with sessionmaker() as db:
+            await asyncio.wait_for(
+                db.scalar(select(Document.id).limit(1)), settings.READINESS_TIMEOUT_SECONDS
+            )
     except Exception as e:
-        logger.error(f"Error creating sample data: {str(e)}")
-        db.rollback()
-    finally:
-        db.close()
+        logger.error(f"Readiness check failed: {str(e)}")
+        return ORJSONResponse({"status": "unavailable", "reason": "database"}, status_code=503)
+    return {"status": "ready"}
 
-# Register the startup event
-app.add_event_handler("startup", create_sample_data)
+# Cache statistics
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit, miss and eviction counters of the in-process caches
+    """
+    return {"documents": document_cache.stats(), "counts": counts.stats()}
+
+# Prometheus metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Request latency, in-flight requests, response sizes and SQL statement
+    timings in Prometheus text format
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Include routers
+app.include_router(router, prefix=f"{settings.API_V1_STR}/documents", tags=["documents"])
 
 if __name__ == "__main__":
     import uvicorn
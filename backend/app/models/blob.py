@@ -0,0 +1,159 @@
+# app/models/blob.py
+import hashlib
+import zlib
+from typing import Optional
+from sqlalchemy import BigInteger, Column, DDL, ForeignKey, Integer, LargeBinary, String, event
+from sqlalchemy.engine import Engine
+from ..core import minhash
+from ..core.config import settings
+from ..database import Base
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used without it
+    zstandard = None
+
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_ZSTD = "zstd"
+
+def content_compression() -> str:
+    """Compression applied to new content large enough to be compressed"""
+    if settings.CONTENT_COMPRESSION == "auto":
+        return COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_ZLIB
+    if settings.CONTENT_COMPRESSION == COMPRESSION_ZSTD and zstandard is None:
+        raise RuntimeError("CONTENT_COMPRESSION=zstd requires the zstandard package")
+    return settings.CONTENT_COMPRESSION
+
+def _level(default: int) -> int:
+    return default if settings.CONTENT_COMPRESSION_LEVEL is None else settings.CONTENT_COMPRESSION_LEVEL
+
+def compressobj(compression: str):
+    """Incremental compressor with compress(data) and flush() methods"""
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compressobj(_level(6))
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=_level(3)).compressobj()
+    raise ValueError(f"Unknown compression {compression!r}")
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data, _level(6))
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=_level(3)).compress(data)
+    return data
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Reading zstd-compressed content requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+class ContentBlob(Base):
+    """
+    Document content stored once per distinct body, keyed by its SHA-256.
+
+    refcount is the number of documents pointing at the blob; triggers on
+    documents maintain it and delete the blob when it drops to zero.
+    """
+    __tablename__ = "content_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    compression = Column(String(8), nullable=False, default=COMPRESSION_NONE)
+    # Uncompressed and stored byte lengths
+    size = Column(Integer, nullable=False)
+    stored_size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
+    # MinHash signature of the content (app.core.minhash), NULL for content
+    # too short to have one or stored before signatures existed
+    signature = Column(LargeBinary, nullable=True)
+
+    @staticmethod
+    def from_content(content: str) -> dict:
+        """Row values for storing content, compressed when that pays off"""
+        raw = content.encode("utf-8")
+        data, compression = raw, COMPRESSION_NONE
+        if len(raw) >= settings.CONTENT_COMPRESSION_MIN_BYTES:
+            candidate = content_compression()
+            if candidate != COMPRESSION_NONE:
+                compressed = compress(raw, candidate)
+                if len(compressed) < len(raw):
+                    data, compression = compressed, candidate
+        return {
+            "hash": hashlib.sha256(raw).hexdigest(),
+            "data": data,
+            "compression": compression,
+            "size": len(raw),
+            "stored_size": len(data),
+            "signature": minhash.signature(content),
+        }
+
+    @staticmethod
+    def content_text(data: Optional[bytes], compression: Optional[str]) -> Optional[str]:
+        """Decoded content of a stored blob; registered as a SQL function of the same name"""
+        if data is None:
+            return None
+        return decompress(data, compression).decode("utf-8")
+
+    def __repr__(self):
+        return f"<ContentBlob {self.hash[:12]} refs={self.refcount}>"
+
+class ContentLSH(Base):
+    """
+    Locality-sensitive hash buckets of content signatures: one row per
+    band of each signed blob. Blobs sharing a bucket are near-duplicate
+    candidates. Maintained by triggers on content_blobs.
+    """
+    __tablename__ = "content_lsh"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    bucket = Column(BigInteger, primary_key=True, autoincrement=False)
+    hash = Column(String(64), ForeignKey("content_blobs.hash"), primary_key=True)
+
+    def __repr__(self):
+        return f"<ContentLSH {self.bucket} {self.hash[:12]}>"
+
+def _lsh_buckets(row: str) -> str:
+    return ", ".join(f"lsh_bucket({row}.signature, {band})" for band in range(minhash.NUM_BANDS))
+
+# Buckets follow every insert, delete and signature update of a blob
+LSH_DDL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_blobs_lsh_ai AFTER INSERT ON content_blobs
+    WHEN new.signature IS NOT NULL BEGIN
+        INSERT OR IGNORE INTO content_lsh (bucket, hash)
+        SELECT value, new.hash FROM json_each(json_array({_lsh_buckets("new")}));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_blobs_lsh_ad AFTER DELETE ON content_blobs
+    WHEN old.signature IS NOT NULL BEGIN
+        DELETE FROM content_lsh WHERE hash = old.hash AND bucket IN ({_lsh_buckets("old")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_blobs_lsh_au AFTER UPDATE OF signature ON content_blobs BEGIN
+        DELETE FROM content_lsh WHERE hash = old.hash AND bucket IN ({_lsh_buckets("old")});
+        INSERT OR IGNORE INTO content_lsh (bucket, hash)
+        SELECT value, new.hash FROM json_each(json_array({_lsh_buckets("new")}))
+        WHERE new.signature IS NOT NULL;
+    END
+    """,
+)
+
+for statement in LSH_DDL:
+    event.listen(ContentLSH.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+@event.listens_for(Engine, "connect")
+def _register_content_text(dbapi_connection, connection_record):
+    # Triggers, the FTS content view and Document.content decode blobs in
+    # SQL, and the LSH triggers hash signatures, so every SQLite connection
+    # needs the functions
+    create_function = getattr(dbapi_connection, "create_function", None)
+    if create_function is not None:
+        create_function("content_text", 2, ContentBlob.content_text, deterministic=True)
+        create_function("lsh_bucket", 2, minhash.lsh_bucket, deterministic=True)
@@ -0,0 +1,40 @@
+# app/models/change.py
+from sqlalchemy import Column, DateTime, DDL, Integer, String, event, func
+from ..database import Base
+
+# Change log entries kept for resuming feeds; older ones are pruned on insert
+CHANGE_LOG_RETENTION = 10_000
+
+CHANGE_CREATE = "create"
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+
+class DocumentChange(Base):
+    """
+    Append-only log of document inserts, updates and deletes, written by
+    triggers in the same transaction as the change. seq orders the log and
+    is the resume point of the change feed.
+    """
+    __tablename__ = "document_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    op = Column(String(8), nullable=False)
+    document_id = Column(Integer, nullable=False)
+    # Document metadata at the time of the change (before it, for deletes)
+    name = Column(String(255), nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<DocumentChange {self.seq} {self.op} {self.document_id}>"
+
+PRUNE_DDL = f"""
+    CREATE TRIGGER IF NOT EXISTS document_changes_prune AFTER INSERT ON document_changes BEGIN
+        DELETE FROM document_changes WHERE seq <= new.seq - {CHANGE_LOG_RETENTION};
+    END
+    """
+
+event.listen(DocumentChange.__table__, "after_create", DDL(PRUNE_DDL).execute_if(dialect="sqlite"))
@@ -0,0 +1,29 @@
+# app/models/counter.py
+from sqlalchemy import Column, Integer, String, DDL, event
+from ..database import Base
+
+# Number of rows in documents
+DOCUMENT_COUNT = "documents"
+# Bumped by every insert, update and delete on documents
+DOCUMENT_VERSION = "documents_version"
+# Unix time of the last insert, update or delete on documents
+DOCUMENT_MODIFIED_AT = "documents_modified_at"
+
+class Counter(Base):
+    """Named counters maintained by triggers in the same transaction as the writes they count"""
+    __tablename__ = "counters"
+
+    name = Column(String(64), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<Counter {self.name}={self.value}>"
+
+event.listen(
+    Counter.__table__,
+    "after_create",
+    DDL(
+        f"INSERT INTO counters (name, value) VALUES "
+        f"('{DOCUMENT_COUNT}', 0), ('{DOCUMENT_VERSION}', 0), ('{DOCUMENT_MODIFIED_AT}', 0)"
+    ),
+)
@@ -1,15 +1,186 @@
 # app/models/document.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, DDL, Index, event, func, insert, select
+from sqlalchemy.orm import column_property, validates
 from ..database import Base
+from .blob import ContentBlob
+from .counter import Counter, DOCUMENT_COUNT, DOCUMENT_MODIFIED_AT, DOCUMENT_VERSION  # noqa: F401  (counters must exist before the triggers)
+from .change import CHANGE_CREATE, CHANGE_DELETE, CHANGE_UPDATE, DocumentChange  # noqa: F401  (the change log must exist before the triggers)
+
+# Number of characters of content kept in the persisted preview column
+PREVIEW_LENGTH = 200
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Composite (sort key, id) indexes serve sorted pages and keyset seeks
+        Index("ix_documents_name_id", "name", "id"),
+        Index("ix_documents_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
-    content = Column(Text, nullable=False)
+    # Content lives in content_blobs, shared by every document with the same body
+    content_hash = Column(String(64), ForeignKey("content_blobs.hash"), nullable=False, index=True)
+    # Derived from content on write so listings never have to load it:
+    # uncompressed and stored byte lengths
+    size = Column(Integer, nullable=False, default=0, server_default="0")
+    stored_size = Column(Integer, nullable=False, default=0, server_default="0")
+    preview = Column(String(PREVIEW_LENGTH), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Decompressed in SQL by content_text(); loaded only when asked for.
+    # Assigning it stores the blob on flush.
+    content = column_property(
+        select(func.content_text(ContentBlob.data, ContentBlob.compression))
+        .where(ContentBlob.hash == content_hash)
+        .scalar_subquery(),
+        deferred=True,
+    )
+
+    @staticmethod
+    def content_stats(content: str) -> tuple[dict, dict]:
+        """
+        Column values derived from content and the content_blobs row that
+        stores it, for writes that bypass the ORM
+        """
+        blob = ContentBlob.from_content(content)
+        columns = {
+            "content_hash": blob["hash"],
+            "size": blob["size"],
+            "stored_size": blob["stored_size"],
+            "preview": content[:PREVIEW_LENGTH],
+        }
+        return columns, blob
+
+    @validates("content")
+    def _sync_content_stats(self, key, content):
+        columns, self._pending_blob = self.content_stats(content)
+        for column, value in columns.items():
+            setattr(self, column, value)
+        return content
 
     def __repr__(self):
         return f"<Document {self.name}>"
+
+# Composite indexes on expressions and on the persisted size, for the
+# case-insensitive name and size sorts
+Index("ix_documents_lower_name_id", func.lower(Document.name), Document.id)
+Index("ix_documents_size_id", Document.size, Document.id)
+
+def insert_blobs():
+    """INSERT for content_blobs rows that skips bodies already stored"""
+    return insert(ContentBlob).prefix_with("OR IGNORE", dialect="sqlite")
+
+@event.listens_for(Document, "before_insert")
+@event.listens_for(Document, "before_update")
+def _store_pending_blob(mapper, connection, target):
+    blob = target.__dict__.pop("_pending_blob", None)
+    if blob is not None:
+        connection.execute(insert_blobs(), [blob])
+
+# Full-text index (SQLite FTS5) over name and content. It is an external
+# content table reading from the documents_content view, so it stores
+# only the index.
+FTS_DDL = (
+    """
+    CREATE VIEW IF NOT EXISTS documents_content AS
+    SELECT documents.id AS id, documents.name AS name,
+           content_text(content_blobs.data, content_blobs.compression) AS content
+    FROM documents JOIN content_blobs ON content_blobs.hash = documents.content_hash
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+        name, content,
+        content='documents_content', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+    """,
+)
+
+# Blob reference counts and the FTS index, kept in sync with every insert,
+# update and delete on documents. Both live in the same triggers so the
+# index entry is removed before an unreferenced blob is.
+CONTENT_DDL = (
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_content_ai AFTER INSERT ON documents BEGIN
+        UPDATE content_blobs SET refcount = refcount + 1 WHERE hash = new.content_hash;
+        INSERT INTO documents_fts(rowid, name, content)
+        SELECT new.id, new.name, content_text(data, compression)
+        FROM content_blobs WHERE hash = new.content_hash;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_content_ad AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, name, content)
+        SELECT 'delete', old.id, old.name, content_text(data, compression)
+        FROM content_blobs WHERE hash = old.content_hash;
+        UPDATE content_blobs SET refcount = refcount - 1 WHERE hash = old.content_hash;
+        DELETE FROM content_blobs WHERE hash = old.content_hash AND refcount <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_content_au AFTER UPDATE OF name, content_hash ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, name, content)
+        SELECT 'delete', old.id, old.name, content_text(data, compression)
+        FROM content_blobs WHERE hash = old.content_hash;
+        UPDATE content_blobs SET refcount = refcount + 1 WHERE hash = new.content_hash;
+        UPDATE content_blobs SET refcount = refcount - 1 WHERE hash = old.content_hash;
+        DELETE FROM content_blobs WHERE hash = old.content_hash AND refcount <= 0;
+        INSERT INTO documents_fts(rowid, name, content)
+        SELECT new.id, new.name, content_text(data, compression)
+        FROM content_blobs WHERE hash = new.content_hash;
+    END
+    """,
+)
+
+# Document count, collection version and last modification time, maintained
+# transactionally so listings can report totals and validators without
+# scanning the table.
+_TOUCH_COLLECTION = f"""
+        UPDATE counters SET value = value + 1 WHERE name = '{DOCUMENT_VERSION}';
+        UPDATE counters SET value = CAST((julianday('now') - 2440587.5) * 86400 AS INTEGER) WHERE name = '{DOCUMENT_MODIFIED_AT}';
+"""
+
+COUNTER_DDL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_counters_ai AFTER INSERT ON documents BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = '{DOCUMENT_COUNT}';{_TOUCH_COLLECTION}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_counters_ad AFTER DELETE ON documents BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = '{DOCUMENT_COUNT}';{_TOUCH_COLLECTION}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_counters_au AFTER UPDATE ON documents BEGIN{_TOUCH_COLLECTION}
+    END
+    """,
+)
+
+# Change feed log: one row per insert, delete and metadata update
+_LOG_CHANGE = """
+        INSERT INTO document_changes (op, document_id, name, size, created_at, updated_at)
+        VALUES ('{op}', {row}.id, {row}.name, {row}.size, {row}.created_at, {row}.updated_at);
+"""
+
+CHANGE_DDL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_changes_ai AFTER INSERT ON documents BEGIN{_LOG_CHANGE.format(op=CHANGE_CREATE, row="new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_changes_ad AFTER DELETE ON documents BEGIN{_LOG_CHANGE.format(op=CHANGE_DELETE, row="old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS documents_changes_au AFTER UPDATE OF name, content_hash ON documents BEGIN{_LOG_CHANGE.format(op=CHANGE_UPDATE, row="new")}
+    END
+    """,
+)
+
+# Run by create_all; the migrations keep their own copies as of their revision
+for statement in FTS_DDL + CONTENT_DDL + COUNTER_DDL + CHANGE_DDL:
+    event.listen(Document.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in ("DROP TABLE IF EXISTS documents_fts", "DROP VIEW IF EXISTS documents_content"):
+    event.listen(Document.__table__, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
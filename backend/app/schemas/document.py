@@ -1,7 +1,7 @@
 # app/schemas/document.py
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, Field, constr, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional, Union
 
 class DocumentBase(BaseModel):
     name: constr(min_length=1, max_length=255) # type: ignore
@@ -18,10 +18,112 @@ class Document(DocumentBase):
     created_at: datetime
     updated_at: datetime
     size: int
+    # Highlighted match fragment (escaped HTML, hits in <mark>), only set on search results
+    snippet: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+class SimilarDocument(BaseModel):
+    id: int
+    name: str
+    # Estimated Jaccard similarity of the contents (1.0 for identical content)
+    similarity: float
+
+class DocumentCreated(Document):
+    # Existing near-duplicates, only when asked for with ?similar=
+    similar: Optional[list[SimilarDocument]] = None
+
+class SimilarDocumentsResponse(BaseModel):
+    document_id: int
+    similar: list[SimilarDocument]
+
+class DocumentSummary(BaseModel):
+    """Document metadata returned by listings that exclude content"""
+    id: int
+    name: str
+    created_at: datetime
+    updated_at: datetime
+    size: int
+    preview: Optional[str] = None
+    snippet: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class BulkItemResult(BaseModel):
+    """Outcome of one item of a bulk request, by its position in the input"""
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkItemResult]
+
 class DocumentResponse(BaseModel):
-    documents: list[Document]
-    total: int
\ No newline at end of file
+    # Only the requested fields of each document with ?fields=
+    documents: list[Union[Document, DocumentSummary, dict[str, Any]]]
+    # None when the client asked for include_total=false
+    total: Optional[int] = None
+    # True when total came from a cached count that may predate recent writes
+    total_is_estimate: bool = False
+    # Pass back as ?cursor= to fetch the following page; None on the last page
+    next_cursor: Optional[str] = None
+
+class BatchFetchRequest(BaseModel):
+    ids: list[int] = Field(min_length=1)
+    include_content: bool = True
+
+class BatchDocumentsResponse(BaseModel):
+    # Found documents in the order their ids were requested
+    documents: list[Union[Document, DocumentSummary]]
+    missing: list[int]
+
+class BatchDeleteRequest(BaseModel):
+    """Delete the given ids, or every document matching a search"""
+    ids: Optional[list[int]] = Field(None, min_length=1)
+    search: Optional[constr(min_length=1)] = None # type: ignore
+
+    @model_validator(mode="after")
+    def _one_selector(self):
+        if (self.ids is None) == (self.search is None):
+            raise ValueError("Give exactly one of ids or search")
+        return self
+
+class BatchDeleteResponse(BaseModel):
+    deleted: int
+    deleted_ids: list[int]
+    # Requested ids that did not exist
+    missing: list[int]
+
+class DocumentChange(BaseModel):
+    """A change feed entry: the document's metadata as of the change"""
+    seq: int
+    op: str
+    id: int
+    name: str
+    size: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    changed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class DocumentChangesResponse(BaseModel):
+    changes: list[DocumentChange]
+    # Pass back as ?since= to continue after the last change
+    last_seq: int
+    # True when since is no longer in the log: reload, then continue from last_seq
+    reset: bool = False
+
+class AutocompleteSuggestion(BaseModel):
+    id: int
+    name: str
+    # Trigram similarity (0-1), plus 1 for a name prefix or 0.5 for a word prefix
+    score: float
+
+class AutocompleteResponse(BaseModel):
+    suggestions: list[AutocompleteSuggestion]
@@ -0,0 +1,400 @@
+# app/services/autocomplete.py
+import asyncio
+import logging
+import re
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from heapq import nlargest, nsmallest
+from typing import Iterable, NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from ..core.config import settings
+from ..core.loops import LoopBound
+from ..models.change import CHANGE_DELETE
+from ..models.document import Document
+from . import changes
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+# Vocabulary words a query word may stand for, and how similar (Dice
+# coefficient of their trigrams) they must be
+WORD_MATCHES = 3
+WORD_MIN_SIMILARITY = 0.3
+# Shortest names kept per common word: the best matches for few words
+SHORTEST = 16
+# Candidates given the substring bonus and ranked per query
+PRESELECT = 64
+# Rows per batch while building
+BUILD_BATCH_SIZE = 10_000
+
+def normalize(text: str) -> str:
+    """Case-folded words separated by single spaces"""
+    return " ".join(_WORD.findall(text.casefold()))
+
+def word_trigrams(word: str) -> set[str]:
+    """Trigrams of a word, padded like pg_trgm ("  w", " wo", "wor", "ord", "rd ")"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def trigrams(text: str) -> set[str]:
+    """Trigrams of each word of text"""
+    return set().union(*map(word_trigrams, _WORD.findall(text.casefold())))
+
+class Suggestion(NamedTuple):
+    id: int
+    name: str
+    score: float
+
+class NameIndex:
+    """
+    Document names indexed for autocomplete: a sorted list of normalized
+    names for prefix matching, and an inverted index of name words for
+    typo-tolerant matching.
+
+    A query word stands for the vocabulary words most similar to it by
+    trigrams (numbers only for themselves); the vocabulary is small next
+    to the names. Postings are arrays of ids in ascending order, so
+    membership is a bisection and the names matching every query word are
+    found by intersecting id ranges of them, newest first, reading about
+    as many entries as the results need however common the words are. The
+    shortest names of each common word are kept too, since they score
+    highest whatever their age. Each name's trigram count is kept in a
+    byte array indexed by id, so ranking needs no per-query trigram
+    extraction. Not thread-safe; it is built off the event loop and only
+    mutated on it afterwards.
+    """
+
+    def __init__(self):
+        self.names: dict[int, str] = {}
+        self._postings: dict[str, array] = {}
+        # (trigram count, id) of the SHORTEST shortest names of words with more
+        self._shortest: dict[str, list[tuple[int, int]]] = {}
+        # Trigram count of each word with letters, and the words per trigram
+        self._vocabulary: dict[str, int] = {}
+        self._vocabulary_grams: dict[str, set[str]] = {}
+        self._gram_counts = array("B")
+        self._sorted_keys: list[str] = []
+        self._sorted_ids: list[int] = []
+        self._pending: list[tuple[str, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def extend(self, rows: Iterable) -> None:
+        """Bulk load (id, name) rows in ascending id order; call finish() after the last batch"""
+        postings = self._postings
+        for document_id, name in rows:
+            self.names[document_id] = name
+            key = normalize(name)
+            self._set_gram_count(document_id, len(trigrams(key)))
+            for word in set(key.split()):
+                posting = postings.get(word)
+                if posting is None:
+                    posting = postings[word] = array("q")
+                    self._add_word(word)
+                posting.append(document_id)
+            self._pending.append((key, document_id))
+
+    def _set_gram_count(self, document_id: int, count: int) -> None:
+        """Record a name's trigram count"""
+        if document_id >= len(self._gram_counts):
+            self._gram_counts.frombytes(bytes(document_id + 1 - len(self._gram_counts)))
+        self._gram_counts[document_id] = min(count, 255)
+
+    def _add_word(self, word: str) -> None:
+        if word.isdigit():
+            return
+        grams = word_trigrams(word)
+        self._vocabulary[word] = len(grams)
+        for gram in grams:
+            self._vocabulary_grams.setdefault(gram, set()).add(word)
+
+    def _remove_word(self, word: str) -> None:
+        self._shortest.pop(word, None)
+        if self._vocabulary.pop(word, None) is None:
+            return
+        for gram in word_trigrams(word):
+            words = self._vocabulary_grams[gram]
+            words.discard(word)
+            if not words:
+                del self._vocabulary_grams[gram]
+
+    def finish(self) -> None:
+        gram_counts = self._gram_counts
+        for word, posting in self._postings.items():
+            if len(posting) > SHORTEST:
+                self._shortest[word] = nsmallest(
+                    SHORTEST, ((gram_counts[document_id], document_id) for document_id in posting)
+                )
+        self._pending.sort()
+        self._sorted_keys = [key for key, _ in self._pending]
+        self._sorted_ids = [document_id for _, document_id in self._pending]
+        self._pending = []
+
+    def add(self, document_id: int, name: str) -> None:
+        current = self.names.get(document_id)
+        if current == name:
+            return
+        if current is not None:
+            self.remove(document_id)
+        self.names[document_id] = name
+        key = normalize(name)
+        self._set_gram_count(document_id, len(trigrams(key)))
+        item = (self._gram_counts[document_id], document_id)
+        for word in set(key.split()):
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = array("q")
+                self._add_word(word)
+            insort(posting, document_id)
+            shortest = self._shortest.get(word)
+            if shortest is None and len(posting) > SHORTEST:
+                shortest = self._shortest[word] = nsmallest(
+                    SHORTEST, ((self._gram_counts[other], other) for other in posting)
+                )
+            elif shortest is not None and (len(shortest) < SHORTEST or item < shortest[-1]):
+                insort(shortest, item)
+                del shortest[SHORTEST:]
+        position = bisect_right(self._sorted_keys, key)
+        self._sorted_keys.insert(position, key)
+        self._sorted_ids.insert(position, document_id)
+
+    def remove(self, document_id: int) -> None:
+        name = self.names.pop(document_id, None)
+        if name is None:
+            return
+        key = normalize(name)
+        item = (self._gram_counts[document_id], document_id)
+        for word in set(key.split()):
+            posting = self._postings[word]
+            position = bisect_left(posting, document_id)
+            if position < len(posting) and posting[position] == document_id:
+                del posting[position]
+            if not posting:
+                del self._postings[word]
+                self._remove_word(word)
+            elif item in self._shortest.get(word, ()):
+                # Refilled from the posting rather than left one short
+                self._shortest[word] = nsmallest(
+                    SHORTEST, ((self._gram_counts[other], other) for other in posting)
+                )
+        position = bisect_left(self._sorted_keys, key)
+        while self._sorted_ids[position] != document_id:
+            position += 1
+        del self._sorted_keys[position]
+        del self._sorted_ids[position]
+
+    def _word_matches(self, word: str) -> list[tuple[str, int]]:
+        """
+        Vocabulary words a query word may stand for, most similar first,
+        each with the number of trigrams it shares with it
+        """
+        grams = word_trigrams(word)
+        if word.isdigit():
+            return [(word, len(grams))] if word in self._postings else []
+        shared: Counter = Counter()
+        for gram in grams:
+            words = self._vocabulary_grams.get(gram)
+            if words:
+                shared.update(words)
+        similar = []
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + self._vocabulary[candidate])
+            if similarity >= WORD_MIN_SIMILARITY:
+                similar.append((similarity, count, candidate))
+        return [(candidate, count) for _, count, candidate in nlargest(WORD_MATCHES, similar)]
+
+    @staticmethod
+    def _lookup(options: list[tuple[array, int]], document_id: int) -> int:
+        """Trigrams shared through a query word when the name has one of its matches, else 0"""
+        for posting, count in options:
+            position = bisect_left(posting, document_id)
+            if position < len(posting) and posting[position] == document_id:
+                return count
+        return 0
+
+    def _shared_trigrams(self, words: list[str], limit: int) -> dict[int, int]:
+        """
+        Names matching the query words, with the number of query trigrams
+        their matched words share: the newest names matching every word,
+        found by intersecting the postings an id range at a time (the
+        range holding the next limit entries of the rarest word, doubled
+        every step, until AUTOCOMPLETE_CANDIDATE_BUDGET entries have been
+        read), and the shortest names of each matched word, scored by
+        looking up the other words, which also finds names missing one.
+        """
+        matches = [matches for matches in map(self._word_matches, dict.fromkeys(words)) if matches]
+        shared: dict[int, int] = {}
+        if not matches:
+            return shared
+        matches.sort(key=lambda options: sum(len(self._postings[word]) for word, _ in options))
+        groups = [[(self._postings[word], count) for word, count in options] for options in matches]
+        bounds = [[len(posting) for posting, _ in options] for options in groups]
+        budget = settings.AUTOCOMPLETE_CANDIDATE_BUDGET
+        chunk = limit
+        low = None
+        while low != 0 and budget > 0 and len(shared) < limit:
+            low = max(
+                posting[bound - chunk] if bound > chunk else 0
+                for (posting, _), bound in zip(groups[0], bounds[0])
+            )
+            found = []
+            for options, option_bounds in zip(groups, bounds):
+                # Least similar first, so a better match overwrites its count
+                counts: dict[int, int] = {}
+                for index in reversed(range(len(options))):
+                    posting, count = options[index]
+                    start = bisect_left(posting, low, 0, option_bounds[index])
+                    counts.update(dict.fromkeys(posting[start:option_bounds[index]], count))
+                    budget -= option_bounds[index] - start
+                    option_bounds[index] = start
+                found.append(counts)
+            for document_id in set(found[0]).intersection(*found[1:]):
+                shared[document_id] = sum(counts[document_id] for counts in found)
+            chunk *= 2
+
+        for lead, options in enumerate(matches):
+            others = groups[:lead] + groups[lead + 1:]
+            for word, count in options:
+                shortest = self._shortest.get(word)
+                candidates = [other for _, other in shortest] if shortest else self._postings[word]
+                for candidate in candidates:
+                    if candidate not in shared:
+                        shared[candidate] = count + sum(self._lookup(other, candidate) for other in others)
+        return shared
+
+    def search(self, query: str, limit: int) -> list[Suggestion]:
+        key = normalize(query)
+        if not key:
+            return []
+        query_grams = len(trigrams(key))
+        # Names starting with the query: enough of them are the answer
+        prefixed = []
+        position = bisect_left(self._sorted_keys, key)
+        end = min(len(self._sorted_keys), position + limit)
+        while position < end and self._sorted_keys[position].startswith(key):
+            prefixed.append(self._sorted_ids[position])
+            position += 1
+        shared = self._shared_trigrams(key.split(), limit) if len(prefixed) < limit else {}
+        # A prefix shares (about) every query trigram
+        shared.update(dict.fromkeys(prefixed, query_grams))
+
+        def dice(document_id: int) -> float:
+            return 2 * shared[document_id] / (query_grams + self._gram_counts[document_id])
+
+        scored = []
+        prefixed = set(prefixed)
+        for document_id in nlargest(PRESELECT, shared, key=dice):
+            score = dice(document_id)
+            if document_id in prefixed:
+                score += 1.0
+            elif shared[document_id] >= query_grams - 1 and f" {key}" in f" {normalize(self.names[document_id])}":
+                score += 0.5
+            if score >= settings.AUTOCOMPLETE_MIN_SIMILARITY:
+                scored.append((-score, len(self.names[document_id]), document_id))
+        return [
+            Suggestion(document_id, self.names[document_id], round(-score, 4))
+            for score, _, document_id in nsmallest(limit, scored)
+        ]
+
+class Autocomplete(LoopBound):
+    """
+    The process's name index: built in the background on first use (or at
+    startup), then kept current by following the change feed, which also
+    carries writes made by other workers. Endpoints in this process apply
+    their own creates and deletes directly so they are visible at once;
+    replays of those changes from the feed are no-ops.
+    """
+
+    def __init__(self):
+        self.index = NameIndex()
+        self.last_seq = 0
+        self._built = False
+        self._build_task: Optional[asyncio.Task] = None
+        self._follower: Optional[asyncio.Task] = None
+        self._warm_task: Optional[asyncio.Task] = None
+
+    def start(self, session_factory: async_sessionmaker) -> None:
+        """Build the index in the background (at startup)"""
+        self._warm_task = asyncio.create_task(self._warm(session_factory))
+
+    async def _warm(self, session_factory: async_sessionmaker) -> None:
+        try:
+            await self.ensure_ready(session_factory)
+        except Exception as e:
+            # Retried on first use
+            logger.error(f"Error building autocomplete index: {str(e)}")
+
+    def _reset_loop_state(self) -> None:
+        self._build_task = self._follower = None
+
+    async def ensure_ready(self, session_factory: async_sessionmaker) -> NameIndex:
+        self._bind_loop()
+        if not self._built:
+            if self._build_task is None or self._build_task.done():
+                self._build_task = asyncio.create_task(self._build(session_factory))
+            await asyncio.shield(self._build_task)
+        if self._follower is None or self._follower.done():
+            self._follower = asyncio.create_task(self._follow(session_factory))
+        return self.index
+
+    def add(self, document_id: int, name: str) -> None:
+        if self._built:
+            self.index.add(document_id, name)
+
+    def remove(self, document_id: int) -> None:
+        if self._built:
+            self.index.remove(document_id)
+
+    async def reset(self) -> None:
+        """Drop the index and stop following changes; the next use rebuilds it"""
+        loop = asyncio.get_running_loop()
+        tasks = [task for task in (self._warm_task, self._build_task, self._follower) if task is not None]
+        for task in tasks:
+            if not task.get_loop().is_closed():
+                task.cancel()
+        # Wait for this loop's tasks to unwind, so their sessions are closed
+        await asyncio.gather(*(task for task in tasks if task.get_loop() is loop), return_exceptions=True)
+        self.index, self.last_seq, self._built = NameIndex(), 0, False
+        self._warm_task = self._build_task = self._follower = None
+
+    async def _build(self, session_factory: async_sessionmaker) -> None:
+        index = NameIndex()
+        async with session_factory() as db:
+            # Changes after this seq are replayed on top of the snapshot
+            seq = await changes.head_seq(db)
+            result = await db.stream(
+                select(Document.id, Document.name)
+                .order_by(Document.id)
+                .execution_options(yield_per=BUILD_BATCH_SIZE)
+            )
+            async for rows in result.partitions():
+                # Trigram extraction is CPU-bound; keep it off the event loop
+                await asyncio.to_thread(index.extend, rows)
+        await asyncio.to_thread(index.finish)
+        self.index, self.last_seq, self._built = index, seq, True
+        logger.info(f"Autocomplete index built over {len(index)} document names")
+
+    async def _follow(self, session_factory: async_sessionmaker) -> None:
+        while True:
+            try:
+                async for change in changes.stream_changes(session_factory, self.last_seq):
+                    if isinstance(change, changes.Reset):
+                        await self._build(session_factory)
+                        break
+                    if change is None:
+                        continue
+                    if change.op == CHANGE_DELETE:
+                        self.index.remove(change.id)
+                    else:
+                        self.index.add(change.id, change.name)
+                    self.last_seq = change.seq
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error following document changes for autocomplete: {str(e)}")
+                await asyncio.sleep(settings.CHANGE_FEED_POLL_SECONDS)
+
+autocomplete = Autocomplete()
@@ -0,0 +1,35 @@
+# app/services/batch.py
+from typing import Iterable, Iterator, Sequence
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..models.document import Document
+
+def unique_ids(ids: Iterable[int]) -> list[int]:
+    """Ids without duplicates, in first-seen order"""
+    return list(dict.fromkeys(ids))
+
+def chunked(ids: Sequence[int], size: int = settings.BATCH_CHUNK_SIZE) -> Iterator[Sequence[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+async def fetch_rows(db: AsyncSession, ids: Sequence[int], columns) -> dict[int, object]:
+    """Rows of the given columns (which must include Document.id) by id, one IN query per chunk"""
+    rows = {}
+    for chunk in chunked(ids):
+        result = await db.execute(select(*columns).where(Document.id.in_(chunk)))
+        rows.update((row.id, row) for row in result)
+    return rows
+
+async def delete_ids(db: AsyncSession, ids: Sequence[int]) -> list[int]:
+    """
+    Delete documents by id with one DELETE ... WHERE id IN per chunk.
+
+    Returns the ids that existed and were deleted. The caller owns the
+    transaction, so all chunks commit or roll back together.
+    """
+    deleted = []
+    for chunk in chunked(ids):
+        result = await db.execute(delete(Document).where(Document.id.in_(chunk)).returning(Document.id))
+        deleted.extend(result.scalars())
+    return deleted
@@ -0,0 +1,214 @@
+# app/services/blobs.py
+import codecs
+import hashlib
+import tempfile
+import zlib
+from typing import AsyncIterator
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.minhash import MinHasher
+from ..database import run_on_driver_connection
+from ..models.blob import (
+    COMPRESSION_NONE,
+    COMPRESSION_ZLIB,
+    COMPRESSION_ZSTD,
+    ContentBlob,
+    compressobj,
+    content_compression,
+    zstandard,
+)
+from ..models.document import PREVIEW_LENGTH, insert_blobs
+
+class InvalidContent(ValueError):
+    """Raised when uploaded content is not UTF-8 text"""
+
+class ContentTooLarge(InvalidContent):
+    """Raised when an upload exceeds UPLOAD_MAX_BYTES"""
+
+class BlobUpload:
+    """
+    Content received in chunks, spooled to a temporary file while its
+    SHA-256, size, preview, MinHash signature and compressed form are
+    computed incrementally.
+
+    Memory use is bounded by the chunk size and UPLOAD_SPOOL_MAX_BYTES;
+    larger content spills to disk.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._minhash = MinHasher()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._preview = ""
+        self._raw = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_BYTES)
+        self._compressed = None
+        self._compressor = None
+        self.compression = content_compression()
+        if self.compression != COMPRESSION_NONE:
+            self._compressor = compressobj(self.compression)
+            self._compressed = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_BYTES)
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > settings.UPLOAD_MAX_BYTES:
+            raise ContentTooLarge(f"Content exceeds {settings.UPLOAD_MAX_BYTES} bytes")
+        try:
+            text = self._decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise InvalidContent("Content must be UTF-8 text")
+        if len(self._preview) < PREVIEW_LENGTH:
+            self._preview += text[:PREVIEW_LENGTH - len(self._preview)]
+        self._sha256.update(chunk)
+        self._minhash.update(text)
+        self._raw.write(chunk)
+        if self._compressor is not None:
+            self._compressed.write(self._compressor.compress(chunk))
+
+    def finish(self) -> dict:
+        """
+        Complete the upload. Returns the content_blobs row without its data;
+        read the stored bytes with read_stored() afterwards.
+        """
+        try:
+            self._minhash.update(self._decoder.decode(b"", final=True))
+        except UnicodeDecodeError:
+            raise InvalidContent("Content must be UTF-8 text")
+        stored, compression = self._raw, COMPRESSION_NONE
+        if self._compressor is not None:
+            self._compressed.write(self._compressor.flush())
+            if self.size >= settings.CONTENT_COMPRESSION_MIN_BYTES and self._compressed.tell() < self.size:
+                stored, compression = self._compressed, self.compression
+        self._stored = stored
+        self._stored_size = stored.tell()
+        stored.seek(0)
+        return {
+            "hash": self._sha256.hexdigest(),
+            "compression": compression,
+            "size": self.size,
+            "stored_size": self._stored_size,
+            "signature": self._minhash.digest(),
+        }
+
+    @property
+    def preview(self) -> str:
+        return self._preview
+
+    def read_stored(self, size: int = -1) -> bytes:
+        return self._stored.read(size)
+
+    def close(self) -> None:
+        self._raw.close()
+        if self._compressed is not None:
+            self._compressed.close()
+
+async def store_upload(db: AsyncSession, upload: BlobUpload, blob: dict) -> None:
+    """
+    Store a finished upload in content_blobs unless the body is already
+    there. On SQLite the data is written with incremental blob I/O in
+    CONTENT_CHUNK_BYTES pieces, so it is never held in memory whole.
+    The caller owns the transaction.
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        await db.execute(insert_blobs(), [{**blob, "data": upload.read_stored()}])
+        return
+    result = await db.execute(insert_blobs().values(data=func.zeroblob(blob["stored_size"]), **blob))
+    if result.rowcount == 0 or blob["stored_size"] == 0:
+        return
+    rowid = await db.scalar(
+        select(literal_column("rowid")).select_from(ContentBlob).where(ContentBlob.hash == blob["hash"])
+    )
+
+    def write_blob(connection):
+        with connection.blobopen("content_blobs", "data", rowid) as stored:
+            while chunk := upload.read_stored(settings.CONTENT_CHUNK_BYTES):
+                stored.write(chunk)
+
+    await run_on_driver_connection(db, write_blob)
+
+class _BlobReader:
+    """
+    Reads bytes [start, end) of a blob's uncompressed content through an
+    open sqlite3 Blob. Runs on the connection's thread, one chunk per call.
+    """
+
+    def __init__(self, connection, rowid: int, compression: str, start: int, end: int):
+        self._blob = connection.blobopen("content_blobs", "data", rowid, readonly=True)
+        self._remaining = end - start
+        self._skip = start
+        self._zlib = None
+        self._zstd = None
+        if compression == COMPRESSION_NONE:
+            self._blob.seek(start)
+            self._skip = 0
+        elif compression == COMPRESSION_ZLIB:
+            self._zlib = zlib.decompressobj()
+        elif compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Reading zstd-compressed content requires the zstandard package")
+            self._zstd = zstandard.ZstdDecompressor().stream_reader(self._blob)
+
+    def _read_uncompressed(self, size: int) -> bytes:
+        # Output is capped at size so highly compressible input cannot
+        # expand into a large buffer
+        if self._zstd is not None:
+            return self._zstd.read(size)
+        if self._zlib is None:
+            return self._blob.read(size)
+        while True:
+            data = self._zlib.unconsumed_tail or self._blob.read(settings.CONTENT_CHUNK_BYTES)
+            if not data:
+                return b""
+            chunk = self._zlib.decompress(data, size)
+            if chunk:
+                return chunk
+
+    def read_chunk(self) -> bytes:
+        size = settings.CONTENT_CHUNK_BYTES
+        # Compressed content has no random access: decode and drop the prefix
+        while self._skip:
+            skipped = self._read_uncompressed(min(size, self._skip))
+            if not skipped:
+                return b""
+            self._skip -= len(skipped)
+        if self._remaining <= 0:
+            return b""
+        chunk = self._read_uncompressed(min(size, self._remaining))
+        self._remaining -= len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        self._blob.close()
+
+async def stream_blob(
+    db: AsyncSession,
+    content_hash: str,
+    compression: str,
+    start: int,
+    end: int
+) -> AsyncIterator[bytes]:
+    """Yield bytes [start, end) of a blob's content in CONTENT_CHUNK_BYTES pieces"""
+    chunk_size = settings.CONTENT_CHUNK_BYTES
+    if db.get_bind().dialect.name != "sqlite":
+        data = await db.scalar(select(ContentBlob.data).where(ContentBlob.hash == content_hash))
+        content = ContentBlob.content_text(data, compression).encode("utf-8")
+        for offset in range(start, end, chunk_size):
+            yield content[offset:min(end, offset + chunk_size)]
+        return
+
+    rowid = await db.scalar(
+        select(literal_column("rowid")).select_from(ContentBlob).where(ContentBlob.hash == content_hash)
+    )
+    if rowid is None or start >= end:
+        return
+    reader = await run_on_driver_connection(
+        db, lambda connection: _BlobReader(connection, rowid, compression, start, end)
+    )
+    try:
+        while chunk := await run_on_driver_connection(db, lambda connection: reader.read_chunk()):
+            yield chunk
+    finally:
+        await run_on_driver_connection(db, lambda connection: reader.close())
@@ -0,0 +1,227 @@
+# app/services/cache.py
+import importlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from ..core.config import settings
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with optional per-entry time to live.
+
+    Bounded by entry count and, when a sizeof function is given, by the
+    total size of the stored values. Least recently used entries are
+    evicted first; expired entries are dropped lazily when read.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: OrderedDict[Hashable, tuple[Optional[float], int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class Invalidations:
+    """
+    Per-key invalidation generations for cache-aside fills.
+
+    A reader takes token() before reading the source and only stores what
+    it read if is_current() still holds; a writer calls invalidate() after
+    committing, next to the cache delete. A read that saw the row from
+    before a concurrent write therefore cannot cache it after the write's
+    delete. Bounded by max_keys: the oldest keys are forgotten, and a
+    forgotten key counts as invalidated when the newest forgotten one was.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._generation = 0
+        self._forgotten = 0
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidated.pop(key, None)
+            self._invalidated[key] = self._generation
+            while len(self._invalidated) > self.max_keys:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def is_current(self, key: Hashable, token: int) -> bool:
+        with self._lock:
+            return self._invalidated.get(key, self._forgotten) <= token
+
+class CacheBackend(ABC):
+    """
+    Interface for caches of serialized responses.
+
+    Methods are async so a shared backend (e.g. Redis, for several uvicorn
+    workers) can do network I/O without blocking the event loop. Configure
+    one with DOCUMENT_CACHE_BACKEND="package.module:ClassName"; the class
+    is constructed without arguments.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    def stats(self) -> dict:
+        return {}
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU/TTL cache bounded by entry count and total bytes"""
+
+    def __init__(
+        self,
+        max_entries: int = settings.DOCUMENT_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.DOCUMENT_CACHE_MAX_BYTES,
+        ttl: float = settings.DOCUMENT_CACHE_TTL_SECONDS
+    ):
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._cache.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+class NullCacheBackend(CacheBackend):
+    """Caches nothing; every lookup misses"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+def create_backend(name: str) -> CacheBackend:
+    """Build a backend from "memory", "none" or a "module:ClassName" path"""
+    if name == "memory":
+        return MemoryCacheBackend()
+    if name == "none":
+        return NullCacheBackend()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown cache backend {name!r}")
+    backend = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(backend, CacheBackend):
+        raise TypeError(f"{name} is not a CacheBackend")
+    return backend
+
+# Serialized single-document responses, keyed by document_key()
+document_cache: CacheBackend = create_backend(settings.DOCUMENT_CACHE_BACKEND)
+document_invalidations = Invalidations()
+
+def document_key(document_id: int) -> str:
+    return f"document:{document_id}"
+
+async def invalidate_document(document_id: int) -> None:
+    """Drop a document's cached response, and any fill of it still in flight"""
+    key = document_key(document_id)
+    document_invalidations.invalidate(key)
+    await document_cache.delete(key)
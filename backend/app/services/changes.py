@@ -0,0 +1,180 @@
+# app/services/changes.py
+import asyncio
+import logging
+from typing import AsyncIterator, NamedTuple, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from ..core.config import settings
+from ..core.loops import LoopBound
+from ..models.change import DocumentChange
+
+logger = logging.getLogger(__name__)
+
+class Reset(NamedTuple):
+    """
+    The subscriber missed changes (its resume point was pruned, or it fell
+    behind): it must reload its view, then resume after seq
+    """
+    seq: int
+
+CHANGE_COLUMNS = (
+    DocumentChange.seq,
+    DocumentChange.op,
+    DocumentChange.document_id.label("id"),
+    DocumentChange.name,
+    DocumentChange.size,
+    DocumentChange.created_at,
+    DocumentChange.updated_at,
+    DocumentChange.changed_at,
+)
+
+async def head_seq(db: AsyncSession) -> int:
+    """Sequence number of the newest change, 0 if there are none"""
+    return await db.scalar(select(func.coalesce(func.max(DocumentChange.seq), 0)))
+
+async def fetch_changes(db: AsyncSession, since: int, limit: int) -> list:
+    """Changes after since, oldest first"""
+    result = await db.execute(
+        select(*CHANGE_COLUMNS).where(DocumentChange.seq > since).order_by(DocumentChange.seq).limit(limit)
+    )
+    return result.all()
+
+async def can_resume(db: AsyncSession, since: int) -> bool:
+    """
+    Whether every change after since is still in the log. False when the
+    pruned part is needed, or since is ahead of the log (another database).
+    """
+    oldest, newest = (await db.execute(
+        select(func.min(DocumentChange.seq), func.max(DocumentChange.seq))
+    )).one()
+    if newest is None:
+        return since == 0
+    return oldest - 1 <= since <= newest
+
+class ChangeHub(LoopBound):
+    """
+    Fans document changes out to every subscriber in this process.
+
+    One poller task reads new rows from document_changes and puts them on
+    each subscriber's queue, so open feeds cost one query per batch of
+    changes rather than one per client. Writes in this process wake the
+    poller through notify(); writes from other workers are picked up
+    within CHANGE_FEED_POLL_SECONDS. The poller stops when the last
+    subscriber leaves.
+    """
+
+    def __init__(self):
+        self._subscribers: set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_seq = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _reset_loop_state(self) -> None:
+        self._lock, self._task = asyncio.Lock(), None
+
+    def notify(self) -> None:
+        """Wake the poller after a committed write"""
+        if self._task is not None and not self._task.done():
+            self._wakeup.set()
+
+    async def subscribe(self, session_factory: async_sessionmaker) -> tuple[asyncio.Queue, int]:
+        """
+        Register a subscriber. Returns its queue and the sequence number
+        after which the queue's changes start.
+        """
+        self._bind_loop()
+        async with self._lock:
+            if self._task is None or self._task.done():
+                async with session_factory() as db:
+                    self._last_seq = await head_seq(db)
+                self._wakeup = asyncio.Event()
+                self._subscribers = set()
+                self._task = asyncio.create_task(self._poll(session_factory))
+            queue: asyncio.Queue = asyncio.Queue(maxsize=settings.CHANGE_FEED_QUEUE_SIZE)
+            self._subscribers.add(queue)
+            return queue, self._last_seq
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+        if not self._subscribers:
+            self.notify()
+
+    def _publish(self, change) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop its backlog and tell it to resync
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(Reset(change.seq))
+                self._subscribers.discard(queue)
+
+    async def _poll(self, session_factory: async_sessionmaker) -> None:
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.CHANGE_FEED_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._subscribers:
+                break
+            try:
+                async with session_factory() as db:
+                    changes = await fetch_changes(db, self._last_seq, settings.CHANGE_FEED_BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Error polling document changes: {str(e)}")
+                continue
+            for change in changes:
+                self._publish(change)
+                self._last_seq = change.seq
+            if len(changes) == settings.CHANGE_FEED_BATCH_SIZE:
+                self._wakeup.set()
+
+hub = ChangeHub()
+
+async def stream_changes(
+    session_factory: async_sessionmaker,
+    since: Optional[int]
+) -> AsyncIterator[object]:
+    """
+    Yield changes after since (from now when None): first those already
+    in the log, then live ones. Yields None when CHANGE_FEED_HEARTBEAT_SECONDS
+    pass without a change, and a Reset (then stops) when since is no longer
+    in the log or the subscriber falls behind.
+    """
+    queue, live_after = await hub.subscribe(session_factory)
+    try:
+        last = live_after if since is None else since
+        if since is not None:
+            async with session_factory() as db:
+                resumable = await can_resume(db, since)
+            if not resumable:
+                yield Reset(live_after)
+                return
+            # Replay everything up to where the queue takes over; the queue
+            # may repeat some of it, which is skipped by seq. A session per
+            # batch, so a slow client does not hold a connection.
+            while last < live_after:
+                async with session_factory() as db:
+                    changes = await fetch_changes(db, last, settings.CHANGE_FEED_BATCH_SIZE)
+                if not changes:
+                    break
+                for change in changes:
+                    yield change
+                    last = change.seq
+        while True:
+            try:
+                change = await asyncio.wait_for(queue.get(), settings.CHANGE_FEED_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if isinstance(change, Reset):
+                yield change
+                return
+            if change.seq > last:
+                yield change
+                last = change.seq
+    finally:
+        hub.unsubscribe(queue)
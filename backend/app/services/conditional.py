@@ -0,0 +1,133 @@
+# app/services/conditional.py
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import Response
+
+# Clients may reuse a stored response only after revalidating it
+CACHE_CONTROL = "no-cache"
+
+def as_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def timestamp_us(value: datetime) -> int:
+    """Microseconds since the epoch"""
+    delta = as_utc(value) - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def from_timestamp_us(value: int) -> datetime:
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=value)
+
+def document_etag(document_id: int, updated_at: datetime, fields: Optional[tuple[str, ...]] = None) -> str:
+    """
+    Strong validator for a single document, changed by every update. A
+    sparse representation (?fields=) gets its own.
+    """
+    if fields is None:
+        return f'"{document_id}-{timestamp_us(updated_at)}"'
+    digest = hashlib.blake2b(",".join(fields).encode("utf-8"), digest_size=4).hexdigest()
+    return f'"{document_id}-{timestamp_us(updated_at)}-{digest}"'
+
+def collection_etag(version: int, request: Request) -> str:
+    """
+    Strong validator for a list response: the collection version counter
+    plus a digest of the query parameters that shape the response.
+    """
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(params.encode("utf-8"), digest_size=8).hexdigest()
+    return f'"v{version}-{digest}"'
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(as_utc(last_modified).replace(microsecond=0), usegmt=True)
+    return headers
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2)
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when no If-None-Match is
+    sent, against the current validators.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have one second resolution
+    return as_utc(last_modified).replace(microsecond=0) <= since
+
+def not_modified_response(headers: dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when no byte of a requested range lies within the content"""
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" Range header into [start, end).
+
+    Returns None when the whole content should be sent: no header, an
+    unsupported unit, a malformed value or several ranges, all of which a
+    server may ignore (RFC 9110 14.2).
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start < 0 or (last and end <= start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size)
+
+def if_range_matches(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Whether a Range header may be honoured: If-Range, when sent, must match
+    the current strong ETag or equal the Last-Modified date.
+    """
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    if last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(if_range) == as_utc(last_modified).replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
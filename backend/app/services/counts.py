@@ -0,0 +1,68 @@
+# app/services/counts.py
+import time
+from typing import Hashable, NamedTuple, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..models.counter import Counter, DOCUMENT_COUNT, DOCUMENT_MODIFIED_AT, DOCUMENT_VERSION
+from ..models.document import Document
+from .cache import LRUCache
+
+# Filtered totals by filter key -> (collection version, count, computed at).
+# Entries live for the estimate TTL; exact reads also require a matching
+# version and an age under COUNT_CACHE_TTL_SECONDS.
+_filtered_counts = LRUCache(
+    max_entries=settings.COUNT_CACHE_MAX_ENTRIES,
+    ttl=settings.COUNT_ESTIMATE_TTL_SECONDS,
+)
+
+class CollectionStats(NamedTuple):
+    count: int
+    version: int
+    # Unix time of the last write, 0 if the collection was never written
+    modified_at: int
+
+async def collection_stats(db: AsyncSession) -> CollectionStats:
+    """Return the document count, collection version and last write time from the maintained counters"""
+    result = await db.execute(
+        select(Counter.name, Counter.value)
+        .where(Counter.name.in_((DOCUMENT_COUNT, DOCUMENT_VERSION, DOCUMENT_MODIFIED_AT)))
+    )
+    values = dict(result.all())
+    return CollectionStats(
+        values.get(DOCUMENT_COUNT, 0),
+        values.get(DOCUMENT_VERSION, 0),
+        values.get(DOCUMENT_MODIFIED_AT, 0),
+    )
+
+async def count_rows(db: AsyncSession, query) -> int:
+    """Exact COUNT(*) of the rows a select would return"""
+    return await db.scalar(select(func.count()).select_from(
+        query.with_only_columns(Document.id).order_by(None).subquery()
+    ))
+
+def cached_count(key: Hashable, version: int, allow_stale: bool = False) -> Optional[int]:
+    """
+    Look up a filtered total.
+
+    Exact lookups only accept a count computed for the current collection
+    version within the cache TTL; stale lookups accept any cached count.
+    """
+    entry = _filtered_counts.get(key)
+    if entry is None:
+        return None
+    cached_version, count, computed_at = entry
+    if allow_stale:
+        return count
+    if cached_version != version or time.monotonic() - computed_at > settings.COUNT_CACHE_TTL_SECONDS:
+        return None
+    return count
+
+def store_count(key: Hashable, version: int, count: int) -> None:
+    _filtered_counts.set(key, (version, count, time.monotonic()))
+
+def clear() -> None:
+    _filtered_counts.clear()
+
+def stats() -> dict:
+    return _filtered_counts.stats()
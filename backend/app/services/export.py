@@ -0,0 +1,46 @@
+# app/services/export.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, Sequence
+
+EXPORT_FIELDS = ("id", "name", "created_at", "updated_at", "size")
+EXPORT_FIELDS_WITH_CONTENT = EXPORT_FIELDS + ("content",)
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc).isoformat()
+    return value
+
+def encode_ndjson(rows: Iterable[Sequence], fields: Sequence[str], header: bool = False) -> bytes:
+    lines = [
+        json.dumps(
+            {field: _export_value(value) for field, value in zip(fields, row)},
+            ensure_ascii=False
+        )
+        for row in rows
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+def encode_csv(rows: Iterable[Sequence], fields: Sequence[str], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    writer.writerows([_export_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+ENCODERS = {"ndjson": encode_ndjson, "csv": encode_csv}
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int) -> AsyncIterator[bytes]:
+    """Compress a byte stream on the fly into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
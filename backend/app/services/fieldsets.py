@@ -0,0 +1,45 @@
+# app/services/fieldsets.py
+from typing import Optional
+from ..models.document import Document
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= is empty or names an unknown field"""
+
+# Fields a sparse document response may ask for, and the column each reads
+FIELD_COLUMNS = {
+    "id": Document.id,
+    "name": Document.name,
+    "content": Document.content,
+    "size": Document.size,
+    "created_at": Document.created_at,
+    "updated_at": Document.updated_at,
+    "preview": Document.preview,
+}
+# Not a column: the highlighted match fragment of search results
+SNIPPET = "snippet"
+
+def parse_fields(value: Optional[str]) -> Optional[tuple[str, ...]]:
+    """Requested fields in order, without duplicates; None when every field is wanted"""
+    if value is None:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in FIELD_COLUMNS and field != SNIPPET]
+    if not fields or unknown:
+        raise InvalidFields(
+            f"Unknown fields: {', '.join(unknown)}; available: {', '.join([*FIELD_COLUMNS, SNIPPET])}"
+            if unknown else "fields must name at least one field"
+        )
+    return fields
+
+def columns(fields: tuple[str, ...], *required: str) -> list:
+    """
+    Columns to select for fields, plus the required ones (id is always
+    read; callers need it for cursors and validators). Content is only
+    read, and decompressed, when it is asked for.
+    """
+    names = dict.fromkeys(("id", *required, *fields))
+    return [FIELD_COLUMNS[name] for name in names if name in FIELD_COLUMNS]
+
+def serialize(row, fields: tuple[str, ...]) -> dict:
+    """Only the requested fields of a result row; snippet is None outside searches"""
+    return {field: getattr(row, field, None) for field in fields}
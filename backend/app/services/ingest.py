@@ -0,0 +1,41 @@
+# app/services/ingest.py
+from datetime import datetime, timezone
+from typing import Iterable
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.document import Document, insert_blobs
+from ..schemas.document import DocumentCreate
+
+def document_rows(documents: Iterable[DocumentCreate]) -> tuple[list[dict], list[dict]]:
+    """
+    Insert parameters for validated documents, including derived columns,
+    and the distinct content_blobs rows they reference
+    """
+    now = datetime.now(timezone.utc)
+    rows = []
+    blobs = {}
+    for document in documents:
+        columns, blob = Document.content_stats(document.content)
+        blobs.setdefault(blob["hash"], blob)
+        rows.append({
+            "name": document.name,
+            "created_at": now,
+            "updated_at": now,
+            **columns,
+        })
+    return rows, list(blobs.values())
+
+async def insert_documents(db: AsyncSession, documents: list[DocumentCreate]) -> list[int]:
+    """
+    Insert many documents with one executemany-style statement per table.
+
+    Bodies already stored are not written again. Returns the new ids in
+    input order. The caller owns the transaction.
+    """
+    if not documents:
+        return []
+    rows, blobs = document_rows(documents)
+    await db.execute(insert_blobs(), blobs)
+    statement = insert(Document).returning(Document.id, sort_by_parameter_order=True)
+    result = await db.execute(statement, rows)
+    return list(result.scalars())
@@ -0,0 +1,72 @@
+# app/services/pagination.py
+import base64
+import binascii
+import json
+from typing import Any, Optional
+from sqlalchemy import String, asc, desc, func, tuple_, type_coerce
+from ..models.document import Document
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or was issued for another sort"""
+
+# sort_by values accepted by the listing endpoints. Each has a (key, id)
+# index, so sorted pages and keyset seeks never sort in a temp B-tree.
+SORT_BY_PATTERN = "^(name|name_ci|created_at|size)$"
+
+def sort_column(sort_by: str):
+    """Expression a sort option orders by; name_ci is the case-insensitive name"""
+    if sort_by == "name_ci":
+        return func.lower(Document.name)
+    return getattr(Document, sort_by)
+
+def sort_key_column(sort_by: Optional[str]):
+    """
+    Column the keyset is built on for a sort option.
+
+    created_at is compared in its stored text form: SQLite orders it as
+    text, and rows written with and without fractional seconds would not
+    compare correctly after a round trip through datetime.
+    """
+    if sort_by == "created_at":
+        return type_coerce(Document.created_at, String)
+    if sort_by is None:
+        return Document.id
+    return sort_column(sort_by)
+
+def order_by(sort_by: Optional[str], descending: bool):
+    """ORDER BY clauses for a sort, with id as the unique tiebreaker"""
+    direction = desc if descending else asc
+    if sort_by is None:
+        return (direction(Document.id),)
+    return (direction(sort_column(sort_by)), direction(Document.id))
+
+def after_cursor(sort_by: Optional[str], descending: bool, key: Any, last_id: int):
+    """Filter selecting the rows that follow (key, last_id) in sort order"""
+    if sort_by is None:
+        return Document.id < last_id if descending else Document.id > last_id
+    position = tuple_(sort_key_column(sort_by), Document.id)
+    if descending:
+        return position < tuple_(key, last_id)
+    return position > tuple_(key, last_id)
+
+def encode_cursor(sort_by: Optional[str], sort_order: str, key: Any, last_id: int) -> str:
+    payload = {"s": sort_by, "o": sort_order, "k": key, "i": last_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort_by: Optional[str], sort_order: str) -> tuple[Any, int]:
+    """Return (key, last_id) from a cursor issued for the same sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        key, last_id = payload["k"], payload["i"]
+        issued_for = (payload["s"], payload["o"])
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+    if issued_for != (sort_by, sort_order):
+        raise InvalidCursor("Cursor was issued for a different sort")
+    key_type = int if sort_by == "size" else str
+    if not isinstance(last_id, int) or (sort_by and not isinstance(key, key_type)):
+        raise InvalidCursor("Malformed cursor")
+    return key, last_id
@@ -0,0 +1,62 @@
+# app/services/search.py
+import re
+from typing import Optional
+from sqlalchemy import column, func, literal_column, table
+
+# FTS5 index over documents.name and documents.content. The virtual table
+# and the triggers keeping it in sync are created next to the Document model.
+FTS_TABLE = "documents_fts"
+
+documents_fts = table(FTS_TABLE, column("rowid"), column("name"), column("content"))
+
+# bm25 column weights: a hit in the name outranks the same hit in content
+NAME_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 12
+
+# snippet() copies the matched text as is. It is HTML-escaped in SQL, so
+# the highlights go in as private-use characters and become tags after
+HIGHLIGHT_START_SENTINEL = "\ue000"
+HIGHLIGHT_END_SENTINEL = "\ue001"
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def build_match_query(search: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term so search-as-you-type matches
+    partially typed words, and user input can never inject FTS5 syntax.
+    Returns None when the text contains no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(search.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def match_clause(match_query: str):
+    return literal_column(FTS_TABLE).op("MATCH")(match_query)
+
+def rank_column():
+    """bm25 score of the current match; lower is more relevant"""
+    return func.bm25(literal_column(FTS_TABLE), NAME_WEIGHT, CONTENT_WEIGHT)
+
+def snippet_column():
+    """HTML-escaped fragment of whichever column matched best, hits in <mark>"""
+    snippet = func.snippet(
+        literal_column(FTS_TABLE),
+        -1,
+        HIGHLIGHT_START_SENTINEL,
+        HIGHLIGHT_END_SENTINEL,
+        SNIPPET_ELLIPSIS,
+        SNIPPET_TOKENS,
+    )
+    for character, entity in HTML_ESCAPES:
+        snippet = func.replace(snippet, character, entity)
+    snippet = func.replace(snippet, HIGHLIGHT_START_SENTINEL, HIGHLIGHT_START)
+    return func.replace(snippet, HIGHLIGHT_END_SENTINEL, HIGHLIGHT_END)
@@ -0,0 +1,70 @@
+# app/services/seed.py
+import logging
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.document import Document
+from ..schemas.document import DocumentCreate
+from . import ingest
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_DOCUMENTS = [
+    {
+        "name": "Meeting Notes.txt",
+        "content": "Discussion points from team meeting:\n- Project timeline review\n- Resource allocation\n- Next steps"
+    },
+    {
+        "name": "Project Plan.txt",
+        "content": "Q4 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
+    },
+    {
+        "name": "API Documentation.txt",
+        "content": "REST API Endpoints:\n- GET /api/v1/users\n- POST /api/v1/users\n- PUT /api/v1/users/{id}\n- DELETE /api/v1/users/{id}"
+    },
+    {
+        "name": "Project Plan2.txt",
+        "content": "Q2 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
+    },
+    {
+        "name": "Project Plan3.txt",
+        "content": "Q1 Project Timeline:\n1. Requirements gathering\n2. Analysis phase\n3. Design phase\n4. Implementation\n5. Testing\n6. Deployment"
+    },
+    {
+        "name": "Project Plan4.txt",
+        "content": "Q1 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
+    },
+    {
+        "name": "Project Plan5.txt",
+        "content": "2025 Q1 Project Timeline:\n1. Requirements gathering\n2. Design phase\n3. Implementation\n4. Testing\n5. Deployment"
+    },
+    {
+        "name": "Meeting Notes2.txt",
+        "content": "Discussion points from team meeting:\nFinding remedial remedial measures for the issues:\n- Project timeline review\n- Resource allocation\n- Next steps"
+    },
+    {
+        "name": "Meeting Notes3.txt",
+        "content": "Discussion points from team meeting:\n- Project timeline review\n- Resource allocation\n- Next steps"
+    },
+    {
+        "name": "Calculate Market return.txt",
+        "content": "Calculate the expected return\n Assume that the following assets are correctly priced according  to securrity market line (CAPM)"
+    },
+    {
+        "name": "Calculate Market risk.txt",
+        "content": "Calculate the expected market risk\n Assume that the following assets are correctly priced according  to securrity market line (CAPM)"
+    }
+]
+
+async def seed_sample_data(db: AsyncSession) -> int:
+    """
+    Insert the sample documents into an empty database and commit.
+    Returns the number inserted, 0 if there were documents already.
+    """
+    # An existence probe, not COUNT(*), so large databases are not scanned
+    if await db.scalar(select(Document.id).limit(1)) is not None:
+        return 0
+    logger.info("Creating sample documents...")
+    ids = await ingest.insert_documents(db, [DocumentCreate(**doc) for doc in SAMPLE_DOCUMENTS])
+    await db.commit()
+    logger.info("Sample documents created successfully")
+    return len(ids)
@@ -0,0 +1,123 @@
+# app/services/similarity.py
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from heapq import nsmallest
+from typing import NamedTuple, Optional
+from sqlalchemy import select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from ..core import minhash
+from ..core.config import settings
+from ..models.blob import ContentBlob, ContentLSH, decompress
+from ..models.document import Document
+
+logger = logging.getLogger(__name__)
+
+class SimilarDocument(NamedTuple):
+    id: int
+    name: str
+    similarity: float
+
+async def candidate_signatures(db: AsyncSession, signature: bytes) -> list:
+    """
+    (hash, signature) of blobs sharing an LSH bucket with signature. Each
+    bucket contributes at most SIMILARITY_CANDIDATES_PER_BUCKET blobs, so
+    a crowded bucket cannot make one lookup read most of the table.
+    """
+    per_bucket = [
+        select(ContentLSH.hash)
+        .where(ContentLSH.bucket == bucket)
+        .limit(settings.SIMILARITY_CANDIDATES_PER_BUCKET)
+        .subquery()
+        .select()
+        for bucket in minhash.lsh_buckets(signature)
+    ]
+    result = await db.execute(
+        select(ContentBlob.hash, ContentBlob.signature).where(ContentBlob.hash.in_(union(*per_bucket)))
+    )
+    return result.all()
+
+async def similar_documents(
+    db: AsyncSession,
+    content_hash: str,
+    threshold: float,
+    limit: int,
+    exclude_id: Optional[int] = None
+) -> list[SimilarDocument]:
+    """
+    Documents whose content is estimated at least threshold similar to the
+    blob content_hash (identical content counts as 1.0), most similar first
+    """
+    signature = await db.scalar(select(ContentBlob.signature).where(ContentBlob.hash == content_hash))
+    scores = {content_hash: 1.0}
+    if signature is not None:
+        for candidate, candidate_signature in await candidate_signatures(db, signature):
+            score = minhash.similarity(signature, candidate_signature)
+            if score >= threshold:
+                scores.setdefault(candidate, score)
+    statement = select(Document.id, Document.name, Document.content_hash).where(Document.content_hash.in_(scores))
+    if exclude_id is not None:
+        statement = statement.where(Document.id != exclude_id)
+    # Ranked here: ordering by a CASE over every candidate costs more than the sort
+    rows = nsmallest(limit, (await db.execute(statement)).all(), key=lambda row: (-scores[row.content_hash], row.id))
+    return [SimilarDocument(row.id, row.name, round(scores[row.content_hash], 4)) for row in rows]
+
+def sign_batch(rows: list[tuple]) -> list[dict]:
+    """Signatures of stored (hash, data, compression) rows; runs in worker processes"""
+    return [
+        {"hash": content_hash, "signature": minhash.signature(decompress(data, compression).decode("utf-8"))}
+        for content_hash, data, compression in rows
+    ]
+
+async def rebuild_signatures(
+    session_factory: async_sessionmaker,
+    everything: bool = False,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None
+) -> int:
+    """
+    Compute MinHash signatures (and, through the triggers, LSH buckets) of
+    stored content: blobs without one, or every blob with everything=True
+    (after the signature parameters change). Batches of blobs are signed in
+    a process pool while the next batches are read and finished ones
+    written, one transaction per batch. Returns the number of blobs signed.
+    """
+    batch_size = batch_size or settings.SIMILARITY_REBUILD_BATCH_SIZE
+    workers = workers or settings.SIMILARITY_REBUILD_WORKERS or os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    signed = 0
+    after = ""
+    exhausted = False
+    pending: deque = deque()
+    # spawn: forking a process that runs an event loop and driver threads is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        while True:
+            if not exhausted and len(pending) < 2 * workers:
+                statement = (
+                    select(ContentBlob.hash, ContentBlob.data, ContentBlob.compression)
+                    .where(ContentBlob.hash > after)
+                    .order_by(ContentBlob.hash)
+                    .limit(batch_size)
+                )
+                if not everything:
+                    statement = statement.where(ContentBlob.signature.is_(None))
+                async with session_factory() as db:
+                    rows = [tuple(row) for row in (await db.execute(statement)).all()]
+                if rows:
+                    after = rows[-1][0]
+                    pending.append(loop.run_in_executor(pool, sign_batch, rows))
+                    continue
+                exhausted = True
+            if not pending:
+                break
+            signatures = await pending.popleft()
+            async with session_factory() as db:
+                # Bulk UPDATE by primary key; blobs deleted meanwhile match nothing
+                await db.execute(update(ContentBlob), signatures)
+                await db.commit()
+            signed += len(signatures)
+            logger.info(f"Signed {signed} content blobs")
+    return signed
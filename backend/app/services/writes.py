@@ -0,0 +1,120 @@
+# app/services/writes.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, TypeVar
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from ..core.config import settings
+from ..core.loops import LoopBound
+from . import changes
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Operation = Callable[[AsyncSession], Awaitable[T]]
+
+class WriteCoordinator(LoopBound):
+    """
+    Group commit for single-document writes (WRITE_GROUP_COMMIT).
+
+    Requests submit an operation, a coroutine function of a session, and
+    wait for its outcome. One writer task per session factory takes what
+    is queued (at most WRITE_GROUP_MAX_OPS, waiting WRITE_GROUP_WINDOW_MS
+    for more) and applies the batch in one transaction, each operation in
+    its own savepoint: a failing operation is rolled back
+    alone and its caller gets its exception (an HTTPException such as a
+    404 included), the others commit together. Callers are resolved only
+    after the commit, so a result means the write is durable.
+    """
+
+    def __init__(self):
+        self._writers: dict[async_sessionmaker, tuple[asyncio.Queue, asyncio.Task]] = {}
+
+    def _reset_loop_state(self) -> None:
+        self._writers = {}
+
+    async def submit(self, session_factory: async_sessionmaker, operation: Operation) -> T:
+        loop = self._bind_loop()
+        writer = self._writers.get(session_factory)
+        if writer is None or writer[1].done():
+            queue: asyncio.Queue = asyncio.Queue()
+            writer = self._writers[session_factory] = (queue, loop.create_task(self._run(session_factory, queue)))
+        future = loop.create_future()
+        writer[0].put_nowait((operation, future))
+        return await future
+
+    async def stop(self) -> None:
+        """Apply what is queued, then stop the writer tasks"""
+        loop = asyncio.get_running_loop()
+        writers, self._writers = list(self._writers.values()), {}
+        for queue, task in writers:
+            if task.get_loop() is loop:
+                await queue.join()
+            if not task.get_loop().is_closed():
+                task.cancel()
+
+    async def _run(self, session_factory: async_sessionmaker, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + settings.WRITE_GROUP_WINDOW_MS / 1000
+            while len(batch) < settings.WRITE_GROUP_MAX_OPS:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._apply(session_factory, batch)
+            except Exception as e:
+                # Such as a failed rollback; the writer keeps serving the queue
+                logger.error(f"Error applying a group of {len(batch)} writes: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _apply(self, session_factory: async_sessionmaker, batch: list) -> None:
+        # Callers that went away (cancelled requests) are skipped
+        batch = [(operation, future) for operation, future in batch if not future.done()]
+        if not batch:
+            return
+        outcomes = []
+        async with session_factory() as db:
+            try:
+                if db.bind.dialect.name == "sqlite":
+                    # The sqlite3 driver only opens a transaction before DML,
+                    # so releasing the first savepoint would commit on its own;
+                    # IMMEDIATE also takes the write lock once for the batch
+                    await db.execute(text("BEGIN IMMEDIATE"))
+                for operation, future in batch:
+                    try:
+                        async with db.begin_nested():
+                            result = await operation(db)
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                        continue
+                    outcomes.append((future, result, None))
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Error committing a group of {len(batch)} writes: {str(e)}")
+                await db.rollback()
+                outcomes = [(future, None, e) for _, future in batch]
+        if any(error is None for _, _, error in outcomes):
+            changes.hub.notify()
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+coordinator = WriteCoordinator()
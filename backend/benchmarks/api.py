@@ -0,0 +1,272 @@
+"""
+Per-operation throughput and latency of the documents API.
+
+Runs each scenario on its own at each concurrency level for a fixed time
+and reports requests per second, p50/p95/p99 latency and the peak RSS
+reached during the run. Scenarios:
+
+  list         GET /api/documents, one of the first 10 pages
+  list_fields  the same pages with ?fields=id,name,size,created_at
+  search       GET /api/documents?search=<word>
+  deep_offset  GET /api/documents?page=N in the last 10% of the pages
+  deep_cursor  GET /api/documents?cursor=... for the same positions
+  get          GET /api/documents/{id} for random ids
+  similar      GET /api/documents/{id}/similar for random ids
+  create       POST /api/documents with sizes from --sizes
+  delete       DELETE /api/documents/{id} for documents the run created
+
+Responses are requested with --accept-encoding (the client's default,
+gzip and deflate, unless given; "identity" turns compression off), and
+the mean bytes received per request are reported with the latencies.
+
+By default the app runs in-process (through its lifespan) against a
+corpus generated into a temporary SQLite file; --corpus runs against a
+copy of a file made by benchmarks.corpus. Peak RSS is then that of this
+process, app and client together. With --url the requests go to a
+running server, whose memory is reported given --server-pid.
+
+    python -m benchmarks.api --docs 10000 --sizes lognormal:2000:1.0
+    python -m benchmarks.api --corpus corpus.db --concurrency 1 16 64 --output before.json
+    python -m benchmarks.api --url http://localhost:8000 --server-pid 1234 --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+
+import httpx
+
+from .common import (
+    WORDS,
+    TextPool,
+    content_sizes,
+    environment,
+    latency_summary,
+    peak_rss_bytes,
+    reset_peak_rss,
+    seed_documents,
+    use_database,
+    use_temporary_database,
+    write_report,
+)
+from .corpus import corpus_description
+
+SCENARIOS = ("list", "list_fields", "search", "deep_offset", "deep_cursor", "get", "similar", "create", "delete")
+PER_PAGE = 20
+SPARSE_FIELDS = "id,name,size,created_at"
+
+class Workload:
+    """Builds the requests of each scenario from what the target holds"""
+
+    def __init__(self, client, args, total, min_id, max_id):
+        from app.services.pagination import encode_cursor
+
+        self.client = client
+        self.rng = random.Random(args.seed)
+        self.sample_size = content_sizes(args.sizes)
+        self.pool = TextPool(self.rng, 2 * 1024 * 1024)
+        self.encode_cursor = encode_cursor
+        self.pages = max(1, -(-total // PER_PAGE))
+        self.min_id = min_id
+        self.max_id = max_id
+        # Documents created by this run, consumed by the delete scenario
+        self.created = []
+
+    def request(self, scenario):
+        rng = self.rng
+        if scenario == "list":
+            return self.client.get("/api/documents", params={"page": rng.randint(1, 10), "per_page": PER_PAGE})
+        if scenario == "list_fields":
+            return self.client.get(
+                "/api/documents", params={"page": rng.randint(1, 10), "per_page": PER_PAGE, "fields": SPARSE_FIELDS}
+            )
+        if scenario == "search":
+            return self.client.get("/api/documents", params={"search": rng.choice(WORDS), "per_page": PER_PAGE})
+        if scenario == "deep_offset":
+            page = rng.randint(self.pages - self.pages // 10, self.pages)
+            return self.client.get("/api/documents", params={"page": page, "per_page": PER_PAGE})
+        if scenario == "deep_cursor":
+            span = self.max_id - self.min_id
+            after = rng.randint(self.max_id - span // 10, self.max_id)
+            cursor = self.encode_cursor(None, "asc", after, after)
+            return self.client.get("/api/documents", params={"cursor": cursor, "per_page": PER_PAGE})
+        if scenario == "get":
+            return self.client.get(f"/api/documents/{rng.randint(self.min_id, self.max_id)}")
+        if scenario == "similar":
+            return self.client.get(f"/api/documents/{rng.randint(self.min_id, self.max_id)}/similar")
+        if scenario == "create":
+            content = self.pool.take(rng, self.sample_size(rng), prefix=f"bench {rng.random()} ")
+            return self.client.post("/api/documents", json={"name": f"bench {rng.random()}.txt", "content": content})
+        if scenario == "delete":
+            return self.client.delete(f"/api/documents/{self.created.pop()}")
+        raise ValueError(f"Unknown scenario {scenario!r}")
+
+    async def ensure_deletable(self, count):
+        """Top up the documents the delete scenario may remove, through the bulk endpoint"""
+        missing = count - len(self.created)
+        if missing <= 0:
+            return
+        documents = [
+            {"name": f"delete-me {i}.txt", "content": self.pool.take(self.rng, self.sample_size(self.rng), f"{i} ")}
+            for i in range(missing)
+        ]
+        response = await self.client.post("/api/documents/bulk", json=documents, timeout=600)
+        response.raise_for_status()
+        self.created.extend(item["id"] for item in response.json()["results"] if item.get("id") is not None)
+
+async def describe_target(client):
+    """Document count and id range of the target, from three cheap requests"""
+    params = {"per_page": 1, "include_content": "false"}
+    first = (await client.get("/api/documents", params=params)).json()
+    last = (await client.get("/api/documents", params={**params, "sort_order": "desc"})).json()
+    if not first["documents"]:
+        sys.exit("No documents to read; generate or seed the target database first")
+    return first["total"], first["documents"][0]["id"], last["documents"][0]["id"]
+
+async def run_scenario(workload, scenario, concurrency, duration, warmup, server_pid):
+    latencies = []
+    errors = 0
+    received = 0
+
+    async def worker(deadline, record):
+        nonlocal errors, received
+        while time.perf_counter() < deadline:
+            if scenario == "delete" and not workload.created:
+                return
+            started = time.perf_counter()
+            response = await workload.request(scenario)
+            elapsed = time.perf_counter() - started
+            if not record:
+                continue
+            latencies.append(elapsed)
+            received += response.num_bytes_downloaded
+            if response.status_code >= 400:
+                errors += 1
+            elif scenario == "create":
+                workload.created.append(response.json()["id"])
+
+    # Writes are not warmed up, so each created document is counted once
+    if warmup and scenario not in ("create", "delete"):
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(deadline, False) for _ in range(concurrency)))
+
+    reset_peak_rss(server_pid)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(deadline, True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency": latency_summary(latencies),
+        "bytes_per_request": round(received / len(latencies)) if latencies else None,
+        "peak_rss_bytes": peak_rss_bytes(server_pid),
+    }
+
+async def main_async(args):
+    headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else None
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=60, headers=headers)
+        else:
+            from app.main import app
+            # The app logs at INFO; per-request client logging would swamp it
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            # Startup and shutdown as in production: pools warmed, then disposed
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60, headers=headers)
+        await stack.enter_async_context(client)
+
+        total, min_id, max_id = await describe_target(client)
+        workload = Workload(client, args, total, min_id, max_id)
+        results = []
+        for concurrency in args.concurrency:
+            for scenario in args.scenarios:
+                if scenario == "delete":
+                    await workload.ensure_deletable(args.delete_pool)
+                result = await run_scenario(
+                    workload, scenario, concurrency, args.duration, args.warmup, args.server_pid
+                )
+                results.append(result)
+                rss = result["peak_rss_bytes"]
+                print(
+                    f"{scenario:<12} c={concurrency:<4} {result['throughput_rps']:>9} req/s  "
+                    f"p50={result['latency'].get('p50_ms')}ms  p95={result['latency'].get('p95_ms')}ms  "
+                    f"p99={result['latency'].get('p99_ms')}ms  bytes={result['bytes_per_request']}  "
+                    f"rss={rss // 2**20 if rss else '?'}MiB  errors={result['errors']}",
+                    file=sys.stderr,
+                )
+        return {"documents": total, "results": results}
+
+def copy_database(source):
+    """Online copy of a SQLite file, so runs never modify the corpus itself"""
+    target = os.path.join(tempfile.mkdtemp(prefix="docbench-"), "bench.db")
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+    return target
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    target.add_argument("--corpus", help="SQLite file from benchmarks.corpus to run against (copied first)")
+    parser.add_argument("--in-place", action="store_true", help="Run against --corpus itself rather than a copy")
+    parser.add_argument("--server-pid", type=int, help="Report the peak RSS of this process (with --url)")
+    parser.add_argument("--docs", type=int, default=10_000, help="Documents to generate without --corpus/--url")
+    parser.add_argument("--sizes", default="lognormal:2000:1.0",
+                        help="Content size in bytes, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--duration", type=float, default=5.0, help="Measured seconds per scenario and level")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before each read scenario")
+    parser.add_argument("--delete-pool", type=int, default=5000,
+                        help="Documents created up front for the delete scenario")
+    parser.add_argument("--accept-encoding", help='Accept-Encoding request header, e.g. "gzip" or "identity"')
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    database = None
+    corpus = None
+    if args.corpus:
+        corpus = corpus_description(args.corpus)
+        database = use_database(os.path.abspath(args.corpus) if args.in_place else copy_database(args.corpus))
+    elif not args.url:
+        database = use_temporary_database()
+        seed_documents(args.docs, args.sizes, args.seed, progress=True)
+        corpus = {"docs": args.docs, "sizes": args.sizes, "seed": args.seed}
+
+    outcome = asyncio.run(main_async(args))
+    report = {
+        "benchmark": "api",
+        "target": args.url or "in-process",
+        "database": database,
+        "corpus": corpus,
+        "environment": environment(),
+        "parameters": {
+            "sizes": args.sizes,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "per_page": PER_PAGE,
+            "accept_encoding": args.accept_encoding,
+            "seed": args.seed,
+        },
+        **outcome,
+    }
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Build time, memory and query latency of the autocomplete name index.
+
+Indexes --docs synthetic names ("Budget review 123.txt") in memory, with
+no database or HTTP in the way, then times searches of three kinds:
+
+  prefix  the first few letters of a name ("proj")
+  typo    two misspelled words ("Projcet Pln")
+  word    a word from the middle of names ("review")
+
+Exits non-zero when any kind's p99 is over --max-p99-ms or the typo
+searches find the intended name less often than --min-hit-rate.
+
+    python -m benchmarks.autocomplete --docs 1000000
+"""
+import argparse
+import random
+import sys
+import time
+
+from .common import WORDS, environment, latency_summary, peak_rss_bytes, write_report
+
+def misspell(rng, word):
+    """Swap two adjacent letters, or drop one"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + word[i + 1:]
+
+def queries(rng, kind, count):
+    for _ in range(count):
+        first, second = rng.choice(WORDS), rng.choice(WORDS)
+        if kind == "prefix":
+            yield first[:rng.randint(2, len(first))]
+        elif kind == "typo":
+            yield f"{misspell(rng, first).title()} {misspell(rng, second)}", (first, second)
+        else:
+            yield second
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000, help="Searches per kind")
+    parser.add_argument("--limit", type=int, default=10, help="Suggestions per search")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--max-p99-ms", type=float, default=1.0, help="Latency target per kind")
+    parser.add_argument("--min-hit-rate", type=float, default=0.8, help="Typo hit rate target")
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services.autocomplete import NameIndex
+
+    rng = random.Random(args.seed)
+    rss_before = peak_rss_bytes()
+    started = time.perf_counter()
+    index = NameIndex()
+    index.extend(
+        (i, f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}.txt") for i in range(1, args.docs + 1)
+    )
+    index.finish()
+    build_seconds = time.perf_counter() - started
+    rss_after = peak_rss_bytes()
+    print(f"Indexed {args.docs} names in {build_seconds:.1f}s", file=sys.stderr)
+
+    results = {}
+    for kind in ("prefix", "typo", "word"):
+        latencies = []
+        found = 0
+        for query in queries(rng, kind, args.queries):
+            expected = None
+            if kind == "typo":
+                query, expected = query
+            started = time.perf_counter()
+            suggestions = index.search(query, args.limit)
+            latencies.append(time.perf_counter() - started)
+            if expected is None:
+                found += bool(suggestions)
+            elif suggestions:
+                # The best suggestion should be made of the two intended words
+                found += sorted(suggestions[0].name.lower().split()[:2]) == sorted(expected)
+        results[kind] = {"latency": latency_summary(latencies), "hit_rate": round(found / args.queries, 3)}
+        print(f"{kind:<7} p50={results[kind]['latency']['p50_ms']}ms p99={results[kind]['latency']['p99_ms']}ms "
+              f"hit_rate={results[kind]['hit_rate']}", file=sys.stderr)
+
+    write_report({
+        "benchmark": "autocomplete",
+        "environment": environment(),
+        "parameters": {
+            "docs": args.docs,
+            "queries": args.queries,
+            "limit": args.limit,
+            "seed": args.seed,
+            "max_p99_ms": args.max_p99_ms,
+            "min_hit_rate": args.min_hit_rate,
+            "candidate_budget": settings.AUTOCOMPLETE_CANDIDATE_BUDGET,
+        },
+        "build_seconds": round(build_seconds, 2),
+        "index_rss_bytes": rss_after - rss_before if rss_after and rss_before else None,
+        "results": results,
+    }, args.output)
+
+    missed = [
+        f"{kind} p99 {result['latency']['p99_ms']}ms over {args.max_p99_ms}ms"
+        for kind, result in results.items() if result["latency"]["p99_ms"] > args.max_p99_ms
+    ]
+    if results["typo"]["hit_rate"] < args.min_hit_rate:
+        missed.append(f"typo hit rate {results['typo']['hit_rate']} under {args.min_hit_rate}")
+    for miss in missed:
+        print(f"Missed target: {miss}", file=sys.stderr)
+    if missed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
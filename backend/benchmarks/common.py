@@ -0,0 +1,192 @@
+"""Helpers shared by the benchmark scripts."""
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+WORDS = (
+    "project plan meeting notes budget review design timeline resource "
+    "allocation deployment testing requirements analysis market risk return"
+).split()
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def latency_summary(values):
+    """Latency percentiles in milliseconds for a list of durations in seconds"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+    }
+
+def random_text(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+def content_sizes(spec, max_bytes=1024 * 1024):
+    """
+    Sampler of content sizes in bytes from a distribution spec:
+
+      4000                     every document 4000 bytes
+      uniform:100:10000        uniform between the bounds
+      lognormal:2000:1.0       log-normal with median 2000 and sigma 1.0
+                               (a long tail of large documents)
+
+    Sizes are clamped to [1, max_bytes].
+    """
+    kind, *params = str(spec).split(":")
+    try:
+        if not params:
+            size = int(kind)
+            sample = lambda rng: size
+        elif kind == "uniform":
+            low, high = int(params[0]), int(params[1])
+            sample = lambda rng: rng.randint(low, high)
+        elif kind == "lognormal":
+            mu, sigma = math.log(float(params[0])), float(params[1])
+            sample = lambda rng: int(rng.lognormvariate(mu, sigma))
+        else:
+            raise ValueError(kind)
+    except (ValueError, IndexError):
+        raise ValueError(f"Unrecognized content size spec {spec!r}")
+    return lambda rng: max(1, min(max_bytes, sample(rng)))
+
+class TextPool:
+    """
+    Word salad drawn once and sliced per document, so corpora of a million
+    documents generate in minutes rather than hours
+    """
+
+    def __init__(self, rng, size):
+        self.text = random_text(rng, size)
+
+    def take(self, rng, size, prefix=""):
+        size = max(0, size - len(prefix))
+        if size >= len(self.text):
+            return prefix + (self.text * (size // len(self.text) + 1))[:size]
+        start = rng.randrange(len(self.text) - size + 1)
+        return prefix + self.text[start:start + size]
+
+def use_database(path):
+    """Point the app at a SQLite file and create any missing tables; must run before importing app"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app.database import Base, engine
+    from app.models import document  # noqa: F401  (registers the tables)
+    Base.metadata.create_all(bind=engine)
+    return path
+
+def use_temporary_database():
+    """Point the app at a fresh SQLite file; must run before importing app"""
+    return use_database(os.path.join(tempfile.mkdtemp(prefix="docbench-"), "bench.db"))
+
+def seed_documents(docs, content_size, seed, batch_size=5000, progress=False):
+    """
+    Fill the app database with synthetic documents, batch_size per
+    transaction. content_size is a byte count or a content_sizes() spec.
+    Every body starts with the document's number, so none deduplicate.
+    Returns the total content bytes.
+    """
+    from app.database import engine
+    from app.models.document import Document, insert_blobs
+
+    rng = random.Random(seed)
+    sample_size = content_sizes(content_size)
+    pool = TextPool(rng, 2 * 1024 * 1024)
+    now = datetime.now(timezone.utc)
+    total_bytes = 0
+    for batch_start in range(0, docs, batch_size):
+        rows = []
+        blobs = {}
+        for i in range(batch_start, min(docs, batch_start + batch_size)):
+            content = pool.take(rng, sample_size(rng), prefix=f"{i} ")
+            columns, blob = Document.content_stats(content)
+            blobs[blob["hash"]] = blob
+            total_bytes += columns["size"]
+            # Spread creation times so sorting by created_at is meaningful
+            created_at = now - timedelta(seconds=docs - i)
+            rows.append({
+                "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}.txt",
+                "created_at": created_at,
+                "updated_at": created_at,
+                **columns,
+            })
+        with engine.begin() as connection:
+            connection.execute(insert_blobs(), list(blobs.values()))
+            connection.execute(Document.__table__.insert(), rows)
+        if progress:
+            print(f"seeded {batch_start + len(rows)}/{docs} documents", file=sys.stderr)
+    return total_bytes
+
+def peak_rss_bytes(pid=None):
+    """
+    High-water resident set size of a process (this one by default), from
+    /proc where available, otherwise getrusage for this process
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if pid is not None:
+        return None
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def reset_peak_rss(pid=None):
+    """Restart the /proc high-water mark so the next reading covers one run; False where unsupported"""
+    try:
+        with open(f"/proc/{pid or 'self'}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def environment():
+    """What a result depends on besides the code, for comparing runs"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def write_report(report, output):
+    import json
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,86 @@
+"""
+Compare two benchmarks.api reports scenario by scenario.
+
+Prints throughput, p95/p99 latency and peak RSS side by side with the
+relative change. With --fail-above, exits non-zero when any scenario's
+throughput dropped or p95 latency grew by more than that percentage,
+so it can gate a change in CI.
+
+    python -m benchmarks.compare before.json after.json --fail-above 10
+"""
+import argparse
+import json
+import sys
+
+def load_results(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {(result["scenario"], result["concurrency"]): result for result in report["results"]}
+
+def change(before, after):
+    """Relative change in percent, None when either side is missing"""
+    if not before or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+def compare(before, after):
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        rows.append({
+            "scenario": key[0],
+            "concurrency": key[1],
+            "throughput_rps": (old["throughput_rps"], new["throughput_rps"]),
+            "throughput_change_pct": change(old["throughput_rps"], new["throughput_rps"]),
+            "p95_ms": (old["latency"].get("p95_ms"), new["latency"].get("p95_ms")),
+            "p95_change_pct": change(old["latency"].get("p95_ms"), new["latency"].get("p95_ms")),
+            "p99_ms": (old["latency"].get("p99_ms"), new["latency"].get("p99_ms")),
+            "peak_rss_change_pct": change(old.get("peak_rss_bytes"), new.get("peak_rss_bytes")),
+        })
+    return rows
+
+def regressions(rows, threshold):
+    return [
+        row for row in rows
+        if (row["throughput_change_pct"] is not None and row["throughput_change_pct"] < -threshold)
+        or (row["p95_change_pct"] is not None and row["p95_change_pct"] > threshold)
+    ]
+
+def _pct(value):
+    return "     n/a" if value is None else f"{value:+7.1f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--fail-above", type=float, help="Regression threshold in percent")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    before, after = load_results(args.before), load_results(args.after)
+    rows = compare(before, after)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"{'scenario':<12} {'conc':>4} {'req/s before':>13} {'after':>9} {'change':>8}"
+              f" {'p95 before':>11} {'after':>9} {'change':>8} {'rss':>8}")
+        for row in rows:
+            print(
+                f"{row['scenario']:<12} {row['concurrency']:>4} "
+                f"{row['throughput_rps'][0]:>13} {row['throughput_rps'][1]:>9} {_pct(row['throughput_change_pct'])} "
+                f"{row['p95_ms'][0]!s:>11} {row['p95_ms'][1]!s:>9} {_pct(row['p95_change_pct'])} "
+                f"{_pct(row['peak_rss_change_pct'])}"
+            )
+    unmatched = before.keys() ^ after.keys()
+    if unmatched:
+        print(f"Only in one report: {sorted(unmatched)}", file=sys.stderr)
+
+    if args.fail_above is not None:
+        failed = regressions(rows, args.fail_above)
+        for row in failed:
+            print(f"Regression: {row['scenario']} at concurrency {row['concurrency']}", file=sys.stderr)
+        if failed:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Concurrency benchmark for the documents API.
+
+Drives a mixed read/write workload (list, search, get, create, delete) at
+several concurrency levels and reports throughput, latency percentiles
+and the worst event-loop stall observed in the benchmark process. With
+the default in-process mode the app shares that event loop, so a handler
+that blocks on the database shows up directly as loop lag and as tail
+latency for every concurrent request.
+
+In-process against a fresh temporary database:
+    python -m benchmarks.concurrency --docs 2000 --concurrency 1 8 32
+
+Against a running server (e.g. to compare two revisions):
+    python -m benchmarks.concurrency --url http://localhost:8000 --output after.json
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+from .common import (
+    WORDS,
+    latency_summary,
+    random_text,
+    seed_documents,
+    use_temporary_database,
+    write_report,
+)
+
+async def discover_ids(client):
+    ids = []
+    cursor = None
+    while True:
+        params = {"per_page": 100, "include_content": "false", "include_total": "false"}
+        if cursor:
+            params["cursor"] = cursor
+        data = (await client.get("/api/documents", params=params)).json()
+        ids.extend(doc["id"] for doc in data["documents"])
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return ids
+
+async def monitor_loop_lag(stop, interval=0.005):
+    """Largest delay between when a sleep should have ended and when it did"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+async def run_level(client, ids, concurrency, duration, write_ratio, content_bytes, seed):
+    rng = random.Random(seed + concurrency)
+    latencies = {}
+    errors = 0
+    created = []
+    deadline = time.perf_counter() + duration
+
+    async def one_request():
+        nonlocal errors
+        roll = rng.random()
+        if roll < write_ratio / 2 or (roll < write_ratio and not created):
+            op = "create"
+            request = client.post(
+                "/api/documents",
+                json={"name": f"bench {rng.random()}.txt", "content": random_text(rng, content_bytes)}
+            )
+        elif roll < write_ratio:
+            op = "delete"
+            request = client.delete(f"/api/documents/{created.pop()}")
+        elif roll < write_ratio + (1 - write_ratio) * 0.4:
+            op = "get"
+            request = client.get(f"/api/documents/{rng.choice(ids)}")
+        elif roll < write_ratio + (1 - write_ratio) * 0.7:
+            op = "list"
+            request = client.get("/api/documents", params={"page": rng.randint(1, 20), "sort_by": "name"})
+        else:
+            op = "search"
+            request = client.get("/api/documents", params={"search": rng.choice(WORDS)[:4]})
+
+        started = time.perf_counter()
+        response = await request
+        latencies.setdefault(op, []).append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        elif op == "create":
+            created.append(response.json()["id"])
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await one_request()
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    loop_lag = await lag_task
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "concurrency": concurrency,
+        "requests": len(all_latencies),
+        "errors": errors,
+        "throughput_rps": round(len(all_latencies) / elapsed, 1),
+        "max_loop_lag_ms": round(loop_lag * 1000, 3),
+        "latency": latency_summary(all_latencies),
+        "by_operation": {op: latency_summary(values) for op, values in sorted(latencies.items())},
+    }
+
+async def main_async(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+    try:
+        return await run_levels(client, args)
+    finally:
+        await client.aclose()
+        if not args.url:
+            from app.database import dispose_engines
+            await dispose_engines()
+
+async def run_levels(client, args):
+    ids = await discover_ids(client)
+    if not ids:
+        sys.exit("No documents to read; seed the target database first")
+    levels = []
+    for concurrency in args.concurrency:
+        result = await run_level(
+            client, ids, concurrency, args.duration,
+            args.write_ratio, args.content_bytes, args.seed
+        )
+        levels.append(result)
+        print(
+            f"concurrency={concurrency:>4}  {result['throughput_rps']:>9} req/s  "
+            f"p50={result['latency']['p50_ms']}ms  p99={result['latency']['p99_ms']}ms  "
+            f"loop lag={result['max_loop_lag_ms']}ms  errors={result['errors']}",
+            file=sys.stderr,
+        )
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--docs", type=int, default=2000, help="Documents to seed (in-process mode)")
+    parser.add_argument("--content-bytes", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per concurrency level")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    database = None
+    if not args.url:
+        database = use_temporary_database()
+        seed_documents(args.docs, args.content_bytes, args.seed)
+
+    levels = asyncio.run(main_async(args))
+    report = {
+        "benchmark": "concurrency",
+        "target": args.url or "in-process",
+        "database": database,
+        "parameters": {
+            "docs": args.docs,
+            "content_bytes": args.content_bytes,
+            "duration": args.duration,
+            "write_ratio": args.write_ratio,
+            "seed": args.seed,
+        },
+        "levels": levels,
+    }
+    write_report(report, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Generate a synthetic document corpus into a SQLite file for reuse across
+benchmark runs.
+
+The same --docs, --sizes and --seed always produce the same documents, so
+two revisions can be compared on identical data. A JSON description of
+the corpus is written next to the database (<output>.json) and copied
+into the reports of benchmarks run against it.
+
+    python -m benchmarks.corpus --docs 100000 --sizes lognormal:2000:1.0 --output corpus.db
+    python -m benchmarks.corpus --docs 1000000 --sizes uniform:200:8000 --output big.db
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from .common import seed_documents, use_database
+
+def corpus_description(path):
+    """The description written by this script, or None for other databases"""
+    try:
+        with open(f"{path}.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10_000)
+    parser.add_argument("--sizes", default="lognormal:2000:1.0",
+                        help="Content size in bytes, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents per transaction")
+    parser.add_argument("--output", required=True, help="SQLite file to create")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        sys.exit(f"{args.output} exists; corpora are generated into a new file")
+    use_database(os.path.abspath(args.output))
+
+    started = time.perf_counter()
+    total_bytes = seed_documents(args.docs, args.sizes, args.seed, args.batch_size, progress=True)
+    elapsed = time.perf_counter() - started
+
+    from app.database import engine
+    engine.dispose()
+    description = {
+        "docs": args.docs,
+        "sizes": args.sizes,
+        "seed": args.seed,
+        "content_bytes": total_bytes,
+        "file_bytes": os.path.getsize(args.output),
+        "generated_seconds": round(elapsed, 1),
+    }
+    with open(f"{args.output}.json", "w") as f:
+        json.dump(description, f, indent=2)
+    print(json.dumps(description, indent=2))
+
+if __name__ == "__main__":
+    main()
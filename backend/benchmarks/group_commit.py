@@ -0,0 +1,116 @@
+"""
+Single-document write throughput with and without group commit.
+
+Each client repeatedly creates a document and deletes it again through
+POST /api/documents and DELETE /api/documents/{id}, for --duration
+seconds per concurrency level, first with WRITE_GROUP_COMMIT off (one
+transaction per request) and then on (concurrent writes share one). It
+reports writes per second and latency percentiles per mode and level.
+
+--synchronous FULL makes every commit fsync the WAL, the case grouping
+is for; the app's default NORMAL only syncs at checkpoints.
+
+    python -m benchmarks.group_commit --concurrency 1 16 64 --synchronous FULL
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+from .common import environment, latency_summary, random_text, use_temporary_database, write_report
+
+async def run_level(client, concurrency, duration, content_bytes, seed):
+    rng = random.Random(seed + concurrency)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def timed(method, url, **kwargs):
+        nonlocal errors
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors += 1
+        return response
+
+    async def worker(number):
+        while time.perf_counter() < deadline:
+            document = {"name": f"group {number}.txt", "content": random_text(rng, content_bytes)}
+            response = await timed("POST", "/api/documents", json=document)
+            if response.status_code == 201:
+                await timed("DELETE", f"/api/documents/{response.json()['id']}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "writes": len(latencies),
+        "errors": errors,
+        "writes_per_second": round(len(latencies) / elapsed, 1),
+        "latency": latency_summary(latencies),
+    }
+
+async def main_async(args):
+    from app.core.config import settings
+    from app.database import dispose_engines
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600)
+    results = []
+    try:
+        for grouped in (False, True):
+            settings.WRITE_GROUP_COMMIT = grouped
+            mode = "grouped" if grouped else "per_request"
+            for concurrency in args.concurrency:
+                result = {"mode": mode, **await run_level(
+                    client, concurrency, args.duration, args.content_bytes, args.seed
+                )}
+                results.append(result)
+                print(f"{mode:<12} c={concurrency:<4} {result['writes_per_second']:>9} writes/s "
+                      f"p50={result['latency']['p50_ms']}ms p99={result['latency']['p99_ms']}ms", file=sys.stderr)
+    finally:
+        await client.aclose()
+        await dispose_engines()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per mode and concurrency level")
+    parser.add_argument("--content-bytes", type=int, default=2000)
+    parser.add_argument("--synchronous", choices=["OFF", "NORMAL", "FULL", "EXTRA"], help="SQLITE_SYNCHRONOUS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    if args.synchronous:
+        # Read when the app's settings are first imported
+        os.environ["SQLITE_SYNCHRONOUS"] = args.synchronous
+    database = use_temporary_database()
+    from app.core.config import settings
+
+    results = asyncio.run(main_async(args))
+    write_report({
+        "benchmark": "group_commit",
+        "environment": environment(),
+        "database": database,
+        "parameters": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "content_bytes": args.content_bytes,
+            "synchronous": settings.SQLITE_SYNCHRONOUS,
+            "group_max_ops": settings.WRITE_GROUP_MAX_OPS,
+            "group_window_ms": settings.WRITE_GROUP_WINDOW_MS,
+        },
+        "results": results,
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
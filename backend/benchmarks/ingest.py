@@ -0,0 +1,105 @@
+"""
+Ingestion throughput: single-document POSTs versus the bulk endpoint.
+
+Creates the same synthetic documents through POST /api/documents (one
+request and transaction per document) and through POST
+/api/documents/bulk as a JSON array and as NDJSON at several batch sizes,
+and reports documents per second for each.
+
+    python -m benchmarks.ingest --docs 5000 --batch-size 100 500 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from .common import random_text, use_temporary_database, write_report
+
+def make_documents(count, content_bytes, seed):
+    rng = random.Random(seed)
+    return [
+        {"name": f"ingest {i}.txt", "content": random_text(rng, content_bytes)}
+        for i in range(count)
+    ]
+
+async def single_inserts(client, documents):
+    for document in documents:
+        response = await client.post("/api/documents", json=document)
+        response.raise_for_status()
+
+async def bulk_json(client, documents, batch_size):
+    response = await client.post(f"/api/documents/bulk?batch_size={batch_size}", json=documents)
+    response.raise_for_status()
+    assert response.json()["created"] == len(documents)
+
+async def bulk_ndjson(client, documents, batch_size):
+    async def body():
+        for document in documents:
+            yield (json.dumps(document) + "\n").encode("utf-8")
+    response = await client.post(
+        f"/api/documents/bulk?batch_size={batch_size}",
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    response.raise_for_status()
+    assert response.json()["created"] == len(documents)
+
+async def measure(name, runner, documents, **params):
+    started = time.perf_counter()
+    await runner(documents=documents, **params)
+    elapsed = time.perf_counter() - started
+    result = {
+        "mode": name,
+        **params,
+        "documents": len(documents),
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(len(documents) / elapsed, 1),
+    }
+    print(f"{name:<12} {params!s:<22} {result['docs_per_second']:>10} docs/s", file=sys.stderr)
+    return result
+
+async def main_async(args):
+    from app.main import app
+    from app.database import dispose_engines
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600)
+    results = []
+    try:
+        single_docs = make_documents(args.single_docs, args.content_bytes, args.seed)
+        results.append(await measure("single", lambda documents: single_inserts(client, documents), single_docs))
+        documents = make_documents(args.docs, args.content_bytes, args.seed)
+        for batch_size in args.batch_size:
+            results.append(await measure(
+                "bulk_json", lambda documents, batch_size: bulk_json(client, documents, batch_size),
+                documents, batch_size=batch_size
+            ))
+            results.append(await measure(
+                "bulk_ndjson", lambda documents, batch_size: bulk_ndjson(client, documents, batch_size),
+                documents, batch_size=batch_size
+            ))
+    finally:
+        await client.aclose()
+        await dispose_engines()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000, help="Documents per bulk run")
+    parser.add_argument("--single-docs", type=int, default=1000, help="Documents for the single-insert run")
+    parser.add_argument("--content-bytes", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    database = use_temporary_database()
+    results = asyncio.run(main_async(args))
+    write_report({"benchmark": "ingest", "database": database, "results": results}, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Per-page serialization cost of the document listing.
+
+Loads one page of large documents and times turning it into response
+bytes two ways:
+
+  legacy   dict per row -> schema(**dict) -> response_model re-validation
+           by FastAPI -> jsonable_encoder -> stdlib json
+  current  schema.model_validate(row) (from_attributes) -> orjson, with
+           no response_model pass
+
+It also reports end-to-end latency of GET /api/documents for the same page.
+
+    python -m benchmarks.serialization --docs 100 --content-bytes 100000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import timezone
+
+import httpx
+
+from .common import latency_summary, seed_documents, use_temporary_database, write_report
+
+async def load_page(per_page):
+    from sqlalchemy import select
+    from sqlalchemy.orm import undefer
+    from app.api.endpoints.documents import DOCUMENT_COLUMNS
+    from app.database import AsyncReadSessionLocal
+    from app.models.document import Document
+
+    async with AsyncReadSessionLocal() as db:
+        rows = (await db.execute(select(*DOCUMENT_COLUMNS).order_by(Document.id).limit(per_page))).all()
+        documents = (await db.execute(
+            select(Document).options(undefer(Document.content)).order_by(Document.id).limit(per_page)
+        )).scalars().all()
+    return rows, documents
+
+def legacy_serializer():
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from app.schemas.document import Document as DocumentSchema, DocumentResponse
+
+    field = create_model_field(name="Response_list_documents", type_=DocumentResponse, mode="serialization")
+
+    async def serialize(documents):
+        page = DocumentResponse(
+            documents=[
+                DocumentSchema(
+                    id=doc.id,
+                    name=doc.name,
+                    content=doc.content,
+                    created_at=doc.created_at.replace(tzinfo=timezone.utc),
+                    updated_at=doc.updated_at.replace(tzinfo=timezone.utc),
+                    size=doc.size,
+                    snippet=None,
+                )
+                for doc in documents
+            ],
+            total=len(documents),
+        )
+        content = await serialize_response(field=field, response_content=page)
+        return JSONResponse(content).body
+
+    return serialize
+
+def current_serializer():
+    from app.api.endpoints.documents import _serialize_document
+    from app.core.responses import ORJSONResponse
+    from app.schemas.document import DocumentResponse
+
+    async def serialize(rows):
+        page = DocumentResponse(documents=[_serialize_document(row) for row in rows], total=len(rows))
+        return ORJSONResponse(page).body
+
+    return serialize
+
+async def time_serializer(serialize, page, iterations):
+    body = await serialize(page)
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await serialize(page)
+        durations.append(time.perf_counter() - started)
+    return {"bytes": len(body), **latency_summary(durations)}
+
+async def time_endpoint(per_page, iterations):
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    durations = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(iterations + 1):
+            started = time.perf_counter()
+            response = await client.get(f"/api/documents?per_page={per_page}&include_total=false")
+            response.raise_for_status()
+            durations.append(time.perf_counter() - started)
+    return latency_summary(durations[1:])
+
+async def main_async(args):
+    from app.database import dispose_engines
+
+    try:
+        rows, documents = await load_page(args.docs)
+        results = {
+            "legacy": await time_serializer(legacy_serializer(), documents, args.iterations),
+            "current": await time_serializer(current_serializer(), rows, args.iterations),
+        }
+        results["speedup"] = round(results["legacy"]["mean_ms"] / results["current"]["mean_ms"], 2)
+        results["endpoint"] = await time_endpoint(args.docs, args.iterations)
+    finally:
+        await dispose_engines()
+    for name in ("legacy", "current"):
+        print(f"{name:<8} {results[name]['mean_ms']:>10} ms/page", file=sys.stderr)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100, help="Documents on the page (at most 100)")
+    parser.add_argument("--content-bytes", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    database = use_temporary_database()
+    seed_documents(args.docs, args.content_bytes, args.seed)
+    results = asyncio.run(main_async(args))
+    write_report({"benchmark": "serialization", "database": database, **results}, args.output)
+
+if __name__ == "__main__":
+    main()
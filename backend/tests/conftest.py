@@ -1,33 +1,67 @@
+import asyncio
+import shutil
+from typing import NamedTuple
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
-from app.main import app, create_sample_data
-from app.database import Base, get_db
+from app.core.config import settings
+from app.main import app
+from app.database import Base, get_db, get_read_db, get_read_sessionmaker, get_write_sessionmaker
 from app.models.document import Document
 
-# Create in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class Database(NamedTuple):
+    engine: Engine
+    session_factory: sessionmaker
+    async_engine: AsyncEngine
+    async_session_factory: async_sessionmaker
 
 @pytest.fixture(scope="session", autouse=True)
-def disable_sample_data():
-    """Disable sample data creation during tests"""
-    app.dependency_overrides[create_sample_data] = lambda: None
-    yield
+def disable_startup_database_work():
+    """Keep the app's startup away from the real database during tests"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "SEED_SAMPLE_DATA", False)
+        patch.setattr(settings, "DB_WARM_UP", False)
+        patch.setattr(settings, "AUTOCOMPLETE_BUILD_ON_STARTUP", False)
+        yield
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """
+    One file-backed SQLite database for the whole run, shared by the
+    synchronous fixtures and the app's async sessions, with the app's
+    session dependencies pointed at it. Removed at the end of the run.
+    """
+    directory = tmp_path_factory.mktemp("database")
+    engine = create_engine(f"sqlite:///{directory}/test.db", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/test.db", poolclass=NullPool)
+    async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with async_session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_read_sessionmaker] = lambda: async_session_factory
+    app.dependency_overrides[get_write_sessionmaker] = lambda: async_session_factory
+    yield Database(
+        engine,
+        sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        async_engine,
+        async_session_factory,
+    )
     app.dependency_overrides.clear()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+    shutil.rmtree(directory, ignore_errors=True)
 
 @pytest.fixture(scope="session")
-def test_engine():
-    return engine
+def test_engine(database):
+    return database.engine
 
 @pytest.fixture(scope="function")
 def test_db(test_engine):
@@ -38,29 +72,19 @@ def test_db(test_engine):
     Base.metadata.drop_all(bind=test_engine)
 
 @pytest.fixture(scope="function")
-def db_session(test_db):
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+def db_session(database, test_db):
+    # Data is committed so the app's own connections can see it; the
+    # tables are dropped again by test_db
+    session = database.session_factory()
 
     yield session
 
     session.close()
-    transaction.rollback()
-    connection.close()
 
 @pytest.fixture(scope="function")
 def client(db_session):
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
-
-    app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as test_client:
         yield test_client
-    app.dependency_overrides.clear()
 
 @pytest.fixture(scope="function")
 def sample_documents(db_session):
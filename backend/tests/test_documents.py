@@ -1,47 +1,41 @@
+import csv
+import gzip
+import io
+import asyncio
+import json
+import logging
+import logging.handlers
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-from app.database import Base, get_db
+from sqlalchemy import create_engine, delete, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.database import Base, configure_sqlite
 from app.main import app
 from app.models.document import Document
+from app.services import counts
+from app.services.autocomplete import NameIndex, autocomplete
+from app.services.cache import LRUCache, document_cache, invalidate_document
 from datetime import datetime
 
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Setup test database
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
+# Talks to the conftest database through the dependency overrides it installs
 client = TestClient(app)
 
 @pytest.fixture(autouse=True)
-def setup_db():
+def setup_db(database):
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=database.engine)
+    counts.clear()
+    asyncio.run(autocomplete.reset())
+    asyncio.run(document_cache.clear())
     yield
     # Drop tables after each test
-    Base.metadata.drop_all(bind=engine)
+    Base.metadata.drop_all(bind=database.engine)
 
 @pytest.fixture
-def sample_documents():
-    db = TestingSessionLocal()
+def sample_documents(database):
+    db = database.session_factory()
     documents = [
         {
             "name": "Meeting Notes.txt",
@@ -151,4 +145,949 @@ def test_documents_have_correct_fields(sample_documents):
         assert isinstance(doc["name"], str)
         assert isinstance(doc["content"], str)
         assert isinstance(doc["created_at"], str)
-        assert isinstance(doc["size"], int)
\ No newline at end of file
+        assert isinstance(doc["size"], int)
+
+def test_size_is_persisted_as_utf8_bytes():
+    response = client.post(
+        "/api/documents",
+        json={"name": "unicode.txt", "content": "héllo wörld"}
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["size"] == len("héllo wörld".encode("utf-8"))
+
+    response = client.get(f"/api/documents/{data['id']}")
+    assert response.status_code == 200
+    assert response.json()["size"] == data["size"]
+
+def test_list_documents_without_content():
+    content = "x" * 500
+    created = client.post(
+        "/api/documents",
+        json={"name": "metadata-only.txt", "content": content}
+    ).json()
+
+    response = client.get("/api/documents?search=metadata-only&include_content=false")
+    assert response.status_code == 200
+    doc = next(d for d in response.json()["documents"] if d["id"] == created["id"])
+    assert "content" not in doc
+    assert doc["size"] == 500
+    assert doc["preview"] is None
+
+    response = client.get(
+        "/api/documents?search=metadata-only&include_content=false&include_preview=true"
+    )
+    doc = next(d for d in response.json()["documents"] if d["id"] == created["id"])
+    assert "content" not in doc
+    assert doc["preview"] == content[:200]
+
+def test_full_text_search_matches_content_and_prefixes():
+    created = client.post(
+        "/api/documents",
+        json={"name": "quarterly.txt", "content": "Zephyrine budget forecast for the quarter"}
+    ).json()
+
+    # Content words are searchable, and partially typed words match by prefix
+    for term in ["zephyrine", "zephy", "Zephyrine budg"]:
+        response = client.get(f"/api/documents?search={term}")
+        assert response.status_code == 200
+        ids = [doc["id"] for doc in response.json()["documents"]]
+        assert created["id"] in ids
+
+    response = client.get("/api/documents?search=zephyrine")
+    doc = next(d for d in response.json()["documents"] if d["id"] == created["id"])
+    assert "<mark>Zephyrine</mark>" in doc["snippet"]
+
+def test_search_snippet_escapes_content():
+    client.post("/api/documents", json={"name": "xss.html", "content": "<img src=x onerror=\"alert('hi')\"> & zephyr"})
+    doc = client.get("/api/documents?search=zephyr").json()["documents"][0]
+    assert doc["snippet"] == "&lt;img src=x onerror=&quot;alert(&#x27;hi&#x27;)&quot;&gt; &amp; <mark>zephyr</mark>"
+
+def test_full_text_search_ranks_name_matches_first():
+    body = client.post(
+        "/api/documents",
+        json={"name": "notes.txt", "content": "mentions xylograph once"}
+    ).json()
+    title = client.post(
+        "/api/documents",
+        json={"name": "Xylograph Guide.txt", "content": "unrelated text"}
+    ).json()
+
+    response = client.get("/api/documents?search=xylograph")
+    ids = [doc["id"] for doc in response.json()["documents"]]
+    assert ids.index(title["id"]) < ids.index(body["id"])
+
+def test_search_index_follows_deletes():
+    created = client.post(
+        "/api/documents",
+        json={"name": "ephemeral.txt", "content": "quokkapalooza"}
+    ).json()
+    client.delete(f"/api/documents/{created['id']}")
+
+    response = client.get("/api/documents?search=quokkapalooza")
+    assert response.json()["documents"] == []
+    assert response.json()["total"] == 0
+
+def _walk_cursor_pages(params):
+    seen = []
+    response = client.get(f"/api/documents?{params}").json()
+    seen.extend(response["documents"])
+    while response["next_cursor"]:
+        response = client.get(f"/api/documents?{params}&cursor={response['next_cursor']}").json()
+        seen.extend(response["documents"])
+    return seen
+
+@pytest.mark.parametrize("sort_by", ["name", "name_ci", "created_at", "size", None])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_cursor_pagination_visits_every_document_once(sort_by, sort_order):
+    # Duplicate names and sizes exercise the id tiebreaker
+    names = ["keyset b.txt", "Keyset a.txt", "keyset b.txt", "Keyset C.txt", "keyset a.txt"]
+    for i, name in enumerate(names):
+        client.post("/api/documents", json={"name": name, "content": "keyset" * (i % 3 + 1)})
+
+    params = f"per_page=2&sort_order={sort_order}&include_content=false"
+    if sort_by:
+        params += f"&sort_by={sort_by}"
+    documents = _walk_cursor_pages(params)
+
+    ids = [doc["id"] for doc in documents]
+    assert len(ids) == len(set(ids)) == 5
+    if sort_by == "name_ci":
+        keys = [(doc["name"].lower(), doc["id"]) for doc in documents]
+    elif sort_by:
+        keys = [(doc[sort_by], doc["id"]) for doc in documents]
+    else:
+        keys = ids
+    assert keys == sorted(keys, reverse=sort_order == "desc")
+
+def test_cursor_is_stable_across_inserts():
+    for i in range(4):
+        client.post("/api/documents", json={"name": f"stable {i}.txt", "content": "stable"})
+
+    first = client.get("/api/documents?search=stable&sort_by=name&per_page=2").json()
+    # A document sorting before the cursor must not shift the next page
+    client.post("/api/documents", json={"name": "stable 0a.txt", "content": "stable"})
+    second = client.get(
+        f"/api/documents?search=stable&sort_by=name&per_page=2&cursor={first['next_cursor']}"
+    ).json()
+
+    assert [d["name"] for d in first["documents"]] == ["stable 0.txt", "stable 1.txt"]
+    assert [d["name"] for d in second["documents"]] == ["stable 2.txt", "stable 3.txt"]
+
+def test_invalid_cursor():
+    response = client.get("/api/documents?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+    page = client.get("/api/documents?sort_by=name&per_page=1")
+    cursor = page.json()["next_cursor"]
+    if cursor:
+        response = client.get(f"/api/documents?sort_by=created_at&per_page=1&cursor={cursor}")
+        assert response.status_code == 400
+
+def test_total_uses_maintained_counter():
+    ids = [
+        client.post("/api/documents", json={"name": f"count {i}.txt", "content": "c"}).json()["id"]
+        for i in range(3)
+    ]
+    assert client.get("/api/documents").json()["total"] == 3
+
+    client.delete(f"/api/documents/{ids[0]}")
+    assert client.get("/api/documents").json()["total"] == 2
+
+def test_total_can_be_skipped():
+    client.post("/api/documents", json={"name": "skip.txt", "content": "c"})
+    data = client.get("/api/documents?include_total=false").json()
+    assert data["total"] is None
+    assert len(data["documents"]) == 1
+
+def test_filtered_total_cache_and_estimate():
+    client.post("/api/documents", json={"name": "gadolinium 1.txt", "content": "c"})
+    assert client.get("/api/documents?search=gadolinium").json()["total"] == 1
+
+    client.post("/api/documents", json={"name": "gadolinium 2.txt", "content": "c"})
+    # An estimate may reuse the count cached before the write
+    estimate = client.get("/api/documents?search=gadolinium&total=estimate").json()
+    assert estimate["total"] == 1
+    assert estimate["total_is_estimate"] is True
+    # An exact total notices the collection changed
+    exact = client.get("/api/documents?search=gadolinium").json()
+    assert exact["total"] == 2
+    assert exact["total_is_estimate"] is False
+
+def test_sqlite_connections_are_tuned(tmp_path):
+    url = f"sqlite:///{tmp_path}/tuned.db"
+    writer = create_engine(url)
+    reader = create_engine(url)
+    configure_sqlite(writer)
+    configure_sqlite(reader, read_only=True)
+
+    with writer.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert connection.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+        connection.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        connection.commit()
+
+    with reader.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA query_only").scalar() == 1
+        assert connection.exec_driver_sql("SELECT count(*) FROM t").scalar() == 0
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+    writer.dispose()
+    reader.dispose()
+
+def test_bulk_create_json_array():
+    response = client.post(
+        "/api/documents/bulk?batch_size=2",
+        json=[
+            {"name": "bulk 1.txt", "content": "héllo"},
+            {"name": "", "content": "invalid name"},
+            {"name": "bulk 2.txt", "content": "two"},
+            {"name": "bulk 3.txt"},
+            {"name": "bulk 4.txt", "content": "four"},
+        ]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 2
+    assert [result["index"] for result in data["results"]] == [0, 1, 2, 3, 4]
+    assert data["results"][1]["error"] and data["results"][1]["id"] is None
+    assert "content" in data["results"][3]["error"]
+
+    doc = client.get(f"/api/documents/{data['results'][0]['id']}").json()
+    assert doc["name"] == "bulk 1.txt"
+    assert doc["size"] == len("héllo".encode("utf-8"))
+    assert client.get("/api/documents").json()["total"] == 3
+    assert client.get("/api/documents?search=four").json()["total"] == 1
+
+def test_bulk_create_ndjson():
+    lines = [json.dumps({"name": f"ndjson {i}.txt", "content": f"line {i}"}) for i in range(5)]
+    lines.insert(2, "{not json")
+    response = client.post(
+        "/api/documents/bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 5
+    assert data["failed"] == 1
+    assert data["results"][2]["error"].startswith("Invalid JSON")
+
+def test_bulk_create_rejects_non_array():
+    response = client.post("/api/documents/bulk", json={"name": "x", "content": "y"})
+    assert response.status_code == 400
+
+def test_export_ndjson_streams_every_document():
+    client.post(
+        "/api/documents/bulk",
+        json=[{"name": f"export {i:03}.txt", "content": f"body {i}\nline two"} for i in range(120)]
+    )
+    response = client.get("/api/documents/export?sort_by=name&sort_order=desc")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 120
+    assert records[0]["name"] == "export 119.txt"
+    assert records[0]["content"] == "body 119\nline two"
+    assert records[0]["size"] == len("body 119\nline two")
+
+def test_export_csv_filtered_without_content():
+    client.post(
+        "/api/documents/bulk",
+        json=[
+            {"name": "alpha.txt", "content": "keep, me"},
+            {"name": "beta.txt", "content": "skip"},
+        ]
+    )
+    response = client.get("/api/documents/export?format=csv&search=keep&include_content=false")
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "name", "created_at", "updated_at", "size"]
+    assert [row[1] for row in rows[1:]] == ["alpha.txt"]
+
+    empty = client.get("/api/documents/export?format=csv&search=nothingmatches")
+    assert list(csv.reader(io.StringIO(empty.text))) == [["id", "name", "created_at", "updated_at", "size", "content"]]
+
+def test_export_gzip():
+    client.post("/api/documents", json={"name": "zipped.txt", "content": "compress me"})
+    response = client.get("/api/documents/export?gzip=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="documents.ndjson.gz"' in response.headers["content-disposition"]
+    records = [json.loads(line) for line in gzip.decompress(response.content).splitlines()]
+    assert [record["name"] for record in records] == ["zipped.txt"]
+
+def test_get_document_is_cached_until_deleted():
+    created = client.post("/api/documents", json={"name": "hot.txt", "content": "hot"}).json()
+    before = document_cache.stats()
+
+    first = client.get(f"/api/documents/{created['id']}")
+    second = client.get(f"/api/documents/{created['id']}")
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert first.json()["name"] == "hot.txt"
+
+    after = document_cache.stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+    client.delete(f"/api/documents/{created['id']}")
+    assert client.get(f"/api/documents/{created['id']}").status_code == 404
+
+def test_get_document_does_not_cache_a_row_deleted_during_the_read(monkeypatch, database):
+    created = client.post("/api/documents", json={"name": "racy.txt", "content": "racy"}).json()
+    read = AsyncSession.get
+
+    async def read_then_delete(self, entity, ident, **kwargs):
+        # The row was read before the delete committed and invalidated the cache
+        document = await read(self, entity, ident, **kwargs)
+        async with database.async_session_factory() as db:
+            await db.execute(delete(Document).where(Document.id == ident))
+            await db.commit()
+        await invalidate_document(ident)
+        return document
+
+    monkeypatch.setattr(AsyncSession, "get", read_then_delete)
+    assert client.get(f"/api/documents/{created['id']}").json()["name"] == "racy.txt"
+    monkeypatch.undo()
+
+    assert document_cache.stats()["entries"] == 0
+    assert client.get(f"/api/documents/{created['id']}").status_code == 404
+
+def test_lru_cache_bounds_entries_bytes_and_ttl(monkeypatch):
+    cache = LRUCache(max_entries=3, max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.get("a")
+    # Over the byte budget: "b" is least recently used
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    # Values larger than the whole budget are not stored
+    cache.set("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.cache.time.monotonic", lambda: clock[0])
+    expiring = LRUCache(max_entries=10, ttl=5)
+    expiring.set("k", "v")
+    clock[0] += 6
+    assert expiring.get("k") is None
+    assert expiring.stats()["expirations"] == 1
+
+def test_get_document_conditional_requests():
+    created = client.post("/api/documents", json={"name": "etag.txt", "content": "validate me"}).json()
+    url = f"/api/documents/{created['id']}"
+
+    response = client.get(url)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert etag.startswith(f'"{created["id"]}-')
+    assert response.headers["cache-control"] == "no-cache"
+
+    # Revalidated both from the response cache and from the database
+    for _ in range(2):
+        not_modified = client.get(url, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+        asyncio.run(document_cache.clear())
+
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+    # If-None-Match takes precedence over If-Modified-Since
+    assert client.get(url, headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified}).status_code == 200
+    assert client.get("/api/documents/999999", headers={"If-None-Match": etag}).status_code == 404
+
+def test_list_documents_etag_follows_collection_version(sample_documents):
+    response = client.get("/api/documents?per_page=2")
+    etag = response.headers["etag"]
+    assert "last-modified" in response.headers
+    assert client.get("/api/documents?per_page=2", headers={"If-None-Match": etag}).status_code == 304
+    # Different parameters produce a different representation
+    assert client.get("/api/documents?per_page=3").headers["etag"] != etag
+
+    client.post("/api/documents", json={"name": "new.txt", "content": "changes the version"})
+    response = client.get("/api/documents?per_page=2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_responses_render_utc_timestamps(sample_documents):
+    created = client.post("/api/documents", json={"name": "utc.txt", "content": "when"})
+    assert created.status_code == 201
+    fetched = client.get(f"/api/documents/{created.json()['id']}").json()
+    listed = client.get("/api/documents?include_content=false&per_page=100").json()["documents"]
+    assert fetched == created.json()
+    assert fetched["created_at"].endswith("Z")
+    assert all(doc["updated_at"].endswith("Z") and "content" not in doc for doc in listed)
+
+def _blobs(database):
+    with database.engine.connect() as connection:
+        return connection.execute(text("SELECT compression, size, stored_size, refcount FROM content_blobs")).all()
+
+def test_identical_content_is_stored_once_and_released_on_delete(database):
+    body = "template paragraph with boilerplate " * 200
+    first = client.post("/api/documents", json={"name": "copy1.txt", "content": body}).json()
+    second = client.post("/api/documents/bulk", json=[{"name": "copy2.txt", "content": body}]).json()["results"][0]
+
+    [(compression, size, stored_size, refcount)] = _blobs(database)
+    assert compression in ("zlib", "zstd")
+    assert size == len(body) and stored_size < size
+    assert refcount == 2
+
+    # Compressed content reads back intact and stays searchable
+    assert client.get(f"/api/documents/{second['id']}").json()["content"] == body
+    assert client.get("/api/documents?search=boilerplate").json()["total"] == 2
+
+    client.delete(f"/api/documents/{first['id']}")
+    assert [blob.refcount for blob in _blobs(database)] == [1]
+    client.delete(f"/api/documents/{second['id']}")
+    assert _blobs(database) == []
+    assert client.get("/api/documents?search=boilerplate").json()["total"] == 0
+
+def test_upload_streams_multipart_and_raw_bodies(database):
+    body = ("line of a large log file\n" * 4000).encode("utf-8")
+    response = client.post(
+        "/api/documents/upload",
+        files={"file": ("server.log", body, "text/plain")},
+    )
+    assert response.status_code == 201
+    uploaded = response.json()
+    assert uploaded["name"] == "server.log"
+    assert uploaded["size"] == len(body)
+    assert uploaded["preview"].startswith("line of a large log file")
+    assert client.get(f"/api/documents/{uploaded['id']}").json()["content"] == body.decode("utf-8")
+
+    # Same content as a raw body: stored once, and searchable
+    raw = client.post("/api/documents/upload?name=copy.log", content=body, headers={"Content-Type": "text/plain"})
+    assert raw.status_code == 201
+    assert len(_blobs(database)) == 1
+    assert client.get("/api/documents?search=log").json()["total"] == 2
+
+    assert client.post("/api/documents/upload", content=body).status_code == 400
+    assert client.post("/api/documents/upload?name=bin", content=b"\xff\xfe").status_code == 400
+
+def test_upload_rejects_malformed_multipart(monkeypatch, database):
+    from app.services import blobs
+
+    closed = []
+    close = blobs.BlobUpload.close
+    monkeypatch.setattr(blobs.BlobUpload, "close", lambda self: closed.append(self) or close(self))
+    response = client.post(
+        "/api/documents/upload",
+        # A file part, then a part whose header line has no colon
+        content=(
+            b'--boundary\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n\r\nabc\r\n'
+            b"--boundary\r\nbad header\r\n\r\n"
+        ),
+        headers={"Content-Type": "multipart/form-data; boundary=boundary"},
+    )
+    assert response.status_code == 400
+    assert "Malformed multipart body" in response.json()["detail"]
+    assert len(closed) == 1
+    assert _blobs(database) == []
+
+def test_content_download_supports_ranges():
+    text_body = "".join(f"{i:05d}\n" for i in range(20000))
+    created = client.post("/api/documents", json={"name": "numbers.txt", "content": text_body}).json()
+    url = f"/api/documents/{created['id']}/content"
+    encoded = text_body.encode("utf-8")
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == encoded
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-length"] == str(len(encoded))
+
+    # Ranges inside compressed content, across chunk boundaries
+    for header, expected in (
+        ("bytes=0-5", encoded[:6]),
+        ("bytes=65530-65545", encoded[65530:65546]),
+        ("bytes=-12", encoded[-12:]),
+        (f"bytes={len(encoded) - 3}-", encoded[-3:]),
+    ):
+        partial = client.get(url, headers={"Range": header})
+        assert partial.status_code == 206
+        assert partial.content == expected
+    assert client.get(url, headers={"Range": "bytes=0-5"}).headers["content-range"] == f"bytes 0-5/{len(encoded)}"
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(encoded)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(encoded)}"
+    # A stale If-Range gets the full content
+    assert client.get(url, headers={"Range": "bytes=0-5", "If-Range": '"stale"'}).status_code == 200
+    assert client.get("/api/documents/999999/content").status_code == 404
+
+def test_batch_fetch_reports_missing_ids(sample_documents):
+    ids = [doc.id for doc in sample_documents]
+    response = client.get(f"/api/documents/batch?ids={ids[1]},999999&ids={ids[0]}&include_content=false")
+    assert response.status_code == 200
+    data = response.json()
+    assert [doc["id"] for doc in data["documents"]] == [ids[1], ids[0]]
+    assert "content" not in data["documents"][0]
+    assert data["missing"] == [999999]
+
+    posted = client.post("/api/documents/batch", json={"ids": [ids[2], ids[2], 424242]}).json()
+    assert [doc["content"] for doc in posted["documents"]] == [sample_documents[2].content]
+    assert posted["missing"] == [424242]
+    assert client.get("/api/documents/batch?ids=abc").status_code == 400
+
+def test_batch_delete_by_ids_and_by_search(sample_documents, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_CHUNK_SIZE", 2)
+    ids = [doc.id for doc in sample_documents]
+    client.post("/api/documents", json={"name": "extra.txt", "content": "unrelated"})
+    response = client.post("/api/documents/batch/delete", json={"ids": [ids[2], 999999, 999998]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["deleted"] == 1
+    assert data["deleted_ids"] == [ids[2]]
+    assert data["missing"] == [999999, 999998]
+    assert client.get(f"/api/documents/{ids[2]}").status_code == 404
+
+    # Both remaining sample documents mention the timeline
+    data = client.post("/api/documents/batch/delete", json={"search": "timeline"}).json()
+    assert sorted(data["deleted_ids"]) == sorted(ids[:2])
+    assert client.get("/api/documents?search=timeline").json()["total"] == 0
+    assert client.get("/api/documents").json()["total"] == 1
+    assert client.post("/api/documents/batch/delete", json={}).status_code == 422
+
+def test_metrics_and_server_timing(sample_documents):
+    response = client.get("/api/documents?search=timeline")
+    timing = response.headers["server-timing"]
+    for phase in ("db;", "count;", "query;", "serialize;", "app;"):
+        assert phase in timing
+
+    client.get(f"/api/documents/{sample_documents[0].id}")
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    body = metrics.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/documents/{document_id}",status="200"}' in body
+    assert 'http_response_size_bytes_bucket{method="GET",route="/api/documents",le="+Inf"}' in body
+    assert 'db_statement_duration_seconds_count{operation="SELECT"}' in body
+    assert "http_requests_in_flight 1" in body
+
+def test_slow_statements_are_counted(monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    client.get("/api/documents")
+    assert 'db_slow_statements_total{operation="SELECT"}' in client.get("/metrics").text
+
+def test_repeated_errors_are_rate_limited(monkeypatch):
+    from app.core.logging import RateLimitFilter
+
+    clock = [100.0]
+    monkeypatch.setattr("app.core.logging.time.monotonic", lambda: clock[0])
+    limiter = RateLimitFilter(burst=2, window=60)
+
+    def record(level=logging.ERROR, lineno=10):
+        return logging.LogRecord("app.test", level, __file__, lineno, "Error %s", ("x",), None)
+
+    assert [limiter.filter(record()) for _ in range(5)] == [True, True, False, False, False]
+    # Other call sites and levels below WARNING are not limited
+    assert limiter.filter(record(lineno=11))
+    assert all(limiter.filter(record(level=logging.INFO)) for _ in range(5))
+
+    clock[0] += 60
+    reopened = record()
+    assert limiter.filter(reopened)
+    assert reopened.getMessage() == "Error x (3 similar messages suppressed)"
+
+def test_logging_is_queued_and_configured_once(monkeypatch, tmp_path):
+    from app.core import logging as app_logging
+
+    monkeypatch.setattr(settings, "LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "LOG_FORMAT", "json")
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    try:
+        app_logging.setup_logging()
+        app_logging.setup_logging()
+        added = [handler for handler in root.handlers if handler not in handlers]
+        assert len(added) == 1 and isinstance(added[0], logging.handlers.QueueHandler)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.test").exception("Failed for %s", "doc-1")
+    finally:
+        app_logging.shutdown_logging()
+    assert root.handlers == handlers
+
+    entry = json.loads((tmp_path / "app.log").read_text().splitlines()[-1])
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "Failed for doc-1"
+    assert "ValueError: boom" in entry["exception"]
+
+def test_liveness_and_readiness(monkeypatch, database):
+    assert client.get("/health/live").json()["status"] == "healthy"
+    # Not started through the lifespan: alive but not ready
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["reason"] == "starting"
+
+    with TestClient(app) as started:
+        assert started.get("/health/ready").json() == {"status": "ready"}
+        Base.metadata.drop_all(bind=database.engine)
+        response = started.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["reason"] == "database"
+    assert app.state.ready is False
+
+def test_seed_sample_data_only_fills_an_empty_database(database):
+    from app.services.seed import SAMPLE_DOCUMENTS, seed_sample_data
+
+    async def seed():
+        async with database.async_session_factory() as db:
+            return await seed_sample_data(db)
+
+    assert asyncio.run(seed()) == len(SAMPLE_DOCUMENTS)
+    assert asyncio.run(seed()) == 0
+    assert client.get("/api/documents").json()["total"] == len(SAMPLE_DOCUMENTS)
+
+def _listing_query_plan(database, params: str) -> list[str]:
+    """EXPLAIN QUERY PLAN details of the page query a listing request runs"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "ORDER BY" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        assert client.get(f"/api/documents?{params}").status_code == 200
+    finally:
+        event.remove(database.async_engine.sync_engine, "before_cursor_execute", capture)
+    statement, parameters = statements[-1]
+    with database.engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+@pytest.mark.parametrize("sort_by, index", [
+    ("name", "ix_documents_name_id"),
+    ("name_ci", "ix_documents_lower_name_id"),
+    ("created_at", "ix_documents_created_at_id"),
+    ("size", "ix_documents_size_id"),
+])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_sorted_pages_are_read_in_index_order(sort_by, index, sort_order, database):
+    for i in range(3):
+        client.post("/api/documents", json={"name": f"Plan {i}.txt", "content": "x" * (i + 1)})
+    params = f"sort_by={sort_by}&sort_order={sort_order}&per_page=2"
+    plan = _listing_query_plan(database, params)
+    assert any(f"INDEX {index}" in step for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+    # Keyset seeks continue in the same index
+    cursor = client.get(f"/api/documents?{params}").json()["next_cursor"]
+    plan = _listing_query_plan(database, f"{params}&cursor={cursor}")
+    assert any(f"INDEX {index}" in step for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+def test_change_feed_pages_and_resets():
+    head = client.get("/api/documents/changes").json()["last_seq"]
+    created = client.post("/api/documents", json={"name": "feed.txt", "content": "feed"}).json()
+    client.post("/api/documents/bulk", json=[{"name": "feed bulk.txt", "content": "bulk"}])
+    client.delete(f"/api/documents/{created['id']}")
+
+    data = client.get(f"/api/documents/changes?since={head}").json()
+    assert [(change["op"], change["name"]) for change in data["changes"]] == [
+        ("create", "feed.txt"), ("create", "feed bulk.txt"), ("delete", "feed.txt"),
+    ]
+    assert data["changes"][0]["id"] == created["id"]
+    assert data["changes"][0]["size"] == 4
+    assert data["last_seq"] == data["changes"][-1]["seq"]
+    assert client.get(f"/api/documents/changes?since={head}&limit=1").json()["last_seq"] == head + 1
+
+    # A resume point that is not in the log asks the client to reload
+    data = client.get(f"/api/documents/changes?since={data['last_seq'] + 100}").json()
+    assert data["reset"] is True and data["changes"] == []
+    response = client.get(
+        "/api/documents/changes", headers={"Accept": "text/event-stream", "Last-Event-ID": "100000"}
+    )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith("retry: ")
+    assert "event: reset\n" in response.text
+
+def test_change_stream_replays_then_follows_live_changes(monkeypatch, database):
+    from app.services import changes
+
+    monkeypatch.setattr(settings, "CHANGE_FEED_HEARTBEAT_SECONDS", 0.05)
+    first = client.post("/api/documents", json={"name": "stream 1.txt", "content": "one"}).json()
+
+    async def follow():
+        stream = changes.stream_changes(database.async_session_factory, 0)
+        try:
+            replayed = await anext(stream)
+            heartbeat = await anext(stream)
+            async with database.async_session_factory() as db:
+                db.add(Document(name="stream 2.txt", content="two"))
+                await db.commit()
+            changes.hub.notify()
+            live = await asyncio.wait_for(anext(stream), 5)
+        finally:
+            await stream.aclose()
+        return replayed, heartbeat, live
+
+    replayed, heartbeat, live = asyncio.run(follow())
+    assert (replayed.op, replayed.id) == ("create", first["id"])
+    assert heartbeat is None
+    assert (live.op, live.name, live.seq) == ("create", "stream 2.txt", replayed.seq + 1)
+
+def test_autocomplete_ranks_prefixes_and_tolerates_typos(sample_documents):
+    # Through the lifespan, so the index and its follower share one event loop
+    with TestClient(app) as started:
+        def names(q):
+            response = started.get("/api/documents/autocomplete", params={"q": q})
+            assert response.status_code == 200
+            return [suggestion["name"] for suggestion in response.json()["suggestions"]]
+
+        assert names("Projcet Pln")[0] == "Project Plan.txt"
+        assert names("meet")[0] == "Meeting Notes.txt"
+        assert names("documentation")[0] == "API Documentation.txt"
+        assert names("zzzz") == []
+
+        # Creates and deletes through the API are visible immediately
+        created = started.post("/api/documents", json={"name": "Projection Data.csv", "content": "x"}).json()
+        assert names("projec")[:2] == ["Project Plan.txt", "Projection Data.csv"]
+        started.delete(f"/api/documents/{created['id']}")
+        assert "Projection Data.csv" not in names("projec")
+
+        # So are uploads, bulk creates and batch deletes
+        uploaded = started.post("/api/documents/upload", params={"name": "Projector Manual.pdf"}, content=b"x").json()
+        bulk = started.post("/api/documents/bulk", json=[{"name": "Projected Costs.xlsx", "content": "x"}]).json()
+        assert {"Projector Manual.pdf", "Projected Costs.xlsx"} <= set(names("projec"))
+        started.post("/api/documents/batch/delete", json={"ids": [uploaded["id"], bulk["results"][0]["id"]]})
+        assert names("projec") == ["Project Plan.txt"]
+
+def test_autocomplete_index_follows_other_writers(monkeypatch, database):
+    monkeypatch.setattr(settings, "CHANGE_FEED_POLL_SECONDS", 0.05)
+
+    async def wait_for(predicate):
+        for _ in range(100):
+            if predicate():
+                return True
+            await asyncio.sleep(0.02)
+        return False
+
+    async def follow():
+        index = await autocomplete.ensure_ready(database.async_session_factory)
+        assert len(index) == 0
+        # Written by "another worker": no direct index update, no notify
+        async with database.async_session_factory() as db:
+            document = Document(name="Quarterly Report.pdf", content="q")
+            db.add(document)
+            await db.commit()
+        assert await wait_for(lambda: index.search("quartrly", 5))
+        async with database.async_session_factory() as db:
+            await db.delete(await db.get(Document, document.id))
+            await db.commit()
+        assert await wait_for(lambda: not index.search("quartrly", 5))
+        # Stopped, with its session closed, by the time reset() returns
+        follower = autocomplete._follower
+        await autocomplete.reset()
+        assert follower.done()
+
+    asyncio.run(follow())
+
+def test_autocomplete_finds_old_names_among_many_similar_ones():
+    # Thousands of newer names share the query's words; the older, better
+    # match must still be found
+    index = NameIndex()
+    index.extend([(1, "Project Plan.txt")])
+    index.extend((i, f"Project report {i}.txt") for i in range(2, 5001))
+    index.finish()
+    assert index.search("Projcet Pln", 5)[0].id == 1
+
+    index = NameIndex()
+    index.extend([(1, "Project Plan.txt")])
+    index.extend((i, f"Project Plan {i} draft.txt") for i in range(2, 5001))
+    index.finish()
+    assert index.search("Projct Plan.txt", 5)[0].id == 1
+    # Incremental updates keep the lists ordered for lookups
+    index.remove(1)
+    index.add(5001, "Project Plan.txt")
+    assert index.search("Projct Plan.txt", 5)[0].id == 5001
+
+def test_similar_documents_found_through_lsh_buckets():
+    from app.services.seed import SAMPLE_DOCUMENTS
+
+    results = client.post("/api/documents/bulk", json=SAMPLE_DOCUMENTS).json()["results"]
+    ids = {document["name"]: item["id"] for document, item in zip(SAMPLE_DOCUMENTS, results)}
+    response = client.get(f"/api/documents/{ids['Project Plan.txt']}/similar")
+    assert response.status_code == 200
+    similar = response.json()["similar"]
+    names = [item["name"] for item in similar]
+    assert set(names) == {"Project Plan2.txt", "Project Plan3.txt", "Project Plan4.txt", "Project Plan5.txt"}
+    scores = [item["similarity"] for item in similar]
+    assert scores == sorted(scores, reverse=True) and min(scores) >= settings.SIMILARITY_THRESHOLD
+    # Identical content is an exact duplicate; a high threshold keeps only close variants
+    meeting = client.get(f"/api/documents/{ids['Meeting Notes.txt']}/similar").json()["similar"]
+    assert meeting[0] == {"id": ids["Meeting Notes3.txt"], "name": "Meeting Notes3.txt", "similarity": 1.0}
+    strict = client.get(f"/api/documents/{ids['Project Plan.txt']}/similar?threshold=0.8").json()["similar"]
+    assert "Project Plan3.txt" not in [item["name"] for item in strict]
+    assert client.get("/api/documents/999999/similar").status_code == 404
+
+    # Creating with ?similar= warns about near-duplicates; without, nothing extra is returned
+    variant = {"name": "Plan copy.txt", "content": SAMPLE_DOCUMENTS[1]["content"].replace("Q4", "Q3")}
+    created = client.post("/api/documents?similar=0.8", json=variant).json()
+    assert "Project Plan.txt" in [item["name"] for item in created["similar"]]
+    assert "similar" not in client.post("/api/documents", json=variant).json()
+
+def test_similarity_rebuild_signs_existing_content(sample_documents, database):
+    from app.services import similarity
+
+    with database.engine.begin() as connection:
+        connection.execute(text("UPDATE content_blobs SET signature = NULL"))
+        assert connection.execute(text("SELECT count(*) FROM content_lsh")).scalar() == 0
+    # Without signatures only identical content is found
+    assert client.get(f"/api/documents/{sample_documents[1].id}/similar?threshold=0").json()["similar"] == []
+
+    signed = asyncio.run(similarity.rebuild_signatures(database.async_session_factory, batch_size=2, workers=2))
+    assert signed == 3
+    with database.engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM content_lsh")).scalar() == 3 * 16
+    assert asyncio.run(similarity.rebuild_signatures(database.async_session_factory, workers=1)) == 0
+
+def test_group_commit_shares_a_transaction_between_concurrent_writes(monkeypatch, database):
+    from app.api.endpoints import documents as endpoints
+    from app.schemas.document import DocumentCreate
+    from app.services import writes
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(settings, "WRITE_GROUP_WINDOW_MS", 50.0)
+    commits = []
+    count_commit = commits.append
+    event.listen(database.async_engine.sync_engine, "commit", count_commit)
+    operations = [
+        lambda db, i=i: endpoints._insert_document(DocumentCreate(name=f"group {i}.txt", content=f"group {i}"), db)
+        for i in range(10)
+    ]
+    # A failing operation is rolled back alone, and its caller gets the error
+    operations.insert(5, lambda db: endpoints._delete_document(999999, db))
+
+    async def burst():
+        results = await asyncio.gather(
+            *(writes.coordinator.submit(database.async_session_factory, operation) for operation in operations),
+            return_exceptions=True
+        )
+        await writes.coordinator.stop()
+        return results
+
+    try:
+        results = asyncio.run(burst())
+    finally:
+        event.remove(database.async_engine.sync_engine, "commit", count_commit)
+    assert len(commits) == 1
+    assert isinstance(results[5], HTTPException) and results[5].status_code == 404
+    created = [result for result in results if isinstance(result, Document)]
+    assert len(created) == 10 and len({document.id for document in created}) == 10
+    assert client.get("/api/documents?search=group").json()["total"] == 10
+
+    # Through the endpoints, responses keep their per-request meaning
+    monkeypatch.setattr(settings, "WRITE_GROUP_COMMIT", True)
+    with TestClient(app) as started:
+        response = started.post("/api/documents", json={"name": "grouped.txt", "content": "grouped"})
+        assert response.status_code == 201
+        document_id = response.json()["id"]
+        assert started.get(f"/api/documents/{document_id}").json()["name"] == "grouped.txt"
+        assert started.delete(f"/api/documents/{document_id}").status_code == 200
+        assert started.delete(f"/api/documents/{document_id}").status_code == 404
+
+def test_group_commit_writer_survives_a_failed_commit(monkeypatch, database):
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.services import writes
+
+    commit, rollback = AsyncSession.commit, AsyncSession.rollback
+
+    async def fail(self):
+        raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+    async def insert(db):
+        document = Document(name="after failure.txt", content="x")
+        db.add(document)
+        await db.flush()
+        return document.id
+
+    async def run():
+        # Commit and rollback both fail, so the error escapes the batch
+        monkeypatch.setattr(AsyncSession, "commit", fail)
+        monkeypatch.setattr(AsyncSession, "rollback", fail)
+        results = await asyncio.wait_for(asyncio.gather(
+            *(writes.coordinator.submit(database.async_session_factory, insert) for _ in range(3)),
+            return_exceptions=True
+        ), 5)
+        monkeypatch.setattr(AsyncSession, "commit", commit)
+        monkeypatch.setattr(AsyncSession, "rollback", rollback)
+        # The same writer task applies the next write
+        document_id = await asyncio.wait_for(writes.coordinator.submit(database.async_session_factory, insert), 5)
+        await writes.coordinator.stop()
+        return results, document_id
+
+    results, document_id = asyncio.run(run())
+    assert all(isinstance(result, OperationalError) for result in results)
+    assert client.get(f"/api/documents/{document_id}").status_code == 200
+
+def test_sparse_fieldsets_select_only_requested_columns(sample_documents, database):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        listed = client.get("/api/documents?fields=id,name,size,created_at&per_page=100")
+        document = client.get(f"/api/documents/{sample_documents[0].id}?fields=name,size")
+    finally:
+        event.remove(database.async_engine.sync_engine, "before_cursor_execute", capture)
+    assert listed.status_code == 200
+    by_id = {item["id"]: item for item in listed.json()["documents"]}
+    assert set(by_id[sample_documents[2].id]) == {"id", "name", "size", "created_at"}
+    assert by_id[sample_documents[2].id]["name"] == sample_documents[2].name
+    assert by_id[sample_documents[2].id]["size"] == sample_documents[2].size
+    assert document.json() == {"name": sample_documents[0].name, "size": sample_documents[0].size}
+    # Content is neither read nor decompressed
+    assert not [statement for statement in statements if "content_text" in statement]
+
+    # Each sparse representation has its own validator
+    assert document.headers["etag"] != client.get(f"/api/documents/{sample_documents[0].id}").headers["etag"]
+    revalidated = client.get(
+        f"/api/documents/{sample_documents[0].id}?fields=name,size", headers={"If-None-Match": document.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert client.get("/api/documents?fields=id,secret").status_code == 400
+    assert client.get(f"/api/documents/{sample_documents[0].id}?fields=").status_code == 400
+
+def test_responses_are_compressed_by_negotiated_encoding(monkeypatch):
+    from app.core import compression
+
+    content = "compressible text " * 200
+    created = client.post("/api/documents", json={"name": "large.txt", "content": content}).json()
+    response = client.get(f"/api/documents/{created['id']}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.headers["etag"].startswith('W/"')
+    assert int(response.headers["content-length"]) < len(content) / 10
+    assert response.json()["content"] == content
+    # The weakened validator still revalidates
+    assert client.get(
+        f"/api/documents/{created['id']}", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]}
+    ).status_code == 304
+
+    # Small bodies, refused encodings and byte-range downloads are sent as they are
+    small = client.get(f"/api/documents/{created['id']}?fields=id,name", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    identity = client.get(f"/api/documents/{created['id']}", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in identity.headers
+    download = client.get(f"/api/documents/{created['id']}/content", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in download.headers
+
+    monkeypatch.setattr(compression, "zstandard", compression.zstandard or object())
+    monkeypatch.setattr(settings, "RESPONSE_COMPRESSION_ENCODINGS", ["zstd", "gzip"])
+    assert compression.negotiate("gzip, zstd") == "zstd"
+    assert compression.negotiate("gzip;q=1, zstd;q=0.5") == "gzip"
+    assert compression.negotiate("br") is None
+    assert compression.negotiate("*") == "zstd"